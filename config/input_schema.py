@@ -0,0 +1,10 @@
+INPUT_SCHEMA = {
+    "TEMPLATE_TYPE": {"type": str, "required": True},
+    "PROJECT_NAME": {"type": str, "required": False},
+    "PROJECT_TYPE": {"type": str, "required": False},
+    "MUNICIPALITY": {"type": str, "required": False},
+    "PROJECT_WORK_ORDER": {"type": str, "required": True, "pattern": r"^\S+$"},
+    "PROJECT_TECHNICIAN": {"type": str, "required": False, "pattern": r"^\S+\s+\S+"},
+    "DESIGN_DATE": {"type": str, "required": False, "pattern": r"^\d{2}/\d{2}/\d{4}$"},
+    "SIGNING_ENGINEER": {"type": str, "required": False},
+}
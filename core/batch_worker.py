@@ -0,0 +1,292 @@
+from core.drawing_generator import DrawingGenerator
+from core.job_queue import FileJobQueue
+from multiprocessing import Process, Value
+from multiprocessing.connection import wait
+from utils.memory import MemorySampler, process_rss_mb, release_memory
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Exit code of a worker process stopped to be replaced by a fresh one
+RECYCLE_EXIT_CODE = 3
+RECYCLE_REASONS = ("recycle_after", "max_rss")
+
+def make_worker_id():
+    """
+    Generate a worker id unique across hosts sharing the queue.
+
+    :return: worker id (without dots, used in lease file names)
+    """
+    host = socket.gethostname().replace(".", "-")
+    return f"{host}-{os.getpid()}"
+
+
+class LeaseLost(Exception):
+    """
+    Raised in the worker main thread when the lease of the running job can not be renewed.
+    """
+
+
+class _Heartbeat(threading.Thread):
+    """
+    Background thread renewing the lease of the running job and the worker heartbeat file.
+
+    When the lease can not be renewed (reclaimed by another worker, queue folder unreachable), the
+    running job is stopped: LeaseLost is raised in the main thread with SIGUSR1, so the job does not
+    keep running while it is retried elsewhere.
+    """
+
+    def __init__(self, queue, worker_id, interval):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.worker_id = worker_id
+        self.interval = interval
+        self.lease_path = None
+        self.job_id = None
+        self.jobs_done = 0
+        self.can_stop_job = False
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.beat()
+
+    def beat(self):
+        lease_path = self.lease_path
+        if lease_path is not None:
+            try:
+                self.queue.heartbeat(lease_path)
+            except Exception:
+                logger.exception(f"Could not renew the lease of job {self.job_id}, stopping the job")
+                self.stop_job(lease_path)
+        try:
+            self.queue.update_worker(self.worker_id, job_id=self.job_id, jobs_done=self.jobs_done,
+                                     rss_mb=_round_mb(process_rss_mb()))
+        except Exception:
+            logger.exception(f"Could not update the heartbeat file of worker {self.worker_id}")
+
+    def stop_job(self, lease_path):
+        """
+        Interrupt the main thread running the job of lease_path, if it is still running.
+        """
+        if self.lease_path is lease_path and self.can_stop_job:
+            os.kill(os.getpid(), signal.SIGUSR1)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def _round_mb(value):
+    return round(value, 1) if value is not None else None
+
+
+def run_job(queue, job, memory_interval=0.2):
+    """
+    Generate the drawing of a job into its output folder.
+
+    Memory is reported in MB: RSS of the worker before the job, peak RSS of the worker and its
+    stage processes during the job, and steady RSS of the worker after the job documents are released.
+
+    :param queue: FileJobQueue
+    :param job: leased job
+    :param memory_interval: seconds between RSS samples
+    :return: result metrics
+    """
+    started_at = queue.now()
+    start = time.perf_counter()
+    rss_before = process_rss_mb()
+    output_folder = queue.output_folder(job["job_id"])
+    with MemorySampler(memory_interval) as sampler:
+        generator = DrawingGenerator(job["input_data"], landbase_path=job["landbase"], output_folder=output_folder,
+                                     asset_store=queue.asset_store_folder)
+        dxf_path = generator.generate()
+    stages = {name: end - begin for name, (begin, end) in generator.pipeline.timings.items()}
+    critical_path = generator.pipeline.critical_path()
+    # The pipeline stages hold bound methods of the generator, drop both before measuring steady RSS
+    del generator
+    release_memory()
+    return {
+        "output": str(dxf_path),
+        "started_at": started_at,
+        "wall_time": time.perf_counter() - start,
+        "stages": stages,
+        "critical_path": critical_path,
+        "memory": {
+            "rss_before_mb": _round_mb(rss_before),
+            "peak_rss_mb": _round_mb(sampler.peak_mb),
+            "steady_rss_mb": _round_mb(process_rss_mb()),
+        },
+    }
+
+
+def run_worker(queue_dir, worker_id=None, max_jobs=None, poll_interval=2.0, heartbeat_interval=10.0,
+               lease_timeout=120, max_attempts=3, exit_when_empty=False, recycle_after=None, max_rss_mb=None):
+    """
+    Take jobs from the queue and generate them until stopped.
+
+    :param queue_dir: shared queue folder
+    :param worker_id: worker id, generated from host and pid if not given
+    :param max_jobs: stop after this many jobs (None for no limit)
+    :param poll_interval: seconds to wait when no job is pending
+    :param heartbeat_interval: seconds between lease renewals, must be well below lease_timeout
+    :param lease_timeout: seconds without heartbeat after which a lease is abandoned
+    :param max_attempts: how many times a job is tried before it fails
+    :param exit_when_empty: stop when no job is pending or leased
+    :param recycle_after: stop after this many jobs so the process can be replaced (see run_workers)
+    :param max_rss_mb: stop when the steady RSS after a job is above this ceiling (see run_workers),
+                       not checked where the RSS can not be read (no /proc)
+    :return: (number of processed jobs, stop reason: "max_jobs", "recycle_after", "max_rss" or "empty")
+    """
+    queue = FileJobQueue(queue_dir, lease_timeout=lease_timeout, max_attempts=max_attempts)
+    worker_id = worker_id or make_worker_id()
+    heartbeat = _Heartbeat(queue, worker_id, heartbeat_interval)
+
+    def on_lease_lost(signum, frame):
+        # Ignore a late signal when the job has already finished
+        if heartbeat.lease_path is not None:
+            raise LeaseLost(f"Lease of job {heartbeat.job_id} could not be renewed")
+
+    # Signal handlers can only be set from the main thread, elsewhere jobs run to their end
+    if hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, on_lease_lost)
+        heartbeat.can_stop_job = True
+    heartbeat.beat()
+    heartbeat.start()
+    logger.info(f"Worker {worker_id} started on queue {queue.root}")
+
+    processed = 0
+    reason = None
+    try:
+        while reason is None:
+            if max_jobs is not None and processed >= max_jobs:
+                reason = "max_jobs"
+                break
+            if recycle_after is not None and processed >= recycle_after:
+                reason = "recycle_after"
+                break
+            queue.reclaim_abandoned(worker_id)
+            job, lease_path = queue.lease(worker_id)
+            if job is None:
+                if exit_when_empty and not any((queue.root / "leased").glob("*.json")):
+                    reason = "empty"
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            heartbeat.job_id, heartbeat.lease_path = job["job_id"], lease_path
+            try:
+                result = run_job(queue, job)
+                heartbeat.lease_path = None
+            except LeaseLost:
+                # The job is retried by the worker that reclaims the lease, it must not be completed or failed here
+                logger.error(f"Job {job['job_id']} stopped, its lease was lost")
+            except Exception as e:
+                logger.exception(f"Job {job['job_id']} failed")
+                queue.fail(job, lease_path, f"{type(e).__name__}: {e}")
+            else:
+                result["worker_id"] = worker_id
+                queue.complete(job, lease_path, result)
+            finally:
+                heartbeat.job_id = heartbeat.lease_path = None
+                processed += 1
+                heartbeat.jobs_done = processed
+
+            # Failed jobs leave their documents behind too
+            release_memory()
+            rss = process_rss_mb()
+            if max_rss_mb is not None and rss is not None and rss > max_rss_mb:
+                logger.info(f"Worker {worker_id} RSS {rss:.0f} MB is above {max_rss_mb} MB")
+                reason = "max_rss"
+    finally:
+        heartbeat.stop()
+        queue.update_worker(worker_id, job_id=None, jobs_done=processed, stopped=True, stop_reason=reason)
+        logger.info(f"Worker {worker_id} stopped after {processed} jobs ({reason or 'error'})")
+
+    return processed, reason
+
+
+def _worker_process(queue_dir, jobs_done, worker_kwargs):
+    """
+    Worker process entry point: add processed jobs to the slot counter and exit with
+    RECYCLE_EXIT_CODE when the worker stopped to be replaced.
+    """
+    processed, reason = run_worker(queue_dir, **worker_kwargs)
+    with jobs_done.get_lock():
+        jobs_done.value += processed
+    sys.exit(RECYCLE_EXIT_CODE if reason in RECYCLE_REASONS else 0)
+
+
+def run_workers(queue_dir, processes, max_jobs=None, **worker_kwargs):
+    """
+    Run several worker processes on this host and wait for them.
+
+    A worker stopped by recycle_after or max_rss_mb is replaced by a fresh process, so heap
+    fragmentation of long batches never accumulates. max_jobs counts the jobs of a worker slot
+    across its recycled processes.
+
+    :param queue_dir: shared queue folder
+    :param processes: number of worker processes
+    :param max_jobs: stop each worker slot after this many jobs (None for no limit)
+    :param worker_kwargs: run_worker keyword arguments
+    """
+    slots = [Value("i", 0) for _ in range(processes)]
+
+    def start(slot):
+        remaining = None if max_jobs is None else max_jobs - slots[slot].value
+        # Not daemonic: workers start their own process pools for CPU heavy stages
+        worker = Process(target=_worker_process, args=(queue_dir, slots[slot], dict(worker_kwargs, max_jobs=remaining)))
+        worker.start()
+        return worker
+
+    workers = {slot: start(slot) for slot in range(processes)}
+    recycled = 0
+    while workers:
+        wait([worker.sentinel for worker in workers.values()])
+        for slot, worker in list(workers.items()):
+            if worker.is_alive():
+                continue
+            worker.join()
+            del workers[slot]
+            if worker.exitcode == RECYCLE_EXIT_CODE:
+                recycled += 1
+                workers[slot] = start(slot)
+                logger.info(f"Recycled worker process {worker.pid} -> {workers[slot].pid}")
+            elif worker.exitcode != 0:
+                logger.error(f"Worker process {worker.pid} exited with code {worker.exitcode}")
+    logger.info(f"All workers stopped, {sum(slot.value for slot in slots)} jobs, {recycled} recycled processes")
+
+
+def format_status(status):
+    """
+    Format queue status for console output.
+
+    :param status: FileJobQueue.status() result
+    :return: status text
+    """
+    counts = status["counts"]
+    lines = [
+        "Jobs: " + ", ".join(f"{state} {count}" for state, count in counts.items()),
+        f"Stale leases: {status['stale_leases']}",
+        f"Live workers: {len(status['workers'])}",
+        f"Throughput: {status['throughput_per_min']:.2f} jobs/min",
+    ]
+    if status["mean_job_time"] is not None:
+        lines.append(f"Mean job time: {status['mean_job_time']:.1f}s")
+    memory = status.get("memory")
+    if memory:
+        steady = memory["mean_steady_rss_mb"]
+        lines.append(f"Memory per job: peak {memory['mean_peak_rss_mb']:.0f} MB (max {memory['max_peak_rss_mb']:.0f} MB), "
+                     f"steady " + (f"{steady:.0f} MB" if steady is not None else "unknown"))
+    eta = status["eta_min"]
+    lines.append(f"Backlog: {status['backlog']} jobs" + (f", ETA {eta:.1f} min" if eta is not None else ""))
+    for worker in sorted(status["workers"], key=lambda w: w["worker_id"]):
+        rss = worker.get("rss_mb")
+        lines.append(f"  {worker['worker_id']}: job {worker.get('job_id') or '-'}, done {worker.get('jobs_done', 0)}, "
+                     f"RSS " + (f"{rss:.0f} MB" if rss is not None else "unknown"))
+    return "\n".join(lines)
@@ -1,107 +1,306 @@
-import ezdxf
-
 from core.layouts import LayoutRegistry
-from core.project_area import generate_project_area_with_boundary
+from core.pipeline import Stage, StagePipeline
+from core.map_renderer import map_settings
+from core.plot_export import export_layouts
+from core.sheet_split import split_sheets
+from core.sheet_tiling import compute_tiles, find_main_viewport, tile_sheet_names, tile_window_size
+from core.project_area import get_project_boundary, fetch_project_area_img, draw_project_area
 from data.offices import get_office_info
-from utils.block_utils import copy_block_definition, replace_placeholder_text_with_block
+from utils.asset_store import AssetStore, XREF_FOLDER_NAME
+from utils.block_utils import copy_block_definition, replace_placeholders_with_blocks
+from utils.dxf_utils import clone_layout
 from utils.file_loader import load_cad_file
+from utils.memory import release_memory
 from ezdxf.xref import Loader
 from ezdxf.layouts import Paperspace
-from ezdxf.math import BoundingBox
 from pathlib import Path
 import logging
 
 logger = logging.getLogger(__name__)
 
 class DrawingGenerator:
-    def __init__(self, input_data):
+    def __init__(self, input_data, landbase_path="data/inputs/landbase.dxf", output_folder=None,
+                 tile_sheets=False, tile_overlap=0.1, export_formats=(), map_backend=None, map_data=None,
+                 asset_store=None, layouts=None, split_sheets=False):
+        """
+        :param input_data: project input data
+        :param landbase_path: path to the project landbase (DXF or DWG)
+        :param output_folder: folder for the output drawing and its xrefs, defaults to PROJECT_ROOT/output
+        :param tile_sheets: split layouts with a tile_scale into as many sheets as needed to cover the boundary
+        :param tile_overlap: min overlap between neighbouring sheet tiles as a fraction of the tile size
+        :param export_formats: render every layout to these formats after saving ("pdf", "png")
+        :param map_backend: project area map backend "mapbox" or "local", defaults to MAP_BACKEND from .env
+        :param map_data: local map extract (.mbtiles or .gpkg) for the local backend, defaults to MAP_DATA from .env
+        :param asset_store: folder of the content-addressed xref asset store shared by outputs,
+                            defaults to OUTPUT_FOLDER/assets
+        :param layouts: template layout names to generate, all template layouts with a registered
+                        layout class if None. Other template layouts are left out of the output
+        :param split_sheets: also write every sheet as its own DXF in OUTPUT_FOLDER/sheets
+        """
         self.doc = None
         self.input_data = input_data
+        self.landbase_path = str(landbase_path)
+        self.tile_sheets = tile_sheets
+        self.tile_overlap = tile_overlap
+        self.export_formats = tuple(export_formats)
+        self.layouts = list(layouts) if layouts else None
+        self.split_sheets = split_sheets
+        self.map_backend, self.map_data, self.map_style = map_settings(map_backend, map_data)
+        self.project_boundary = None
+        self.pipeline = None
 
         # Define paths
         self.PROJECT_ROOT = Path(__file__).resolve().parent.parent
         self.TEMPLATES_FOLDER = self.PROJECT_ROOT / "data" / "templates"
-        self.OUTPUT_FOLDER = self.PROJECT_ROOT / "output"
-        self.XREF_FOLDER = self.OUTPUT_FOLDER / "xref"
+        self.OUTPUT_FOLDER = Path(output_folder) if output_folder else self.PROJECT_ROOT / "output"
+        self.XREF_FOLDER = self.OUTPUT_FOLDER / XREF_FOLDER_NAME
+        self.asset_store = AssetStore(asset_store or self.OUTPUT_FOLDER / "assets")
 
         # Create folders
         self._init_folders()
 
 
     def _init_folders(self):
-        self.OUTPUT_FOLDER.mkdir(exist_ok=True)
+        self.OUTPUT_FOLDER.mkdir(parents=True, exist_ok=True)
         self.XREF_FOLDER.mkdir(exist_ok=True)
 
 
     def generate(self):
-        # Load the landbase
-        logger.info("Loading project landbase")
-        self.doc = load_cad_file("data/inputs/landbase.dxf")
+        """
+        Generate the drawing.
+
+        Generation steps are declared as a DAG of stages (see `_build_pipeline`) and run
+        by StagePipeline, so independent steps (landbase and template parsing, office lookup,
+        project area image request...) run concurrently.
+
+        The landbase and template documents are released as soon as the last stage using them
+        has finished (the template after merging its layouts, the drawing after saving) and
+        their memory is returned to the OS before this method returns.
+
+        :return: path to the saved DXF
+        """
+        self.pipeline = pipeline = self._build_pipeline()
+        context = pipeline.run(keep=["project_boundary", "dxf_path", "sheet_exports", "sheet_dxfs"])
+        self.doc = None
+        self.project_boundary = context["project_boundary"]
+        release_memory()
+        logger.info(f"Generation timings:\n{pipeline.timing_report()}")
+        return context["dxf_path"]
+
+
+    def _build_pipeline(self):
+        """
+        Declare the generation stages with their inputs and outputs.
+        CAD parsing, requests and input data formatting run in threads (returning parsed
+        documents from processes costs as much as parsing them again). ezdxf documents are
+        not thread-safe: every stage using the doc is chained through its outputs to the
+        stages editing it, so the doc is never used by two stages at once.
+
+        :return: StagePipeline
+        """
+        return StagePipeline([
+            # Load the landbase
+            Stage("load_landbase", load_cad_file, outputs=["doc"],
+                  kwargs={"file_path": self.landbase_path, "asset_store": self.asset_store}),
+            # Load the template
+            Stage("read_template", load_cad_file, outputs=["template_doc"],
+                  kwargs={"file_path": str(self._get_template_path())}),
+            # Preprocess input data for template population
+            Stage("format_technician", self._format_project_technician, outputs=["technician"]),
+            Stage("office_info", self._get_office_info, outputs=["office_info"]),
+            # Project area image
+            Stage("extract_boundary", get_project_boundary, inputs=["doc"], outputs=["boundary"]),
+            # Local map rendering is CPU bound, Mapbox requests wait on the network.
+            # The image is written to a unique temp file and moved into the asset store when it is inserted
+            Stage("fetch_project_area_img", fetch_project_area_img, inputs=["boundary"], outputs=["project_area_img"],
+                  executor="process" if self.map_backend == "local" else "thread",
+                  kwargs={"output_img": self.asset_store.temp_path(".png"), "backend": self.map_backend,
+                          "map_data": self.map_data, "map_style": self.map_style}),
+            # Select the layout classes to generate from the template layouts
+            Stage("select_layouts", self._select_layouts, inputs=["template_doc"],
+                  outputs=["template_order", "layout_classes"]),
+            # Load the template layouts, after the boundary is read from the same doc
+            Stage("merge_template_layouts", self._load_template_layouts,
+                  inputs=["doc", "template_doc", "layout_classes", "boundary"], outputs=["template_layouts"]),
+            # Clone tiled layouts per sheet tile
+            Stage("tile_sheets", self._tile_sheets, inputs=["doc", "boundary", "layout_classes", "template_layouts"],
+                  outputs=["sheet_layouts"]),
+            # Add project area image in msp
+            Stage("draw_project_area", self._draw_project_area,
+                  inputs=["doc", "boundary", "project_area_img", "sheet_layouts"], outputs=["project_boundary"]),
+            # Populate templates with input data and generate needed drawings on each layout template
+            Stage("populate_layouts", self._populate_layouts,
+                  inputs=["doc", "technician", "office_info", "project_boundary", "layout_classes",
+                          "template_order", "sheet_layouts"],
+                  outputs=["layouts"]),
+            # Save final DXF in output folder
+            Stage("save", self._save, inputs=["doc", "layouts"], outputs=["dxf_path"]),
+            # Render layouts to PDF/PNG
+            Stage("export_sheets", self._export_sheets, inputs=["dxf_path"], outputs=["sheet_exports"]),
+            # Write every sheet as its own DXF, after the export: both stages use a process per CPU
+            Stage("split_sheets", self._split_sheets, inputs=["dxf_path", "layouts", "sheet_exports"],
+                  outputs=["sheet_dxfs"]),
+        ])
+
+
+    def _select_layouts(self, template_doc):
+        """
+        Select the registered layout classes present in the template, restricted to the
+        requested layouts if any.
 
-        # Load the template layouts
-        self._load_template_layouts()
+        :param template_doc: loaded template doc
+        :return: template layout names in tab order, list of layout classes to generate
+        """
+        template_order = list(template_doc.layout_names_in_taborder())[1:]
+        layout_classes = LayoutRegistry.select(template_order, self.layouts)
+        logger.info(f"Generating layouts: {', '.join(cls.layout_name for cls in layout_classes)}")
+        return template_order, layout_classes
 
-        # Add project area image in msp
-        generate_project_area_with_boundary(self.doc, self.XREF_FOLDER)
 
-        # Preprocess input data for template population
-        self._process_input_data()
+    def _tile_sheets(self, doc, boundary, layout_classes, template_layouts):
+        """
+        Cover the project boundary with sheet tiles at the layout scale and clone the template
+        layout once per extra tile (CIV-01 -> CIV-01, CIV-02...).
+
+        :return: template layout name -> list of (sheet layout name, Tile), only for tiled layouts
+        """
+        sheet_layouts = {}
+        if not self.tile_sheets:
+            return sheet_layouts
+
+        for layout_cls in layout_classes:
+            if not layout_cls.tile_scale or layout_cls.layout_name not in template_layouts:
+                continue
+            viewport = find_main_viewport(doc.layouts.get(layout_cls.layout_name))
+            if viewport is None:
+                logger.warning(f"No main viewport in {layout_cls.layout_name}, skipping sheet tiling.")
+                continue
+
+            width, height = tile_window_size(viewport, layout_cls.tile_scale)
+            tiles = compute_tiles(boundary.points, width, height, overlap=self.tile_overlap)
+            names = tile_sheet_names(layout_cls.layout_name, len(tiles))
+            # Clone in reverse so every copy lands right after the template layout in order
+            for name in reversed(names[1:]):
+                clone_layout(doc, layout_cls.layout_name, name)
+            sheet_layouts[layout_cls.layout_name] = list(zip(names, tiles))
+            logger.info(f"{layout_cls.layout_name} split into {len(tiles)} sheets at 1:{layout_cls.tile_scale}")
+        return sheet_layouts
+
+
+    def _draw_project_area(self, doc, boundary, project_area_img, sheet_layouts):
+        """
+        Draw the project area image and boundary in modelspace, after sheet layouts are set up.
+        """
+        return draw_project_area(doc, boundary, project_area_img,
+                                 asset_store=self.asset_store, drawing_folder=self.OUTPUT_FOLDER)
+
+
+    def _populate_layouts(self, doc, technician, office_info, project_boundary, layout_classes,
+                          template_order, sheet_layouts):
+        """
+        Populate the selected layouts (and their sheet tiles) with input data.
+        Sheets are numbered in template order, so a sheet keeps its number in the set when
+        only some layouts are generated (layouts that are not generated count as one sheet).
+
+        :return: names of populated layouts
+        """
+        self.doc = doc
+        self.project_boundary = project_boundary
+        sheet_names = [sheet_name for layout_name in template_order
+                       for sheet_name, _ in sheet_layouts.get(layout_name, [(layout_name, None)])]
+        sheet_numbers = {sheet_name: number for number, sheet_name in enumerate(sheet_names, start=1)}
+        self._process_input_data(technician, office_info, sheet_max=len(sheet_names))
 
-        # Populate templates with input data and generate needed drawings on each layout template
         logger.info("Generating all layouts dynamically")
-        for layout_cls in LayoutRegistry.get_all():
-            layout_instance = layout_cls(self.doc, self.input_data)
-            layout_instance.edit()
+        layouts = []
+        for layout_cls in layout_classes:
+            sheets = sheet_layouts.get(layout_cls.layout_name, [(layout_cls.layout_name, None)])
+            for layout_name, tile in sheets:
+                layout_instance = layout_cls(self.doc, self.input_data, layout_name=layout_name, tile=tile,
+                                             sheet_number=sheet_numbers[layout_name])
+                layout_instance.edit()
+                layouts.append(layout_instance.layout_name)
         logger.info("Processed all layouts")
+        return layouts
 
-        # Save final DXF in output folder
+
+    def _save(self, doc, layouts):
+        """
+        Save final DXF in output folder.
+
+        :return: path to saved DXF
+        """
         dxf_path = self.OUTPUT_FOLDER / "drawing.dxf"
-        self.doc.saveas(str(dxf_path))
+        doc.saveas(str(dxf_path))
         logger.info(f"Saved output DXF: {dxf_path}")
+        # Unlink assets of a previous generation into this folder, so the asset store can collect them
+        self.asset_store.prune_xrefs(self.OUTPUT_FOLDER, [image_def.dxf.filename
+                                                           for image_def in doc.objects.query("IMAGEDEF")])
+        # Last use of the doc, drop the reference taken in _populate_layouts so it can be freed
+        self.doc = None
+        return dxf_path
+
 
+    def _export_sheets(self, dxf_path):
+        """
+        Render all layouts of the saved DXF to export formats, if any are set.
+        Layouts are read from the saved file, the doc is not needed any more.
 
-    def _process_input_data(self):
+        :return: export result, None if export is disabled
+        """
+        if not self.export_formats:
+            return None
+        return export_layouts(dxf_path, self.OUTPUT_FOLDER, formats=self.export_formats)
+
+
+    def _split_sheets(self, dxf_path, layouts, sheet_exports):
+        """
+        Write every populated sheet of the saved DXF as its own DXF, if enabled.
+        Runs after the export (sheet_exports is only an ordering input).
+
+        :return: split result, None if disabled
+        """
+        if not self.split_sheets:
+            return None
+        return split_sheets(dxf_path, self.OUTPUT_FOLDER, layouts=layouts)
+
+
+    def _process_input_data(self, technician=None, office_info=None, sheet_max=None):
         logger.debug("Processing input data")
         # Add SHEET_MAX attr - how many sheets the project has
-        self.input_data["SHEET_MAX"] = len(self.doc.layouts)-1
-        # Format PROJECT_TECHNICIAN value
-        self._format_project_technician()
+        self.input_data["SHEET_MAX"] = sheet_max if sheet_max is not None else len(self.doc.layouts)-1
+        # Add formatted PROJECT_TECHNICIAN value
+        if technician:
+            self.input_data["PROJECT_TECHNICIAN"] = technician
         # Add office info
-        self._add_office_info()
+        self.input_data.update(office_info or {})
         # Add required data about project area image
         self._add_project_area_img_input_data()
 
 
-    def _add_project_area_img_input_data(self, boundary_layer="MAP_BOUNDARY", margin_factor=1.15):
+    def _add_project_area_img_input_data(self, margin_factor=1.15):
         """
-        Add required data about project area image from modelspace to input data.
+        Add required data about project area image to input data.
         Required data:
             project boundary bounding box height with added margin
             project boundary centroid
-        Project area image is found from modelspace based on project boundary that is in boundary_layer
-        and on top of the Project area image.
+        Uses the boundary drawn on top of the Project area image, its bounding box is computed once
+        when the boundary is drawn and is not re-queried from modelspace.
 
-        :param boundary_layer: layer in modelspace where the boundary is
         :param margin_factor: factor to determine a margin size
         """
-        # Find boundary polyline in given layer
-        boundary = None
-        for e in self.doc.modelspace().query(f'LWPOLYLINE[layer=="{boundary_layer}"]'):
-            boundary = e
-            break
-        if boundary is None:
-            raise ValueError(f"No LWPOLYLINE found on layer '{boundary_layer}'.")
-
-        # Compute project area bounding box and centroid & add it to input data
-        bbox = BoundingBox(boundary.get_points('xy'))
-        if not bbox.has_data:
-            raise ValueError("Boundary bounding box is empty.")
-        centroid = bbox.center  # Vec3(x, y, z)
-        self.input_data["PA_MSP_CENTER_POINT"] = (centroid.x, centroid.y)
-        logger.debug(f"Project area img Viewport model center (centroid): ({centroid.x:.3f}, {centroid.y:.3f})")
+        if self.project_boundary is None:
+            raise ValueError("Project boundary is not generated.")
+
+        # Add project area bounding box center to input data
+        centroid = self.project_boundary.center
+        self.input_data["PA_MSP_CENTER_POINT"] = (float(centroid[0]), float(centroid[1]))
+        logger.debug(f"Project area img Viewport model center (centroid): ({centroid[0]:.3f}, {centroid[1]:.3f})")
 
         # Compute project area view height & add it to input data
-        height = bbox.size.y
+        height = float(self.project_boundary.size[1])
+        if height <= 0:
+            raise ValueError("Boundary bounding box is empty.")
         view_height = height * margin_factor
         self.input_data["PA_MSP_HEIGHT"] = view_height
         logger.debug(f"Project area img height in msp (with margin): {view_height:.3f}")
@@ -111,30 +310,30 @@ class DrawingGenerator:
         """
         Format project technician value.
         Format: FIRST_INITIAL.LASTNAME
-        :return: formatted project technician value
+        :return: formatted project technician value, None if no technician is specified
         """
         name = self.input_data.get("PROJECT_TECHNICIAN", None)
         if not name:
             logger.info("No project technician specified. Skipping Tech import.")
-            return
+            return None
         parts = name.split()
         if len(parts) >= 2:
-            initials = f"{parts[0][0]}.{parts[1]}".upper()
-            self.input_data["PROJECT_TECHNICIAN"] = initials
+            return f"{parts[0][0]}.{parts[1]}".upper()
         else:
             raise ValueError(f"Unexpected name format: {name}")
 
 
-    def _add_office_info(self):
+    def _get_office_info(self):
         """
-        Add the office info to the input data based on the MUNICIPALITY from inputs.
+        Get the office info for the input data based on the MUNICIPALITY from inputs.
+        :return: office info with upper case keys and values
         """
         municipality_name = self.input_data.get("MUNICIPALITY")
         if not municipality_name:
             logger.info("No municipality specified. Skipping Office info import.")
+            return {}
         office = get_office_info(municipality_name)
-        for key, value in office.items():
-            self.input_data[key.upper()] = value.upper()
+        return {key.upper(): value.upper() for key, value in office.items()}
 
 
     def _add_engineer_stamps(self):
@@ -155,8 +354,8 @@ class DrawingGenerator:
         stamps_doc = load_cad_file("data/block_libraries/engineer_stamps.dxf")
         copy_block_definition(block_name, stamps_doc, self.doc)
 
-        # Replace placeholders with the engineer stamp block reference
-        replace_placeholder_text_with_block(self.doc, search_text="ENGINEER STAMP", block_name=block_name)
+        # Replace placeholders with the engineer stamp block reference, in paperspace layouts only
+        replace_placeholders_with_blocks(self.doc, {"ENGINEER STAMP": block_name})
 
 
     def _load_landbase(self):
@@ -178,21 +377,27 @@ class DrawingGenerator:
         logger.info("Imported landbase from inputs")
 
 
-    def _load_template_layouts(self):
+    def _load_template_layouts(self, doc, template_doc, layout_classes, boundary=None):
         """
         Load template layout definitions (paperspace).
         Remove default Layout1 after importing new layouts.
         Preserve layout tab order from template.
+        When only some layouts are requested, only the layouts of the selected classes are loaded.
+
+        :param doc: drawing doc to load the layouts into
+        :param template_doc: loaded template doc
+        :param layout_classes: selected layout classes
+        :param boundary: unused, orders the merge after the boundary extraction reading the doc
+        :return: names of loaded template layouts
         """
         logger.debug("Adding project template layouts")
-
-        # Load the template DXF
-        template_path = self._get_template_path()
-        template_doc = ezdxf.readfile(template_path)
-        loader = Loader(template_doc, self.doc)
+        loader = Loader(template_doc, doc)
 
         # Preserve layout order from template
         template_layout_order = list(template_doc.layout_names_in_taborder())[1:]
+        if self.layouts:
+            selected = {layout_cls.layout_name for layout_cls in layout_classes}
+            template_layout_order = [name for name in template_layout_order if name in selected]
 
         for layout_name in template_layout_order:
             layout = template_doc.layouts.get(layout_name)
@@ -204,13 +409,14 @@ class DrawingGenerator:
 
         # DELETE the default "Layout1" if it exists
         try:
-            if "Layout1" in self.doc.layout_names_in_taborder():
-                self.doc.layouts.delete("Layout1")
+            if "Layout1" in doc.layout_names_in_taborder():
+                doc.layouts.delete("Layout1")
                 logger.debug("Deleted default Layout1")
         except Exception as e:
             logger.warning(f"Could not delete Layout1: {e}")
 
         logger.info("Added project template layouts")
+        return template_layout_order
 
 
     def _get_template_path(self):
@@ -219,11 +425,20 @@ class DrawingGenerator:
         Check if template file exists before returning.
         """
         template_type = self.input_data.get("TEMPLATE_TYPE", "")
-
-        template_name = f"ALECTRA {template_type} Template.dxf"
-        template_path = self.TEMPLATES_FOLDER / template_name
+        template_path = get_template_path(self.TEMPLATES_FOLDER, template_type)
 
         if not template_path.exists():
             raise FileNotFoundError(f"Template '{template_type}' not found: {template_path}")
 
-        return template_path
\ No newline at end of file
+        return template_path
+
+
+def get_template_path(templates_folder, template_type):
+    """
+    Build the template file path for a template type.
+
+    :param templates_folder: folder with template files
+    :param template_type: TEMPLATE_TYPE from inputs e.g. "ArchB (11x17)"
+    :return: template file path
+    """
+    return Path(templates_folder) / f"ALECTRA {template_type} Template.dxf"
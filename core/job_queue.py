@@ -0,0 +1,285 @@
+from pathlib import Path
+import json
+import os
+import socket
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+class FileJobQueue:
+    """
+    Job queue on a shared directory, without an external broker.
+
+    Every job is a JSON file and its state is the folder it is in:
+        pending/<job_id>.json               waiting for a worker
+        leased/<job_id>.<worker_id>.json    taken by a worker, file mtime is the worker heartbeat
+        done/<job_id>.json                  finished, with result metrics
+        failed/<job_id>.json                failed max_attempts times
+    Jobs are leased with an atomic rename, so only one worker can take a job.
+    Leases without a heartbeat for lease_timeout seconds are abandoned and retried.
+    Worker heartbeats are kept in workers/<worker_id>.json and job outputs in outputs/<job_id>/.
+    Lease and heartbeat ages are measured against the share clock (see now()), so workers on hosts
+    with skewed clocks agree on which leases are abandoned.
+
+    :ivar root: queue root folder
+    :ivar lease_timeout: seconds without heartbeat after which a lease is abandoned
+    :ivar max_attempts: how many times a job is tried before it is moved to failed
+    """
+
+    STATES = ("pending", "leased", "done", "failed")
+
+    def __init__(self, root, lease_timeout=120, max_attempts=3):
+        self.root = Path(root)
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        for folder in (*self.STATES, "tmp", "workers", "outputs"):
+            (self.root / folder).mkdir(parents=True, exist_ok=True)
+
+    def _write_json(self, path, data):
+        """
+        Write JSON atomically (write into tmp, then rename).
+        """
+        tmp_path = self.root / "tmp" / f"{path.name}.{uuid.uuid4().hex}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, default=str)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_json(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _read_folder(self, state):
+        """
+        Read all JSON files in a queue folder, skipping files moved away while reading.
+        """
+        for path in (self.root / state).glob("*.json"):
+            try:
+                yield path, self._read_json(path)
+            except FileNotFoundError:
+                continue
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def now(self):
+        """
+        Current time on the share: mtime of a probe file written into tmp.
+        File mtimes are set by the file server, so they can be compared with this time whatever the local clock is.
+        Falls back to the local clock if the probe can not be written.
+
+        :return: seconds since the epoch
+        """
+        probe = self.root / "tmp" / f"now.{uuid.uuid4().hex}"
+        try:
+            probe.touch()
+            try:
+                return probe.stat().st_mtime
+            finally:
+                probe.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Could not read the share time from {probe.parent}, using the local clock: {e}")
+            return time.time()
+
+    def submit(self, input_data, landbase, job_id=None):
+        """
+        Add a job to the queue.
+
+        :param input_data: project input data
+        :param landbase: path to the project landbase, must be reachable from all workers
+        :param job_id: job id, generated from PROJECT_WORK_ORDER if not given
+        :return: job id
+        """
+        if not job_id:
+            work_order = input_data.get("PROJECT_WORK_ORDER", "job")
+            job_id = f"{work_order}-{uuid.uuid4().hex[:8]}"
+        if any(self._find(job_id, state) for state in self.STATES):
+            raise ValueError(f"Job '{job_id}' already exists in queue {self.root}")
+
+        job = {
+            "job_id": job_id,
+            "input_data": input_data,
+            "landbase": str(Path(landbase).resolve()),
+            "attempts": 0,
+            "errors": [],
+            "submitted_at": self.now(),
+        }
+        self._write_json(self.root / "pending" / f"{job_id}.json", job)
+        logger.info(f"Submitted job {job_id}")
+        return job_id
+
+    def _find(self, job_id, state):
+        """
+        Find job files of job_id in a state folder.
+        """
+        folder = self.root / state
+        if state == "leased":
+            return list(folder.glob(f"{job_id}.*.json"))
+        path = folder / f"{job_id}.json"
+        return [path] if path.exists() else []
+
+    def lease(self, worker_id):
+        """
+        Lease the oldest pending job.
+
+        :param worker_id: id of the leasing worker (must not contain dots)
+        :return: (job, lease_path) or (None, None) if no job is pending
+        """
+        pending = sorted((self.root / "pending").glob("*.json"), key=lambda p: self._mtime(p) or 0)
+        for path in pending:
+            lease_path = self.root / "leased" / f"{path.stem}.{worker_id}.json"
+            try:
+                # Start the heartbeat clock from lease time: rename keeps the mtime, a pending file
+                # renamed as is would look like a stale lease to reclaim_abandoned()
+                os.utime(path)
+                os.rename(path, lease_path)
+                job = self._read_json(lease_path)
+            except FileNotFoundError:
+                # Another worker took it first, or reclaimed it right after the rename
+                continue
+            logger.info(f"Worker {worker_id} leased job {job['job_id']}")
+            return job, lease_path
+        return None, None
+
+    @staticmethod
+    def heartbeat(lease_path):
+        """
+        Renew a lease.
+
+        :param lease_path: path returned by lease()
+        """
+        os.utime(lease_path)
+
+    def complete(self, job, lease_path, result):
+        """
+        Mark a leased job as done.
+
+        :param job: leased job
+        :param lease_path: path returned by lease()
+        :param result: result metrics to store with the job
+        """
+        job["result"] = result
+        job["finished_at"] = self.now()
+        self._write_json(self.root / "done" / f"{job['job_id']}.json", job)
+        lease_path.unlink(missing_ok=True)
+        logger.info(f"Job {job['job_id']} done")
+
+    def fail(self, job, lease_path, error):
+        """
+        Record a failed attempt. The job is retried until max_attempts is reached.
+
+        :param job: leased job
+        :param lease_path: path returned by lease()
+        :param error: error description
+        """
+        job["attempts"] += 1
+        job["errors"].append(str(error))
+        self._requeue(job)
+        lease_path.unlink(missing_ok=True)
+
+    def _requeue(self, job):
+        """
+        Move a job back to pending, or to failed if it has no attempts left.
+        """
+        if job["attempts"] >= self.max_attempts:
+            job["finished_at"] = self.now()
+            self._write_json(self.root / "failed" / f"{job['job_id']}.json", job)
+            logger.error(f"Job {job['job_id']} failed after {job['attempts']} attempts")
+        else:
+            self._write_json(self.root / "pending" / f"{job['job_id']}.json", job)
+            logger.warning(f"Job {job['job_id']} requeued (attempt {job['attempts']} of {self.max_attempts})")
+
+    def reclaim_abandoned(self, worker_id):
+        """
+        Requeue leases whose worker stopped sending heartbeats.
+        A stale lease is first claimed with an atomic rename, so only one worker reclaims it.
+
+        :param worker_id: id of the reclaiming worker
+        :return: number of reclaimed jobs
+        """
+        reclaimed = 0
+        now = self.now()
+        for lease_path in (self.root / "leased").glob("*.json"):
+            mtime = self._mtime(lease_path)
+            if mtime is None or now - mtime < self.lease_timeout:
+                continue
+            try:
+                claim_path = self.root / "tmp" / f"{lease_path.name}.reclaim.{worker_id}"
+                os.rename(lease_path, claim_path)
+            except FileNotFoundError:
+                continue
+            job = self._read_json(claim_path)
+            job["attempts"] += 1
+            job["errors"].append(f"Lease abandoned by worker {lease_path.stem.rsplit('.', 1)[-1]}")
+            self._requeue(job)
+            claim_path.unlink(missing_ok=True)
+            reclaimed += 1
+        return reclaimed
+
+    def output_folder(self, job_id):
+        """
+        :return: output folder of a job
+        """
+        return self.root / "outputs" / job_id
+
+    @property
+    def asset_store_folder(self):
+        """
+        Asset store shared by all job outputs of the queue (same file system, so assets are hardlinked).
+        """
+        return self.root / "assets"
+
+    def update_worker(self, worker_id, **info):
+        """
+        Write the worker heartbeat file. Its mtime is the heartbeat time on the share clock.
+
+        :param worker_id: worker id
+        :param info: worker status info
+        """
+        info.update({"worker_id": worker_id, "host": socket.gethostname(), "pid": os.getpid(), "updated_at": time.time()})
+        self._write_json(self.root / "workers" / f"{worker_id}.json", info)
+
+    def status(self, window=900):
+        """
+        Collect queue status.
+
+        :param window: seconds of finished jobs used to compute throughput
+        :return: dict with counts per state, live workers, throughput, memory per job and backlog estimate
+        """
+        now = self.now()
+        counts = {state: len(list((self.root / state).glob("*.json"))) for state in self.STATES}
+        lease_times = [self._mtime(p) for p in (self.root / "leased").glob("*.json")]
+        stale = sum(1 for mtime in lease_times if mtime is not None and now - mtime >= self.lease_timeout)
+        workers = [info for path, info in self._read_folder("workers")
+                   if not info.get("stopped") and now - (self._mtime(path) or 0) < self.lease_timeout]
+        recent = [job for _, job in self._read_folder("done") if now - job.get("finished_at", 0) <= window]
+        # Measure over the window, or since the first recent job started if the batch is younger
+        starts = [job["result"].get("started_at", now - window) for job in recent]
+        span = min(window, now - min(starts)) if starts else window
+        throughput = len(recent) / span * 60 if span > 0 else 0.0
+        durations = [job["result"]["wall_time"] for job in recent if "wall_time" in job.get("result", {})]
+        memory = [job["result"]["memory"] for job in recent if "memory" in job.get("result", {})]
+        peaks = [m["peak_rss_mb"] for m in memory if m.get("peak_rss_mb") is not None]
+        steady = [m["steady_rss_mb"] for m in memory if m.get("steady_rss_mb") is not None]
+        backlog = counts["pending"] + counts["leased"]
+
+        return {
+            "counts": counts,
+            "stale_leases": stale,
+            "workers": workers,
+            "throughput_per_min": throughput,
+            "mean_job_time": sum(durations) / len(durations) if durations else None,
+            "memory": {
+                "mean_peak_rss_mb": sum(peaks) / len(peaks),
+                "max_peak_rss_mb": max(peaks),
+                "mean_steady_rss_mb": sum(steady) / len(steady) if steady else None,
+            } if peaks else None,
+            "backlog": backlog,
+            "eta_min": backlog / throughput if throughput else None,
+        }
@@ -1,6 +1,7 @@
 import logging
 from ezdxf.entities import Insert
 from config.viewport_config import VIEWPORT_CONFIG
+from core.sheet_tiling import find_main_viewport, set_viewport_view
 
 logger = logging.getLogger(__name__)
 
@@ -17,9 +18,13 @@ class BaseLayout:
     :ivar block_attrs: Dictionary of input data including shared and layout-specific attributes.
     :ivar layout_name: Name of the layout in the DXF file. Must be overridden in subclasses.
     :ivar layout: The specific layout object retrieved from the document.
+    :ivar tile_scale: Scale denominator of the main viewport for sheet tiling, None if the layout is not tiled.
+    :ivar tile: Tile shown in the main viewport of this sheet, None for untiled sheets.
+    :ivar sheet_number: Number of this sheet in the drawing set, None to use the layout tab order.
     """
 
     layout_name = None
+    tile_scale = None
 
     def __init_subclass__(cls, **kwargs):
         """
@@ -31,17 +36,26 @@ class BaseLayout:
             from core.layouts.layout_registry import LayoutRegistry
             LayoutRegistry.register(cls)
 
-    def __init__(self, doc, block_attrs):
+    def __init__(self, doc, block_attrs, layout_name=None, tile=None, sheet_number=None):
         """
         Initialize the layout editor.
 
         :param doc: The DXF document being edited.
         :param block_attrs: Dictionary containing shared and layout-specific inputs.
+        :param layout_name: Name of a tiled copy of the layout, defaults to the class layout_name.
+        :param tile: Tile to show in the main viewport.
+        :param sheet_number: Number of the sheet in the full drawing set, when only part of the set is generated.
         """
         self.doc = doc
         self.block_attrs = block_attrs
+        self.tile = tile
+        self.sheet_number = sheet_number
+        if layout_name:
+            self.layout_name = layout_name
         if not self.layout_name:
             raise ValueError(f"{self.__class__.__name__} must define layout_name")
+        if self.layout_name not in self.doc.layouts:
+            raise ValueError(f"Layout '{self.layout_name}' of {self.__class__.__name__} not found in the drawing")
         self.layout = self.doc.layouts.get(self.layout_name)
 
 
@@ -60,6 +74,10 @@ class BaseLayout:
                         attrib.dxf.text = self.block_attrs[tag]
                         logger.debug(f"[ATTRIB] Updated {tag} with {attrib.dxf.text}")
 
+        # Point main viewport to the sheet tile
+        if self.tile is not None:
+            self._set_tile_viewport()
+
         # Add project area viewport
         self._add_project_area_viewport()
 
@@ -84,6 +102,8 @@ class BaseLayout:
         Find the current sheet (layout) number.
         :return: sheet number, None if no sheet is found
         """
+        if self.sheet_number is not None:
+            return self.sheet_number
         layouts = self.doc.layout_names_in_taborder()
         return next((i for i, layout_name in enumerate(layouts) if layout_name == self.layout_name), None)
 
@@ -100,6 +120,17 @@ class BaseLayout:
         return project_work_order + '-' + self.layout_name
 
 
+    def _set_tile_viewport(self):
+        """
+        Point the main drawing viewport to the sheet tile.
+        """
+        viewport = find_main_viewport(self.layout)
+        if viewport is None:
+            raise ValueError(f"No main viewport in {self.layout_name} layout for sheet tiling.")
+        set_viewport_view(viewport, self.tile)
+        logger.info(f"Main viewport of {self.layout_name} layout set to {self.tile}")
+
+
     def _add_project_area_viewport(self):
         """
         Create viewport to the project area image based on VIEWPORT_CONFIG.
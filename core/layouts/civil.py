@@ -5,10 +5,11 @@ logger = logging.getLogger(__name__)
 
 class CivilDrawing(BaseLayout):
     layout_name = "CIV-01"
+    tile_scale = 500
 
     def add_layout_specific_attrs(self):
         # todo import correct scale from inputs
-        self.block_attrs["SCALE"] = '1:500'
+        self.block_attrs["SCALE"] = f'1:{self.tile_scale}'
 
     def edit_specific(self):
         logger.info(f"Custom edits for {self.layout_name}")
\ No newline at end of file
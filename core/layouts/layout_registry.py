@@ -29,4 +29,35 @@ class LayoutRegistry:
 
         :return: A list of registered layout classes.
         """
-        return cls._registry
\ No newline at end of file
+        return cls._registry
+
+    @classmethod
+    def select(cls, available_layouts, layout_names=None):
+        """
+        Select the registered layout classes to generate for a template.
+        Classes whose layout is not in the template are skipped.
+
+        :param available_layouts: layout names present in the drawing template.
+        :param layout_names: subset of layout names to generate, all available layouts if None.
+        :return: A list of selected layout classes, in registration order.
+        """
+        available_layouts = set(available_layouts)
+        if layout_names is not None:
+            layout_names = set(layout_names)
+            unknown = layout_names - {layout_class.layout_name for layout_class in cls._registry}
+            if unknown:
+                raise ValueError(f"No registered layout class for: {', '.join(sorted(unknown))}")
+            missing = layout_names - available_layouts
+            if missing:
+                raise ValueError(f"Layouts not found in the template: {', '.join(sorted(missing))}")
+
+        selected = []
+        for layout_class in cls._registry:
+            if layout_class.layout_name not in available_layouts:
+                logger.info(f"Skipping {layout_class.__name__}: layout {layout_class.layout_name} not in template")
+                continue
+            if layout_names is None or layout_class.layout_name in layout_names:
+                selected.append(layout_class)
+        if not selected:
+            raise ValueError("No registered layout found in the template")
+        return selected
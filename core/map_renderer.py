@@ -0,0 +1,493 @@
+from functools import lru_cache
+from pathlib import Path
+from dotenv import load_dotenv
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+from pyproj import Transformer
+import json
+import math
+import os
+import re
+import time
+import numpy as np
+import logging
+from utils.map_sources import open_map_source
+
+logger = logging.getLogger(__name__)
+
+MAP_BACKENDS = ("mapbox", "local")
+DEFAULT_STYLE = Path(__file__).resolve().parent.parent / "enlarged-text-size-mapbox-style.json"
+SUPPORTED_LAYER_TYPES = ("background", "fill", "line", "symbol")
+
+# Map width in pixels at zoom 0 for 512 px tiles (Mapbox GL zoom levels)
+_WORLD_SIZE_PX = 512
+_EARTH_CIRCUMFERENCE = 40075016.686
+
+def map_settings(backend=None, map_data=None, map_style=None):
+    """
+    Resolve the project area map backend. Missing values are read from the environment (.env):
+        MAP_BACKEND - "mapbox" (static images API, default) or "local" (rendered from local data)
+        MAP_DATA    - local map extract (.mbtiles or .gpkg), required by the local backend
+        MAP_STYLE   - Mapbox GL style JSON, defaults to the bundled style
+
+    :return: (backend, map_data, map_style)
+    """
+    load_dotenv()
+    backend = backend or os.getenv("MAP_BACKEND") or "mapbox"
+    if backend not in MAP_BACKENDS:
+        raise ValueError(f"Unknown map backend '{backend}'. Use one of {MAP_BACKENDS}")
+    map_data = map_data or os.getenv("MAP_DATA")
+    map_style = map_style or os.getenv("MAP_STYLE") or DEFAULT_STYLE
+    if backend == "local" and not map_data:
+        raise ValueError("Local map backend needs map data (MAP_DATA .mbtiles or .gpkg file)")
+    return backend, map_data, map_style
+
+
+# -----  Style expressions  -----
+
+@lru_cache(maxsize=256)
+def parse_color(value):
+    """
+    Parse a style color (hsl, hsla, rgb, rgba, hex or CSS name).
+
+    :return: (r, g, b, a) with r, g, b in 0-255 and alpha in 0-1
+    """
+    match = re.fullmatch(r"\s*(hsla?|rgba?)\(([^)]*)\)\s*", value)
+    if match:
+        kind, args = match.group(1), [arg.strip() for arg in match.group(2).split(",")]
+        alpha = float(args[3]) if len(args) > 3 else 1.0
+        if kind.startswith("hsl"):
+            hue, saturation, lightness = float(args[0]), float(args[1].rstrip("%")), float(args[2].rstrip("%"))
+            r, g, b = ImageColor.getrgb(f"hsl({hue % 360},{saturation}%,{lightness}%)")
+        else:
+            r, g, b = (float(arg) for arg in args[:3])
+        return float(r), float(g), float(b), alpha
+    rgb = ImageColor.getrgb(value)
+    return float(rgb[0]), float(rgb[1]), float(rgb[2]), (rgb[3] / 255 if len(rgb) > 3 else 1.0)
+
+
+def _to_string(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _to_number(values):
+    for value in values:
+        if isinstance(value, bool):
+            return float(value)
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            continue
+    return 0.0
+
+
+def _compare(op, a, b):
+    if op == "==":
+        return a == b
+    if op == "!=":
+        return a != b
+    if a is None or b is None or isinstance(a, str) != isinstance(b, str):
+        return False
+    return {"<": a < b, "<=": a <= b, ">": a > b, ">=": a >= b}[op]
+
+
+def _bezier_progress(t, x1, y1, x2, y2):
+    """
+    Solve a CSS cubic-bezier easing curve for progress t.
+    """
+    def bezier(p1, p2, s):
+        return 3 * (1 - s) ** 2 * s * p1 + 3 * (1 - s) * s ** 2 * p2 + s ** 3
+
+    low, high = 0.0, 1.0
+    for _ in range(30):
+        mid = (low + high) / 2
+        if bezier(x1, x2, mid) < t:
+            low = mid
+        else:
+            high = mid
+    return bezier(y1, y2, (low + high) / 2)
+
+
+def _interpolate_values(a, b, t):
+    if isinstance(a, str):
+        a = parse_color(a)
+    if isinstance(b, str):
+        b = parse_color(b)
+    if isinstance(a, (tuple, list)):
+        return type(a)(x + (y - x) * t for x, y in zip(a, b))
+    return a + (b - a) * t
+
+
+def _interpolate(args, zoom, feature):
+    kind, value = args[0], evaluate(args[1], zoom, feature)
+    value = _to_number([value])
+    stops = [(args[i], args[i + 1]) for i in range(2, len(args), 2)]
+    if value <= stops[0][0]:
+        return evaluate(stops[0][1], zoom, feature)
+    if value >= stops[-1][0]:
+        return evaluate(stops[-1][1], zoom, feature)
+    for (low, low_out), (high, high_out) in zip(stops, stops[1:]):
+        if low <= value <= high:
+            t = (value - low) / (high - low)
+            if kind[0] == "exponential" and kind[1] != 1:
+                base = kind[1]
+                t = (base ** (value - low) - 1) / (base ** (high - low) - 1)
+            elif kind[0] == "cubic-bezier":
+                t = _bezier_progress(t, *kind[1:5])
+            elif kind[0] != "linear" and kind[0] != "exponential":
+                raise ValueError(f"Unsupported interpolation type '{kind[0]}'")
+            return _interpolate_values(evaluate(low_out, zoom, feature), evaluate(high_out, zoom, feature), t)
+
+
+def _step(args, zoom, feature):
+    value = _to_number([evaluate(args[0], zoom, feature)])
+    output = args[1]
+    for i in range(2, len(args), 2):
+        if value < args[i]:
+            break
+        output = args[i + 1]
+    return evaluate(output, zoom, feature)
+
+
+def _match(args, zoom, feature):
+    value = evaluate(args[0], zoom, feature)
+    for i in range(1, len(args) - 1, 2):
+        labels = args[i] if isinstance(args[i], list) else [args[i]]
+        if value in labels:
+            return evaluate(args[i + 1], zoom, feature)
+    return evaluate(args[-1], zoom, feature)
+
+
+def _case(args, zoom, feature):
+    for i in range(0, len(args) - 1, 2):
+        if evaluate(args[i], zoom, feature):
+            return evaluate(args[i + 1], zoom, feature)
+    return evaluate(args[-1], zoom, feature)
+
+
+def _coalesce(args, zoom, feature):
+    for arg in args:
+        value = evaluate(arg, zoom, feature)
+        if value is not None:
+            return value
+    return None
+
+
+def _properties(feature):
+    return feature.properties if feature is not None else {}
+
+
+_OPERATORS = {
+    "literal": lambda args, zoom, feature: args[0],
+    "zoom": lambda args, zoom, feature: zoom,
+    "get": lambda args, zoom, feature: _properties(feature).get(args[0]),
+    "has": lambda args, zoom, feature: args[0] in _properties(feature),
+    "geometry-type": lambda args, zoom, feature: feature.geom_type if feature is not None else None,
+    "!": lambda args, zoom, feature: not evaluate(args[0], zoom, feature),
+    "all": lambda args, zoom, feature: all(evaluate(arg, zoom, feature) for arg in args),
+    "any": lambda args, zoom, feature: any(evaluate(arg, zoom, feature) for arg in args),
+    "case": _case,
+    "coalesce": _coalesce,
+    "match": _match,
+    "step": _step,
+    "interpolate": _interpolate,
+    "to-number": lambda args, zoom, feature: _to_number([evaluate(arg, zoom, feature) for arg in args]),
+    "to-string": lambda args, zoom, feature: _to_string(evaluate(args[0], zoom, feature)),
+    "to-boolean": lambda args, zoom, feature: bool(evaluate(args[0], zoom, feature)),
+    "concat": lambda args, zoom, feature: "".join(_to_string(evaluate(arg, zoom, feature)) for arg in args),
+    "image": lambda args, zoom, feature: evaluate(args[0], zoom, feature),
+    "+": lambda args, zoom, feature: sum(_to_number([evaluate(arg, zoom, feature)]) for arg in args),
+    "*": lambda args, zoom, feature: math.prod(_to_number([evaluate(arg, zoom, feature)]) for arg in args),
+    "-": lambda args, zoom, feature: (
+        -_to_number([evaluate(args[0], zoom, feature)]) if len(args) == 1
+        else _to_number([evaluate(args[0], zoom, feature)]) - _to_number([evaluate(args[1], zoom, feature)])
+    ),
+    "sqrt": lambda args, zoom, feature: math.sqrt(max(_to_number([evaluate(args[0], zoom, feature)]), 0)),
+}
+for _op in ("==", "!=", "<", "<=", ">", ">="):
+    _OPERATORS[_op] = (lambda op: lambda args, zoom, feature: _compare(
+        op, evaluate(args[0], zoom, feature), evaluate(args[1], zoom, feature)))(_op)
+
+
+def evaluate(expression, zoom, feature=None):
+    """
+    Evaluate a Mapbox GL style expression.
+    Supported: literal, zoom, get, has, geometry-type, comparisons, !, all, any, case, coalesce,
+    match, step, interpolate (linear, exponential, cubic-bezier), to-number, to-string, to-boolean,
+    concat, image, +, -, *, sqrt. Legacy filters and function objects are not supported.
+
+    :param expression: expression or constant
+    :param zoom: map zoom
+    :param feature: MapFeature the expression is evaluated for, None for zoom-only expressions
+    :return: expression value
+    """
+    if isinstance(expression, list) and expression and isinstance(expression[0], str):
+        handler = _OPERATORS.get(expression[0])
+        if handler is None:
+            raise ValueError(f"Unsupported style expression '{expression[0]}'")
+        return handler(expression[1:], zoom, feature)
+    return expression
+
+
+def _color(expression, zoom, feature, opacity=1.0):
+    """
+    Evaluate a color property into a Pillow RGBA fill, None if fully transparent.
+    """
+    value = evaluate(expression, zoom, feature)
+    if value is None:
+        return None
+    r, g, b, a = parse_color(value) if isinstance(value, str) else value
+    alpha = int(round(a * opacity * 255))
+    if alpha <= 0:
+        return None
+    return int(round(r)), int(round(g)), int(round(b)), min(alpha, 255)
+
+
+# -----  Rendering  -----
+
+@lru_cache(maxsize=4)
+def load_map_style(style_path):
+    """
+    Load a Mapbox GL style JSON (cached per process).
+    """
+    with open(style_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=4)
+def _open_source(map_data):
+    return open_map_source(map_data)
+
+
+@lru_cache(maxsize=64)
+def _font(size):
+    return ImageFont.load_default(size=size)
+
+
+def _visible_layers(style, zoom):
+    """
+    Style layers drawn at zoom: supported types, visible and within their zoom range.
+    """
+    layers = []
+    for layer in style["layers"]:
+        if layer["type"] not in SUPPORTED_LAYER_TYPES:
+            continue
+        if layer.get("layout", {}).get("visibility") == "none":
+            continue
+        if not layer.get("minzoom", 0) <= zoom < layer.get("maxzoom", 24):
+            continue
+        if layer["type"] == "symbol" and "text-field" not in layer.get("layout", {}):
+            continue
+        if layer["type"] == "fill" and "fill-pattern" in layer.get("paint", {}):
+            continue
+        layers.append(layer)
+    return layers
+
+
+def _project_features(features, source_crs, target_crs, to_pixels):
+    """
+    Transform feature coordinates to image pixels with one vectorized CRS transform.
+    """
+    all_features = [(layer, feature) for layer, layer_features in features.items() for feature in layer_features]
+    arrays = [array for _, feature in all_features for array in feature.arrays()]
+    if not arrays:
+        return {}
+    coords = np.concatenate(arrays)
+    if source_crs != target_crs:
+        transformer = Transformer.from_crs(source_crs, target_crs, always_xy=True)
+        coords = np.column_stack(transformer.transform(coords[:, 0], coords[:, 1]))
+    coords = to_pixels(coords)
+    pieces = iter(np.split(coords, np.cumsum([len(array) for array in arrays])[:-1]))
+
+    projected = {}
+    for layer, feature in all_features:
+        projected.setdefault(layer, []).append(feature.with_arrays([next(pieces) for _ in feature.arrays()]))
+    return projected
+
+
+def _draw_fill(draw, layer, features, zoom, scale):
+    paint = layer.get("paint", {})
+    for feature in features:
+        if feature.geom_type != "Polygon":
+            continue
+        opacity = _to_number([evaluate(paint.get("fill-opacity", 1), zoom, feature)])
+        fill = _color(paint.get("fill-color", "#000000"), zoom, feature, opacity)
+        outline = _color(paint["fill-outline-color"], zoom, feature, opacity) if "fill-outline-color" in paint else None
+        if fill is None and outline is None:
+            continue
+        for polygon in feature.parts:
+            draw.polygon(polygon[0].ravel().tolist(), fill=fill, outline=outline)
+            for hole in polygon[1:]:
+                draw.polygon(hole.ravel().tolist(), fill=(0, 0, 0, 0))
+
+
+def _draw_line(draw, layer, features, zoom, scale):
+    paint = layer.get("paint", {})
+    for feature in features:
+        if feature.geom_type == "Point":
+            continue
+        opacity = _to_number([evaluate(paint.get("line-opacity", 1), zoom, feature)])
+        color = _color(paint.get("line-color", "#000000"), zoom, feature, opacity)
+        width = _to_number([evaluate(paint.get("line-width", 1), zoom, feature)])
+        gap = _to_number([evaluate(paint.get("line-gap-width", 0), zoom, feature)])
+        if color is None or width <= 0:
+            continue
+        # A line with a gap is a casing on both sides of the gap, drawn as one wide line under the road
+        width_px = max(1, int(round((gap + 2 * width if gap > 0 else width) * scale)))
+        lines = feature.arrays()
+        for line in lines:
+            draw.line(line.ravel().tolist(), fill=color, width=width_px, joint="curve" if width_px > 2 else None)
+
+
+def _label_anchor(feature):
+    """
+    Label position and angle: the point of a point feature, the middle of the longest line otherwise.
+    """
+    if feature.geom_type == "Point":
+        return feature.parts[0][0], 0.0
+    if feature.geom_type != "LineString":
+        return None, 0.0
+    line = max(feature.parts, key=lambda part: np.hypot(*np.diff(part, axis=0).T).sum())
+    lengths = np.hypot(*np.diff(line, axis=0).T)
+    if lengths.sum() == 0:
+        return None, 0.0
+    index = int(np.searchsorted(np.cumsum(lengths), lengths.sum() / 2))
+    start, end = line[index], line[index + 1]
+    angle = -math.degrees(math.atan2(end[1] - start[1], end[0] - start[0]))
+    # Keep labels upright
+    if angle > 90:
+        angle -= 180
+    elif angle <= -90:
+        angle += 180
+    return (start + end) / 2, angle
+
+
+def _draw_symbols(canvas, layer, features, zoom, scale, placed):
+    layout, paint = layer.get("layout", {}), layer.get("paint", {})
+    placement = evaluate(layout.get("symbol-placement", "point"), zoom)
+    for feature in features:
+        text = _to_string(evaluate(layout["text-field"], zoom, feature)).strip()
+        if not text:
+            continue
+        if evaluate(layout.get("text-transform", "none"), zoom, feature) == "uppercase":
+            text = text.upper()
+        if feature.geom_type == "LineString" and placement == "point":
+            continue
+        anchor, angle = _label_anchor(feature)
+        if anchor is None:
+            continue
+
+        opacity = _to_number([evaluate(paint.get("text-opacity", 1), zoom, feature)])
+        color = _color(paint.get("text-color", "#000000"), zoom, feature, opacity)
+        if color is None:
+            continue
+        halo = _color(paint.get("text-halo-color", "rgba(0, 0, 0, 0)"), zoom, feature, opacity)
+        halo_width = int(round(_to_number([evaluate(paint.get("text-halo-width", 0), zoom, feature)]) * scale))
+        size = max(1, int(round(_to_number([evaluate(layout.get("text-size", 16), zoom, feature)]) * scale)))
+
+        font = _font(size)
+        stroke = halo_width if halo else 0
+        left, top, right, bottom = ImageDraw.Draw(canvas).multiline_textbbox(
+            (0, 0), text, font=font, stroke_width=stroke, align="center")
+        label = Image.new("RGBA", (right - left + 2, bottom - top + 2), (0, 0, 0, 0))
+        ImageDraw.Draw(label).multiline_text((1 - left, 1 - top), text, font=font, fill=color, align="center",
+                                             stroke_width=stroke, stroke_fill=halo)
+        if angle:
+            label = label.rotate(angle, resample=Image.BICUBIC, expand=True)
+
+        x, y = int(round(anchor[0] - label.width / 2)), int(round(anchor[1] - label.height / 2))
+        box = (x, y, x + label.width, y + label.height)
+        # Labels are not cut at the image border and never overlap earlier labels
+        if box[0] < 0 or box[1] < 0 or box[2] > canvas.width or box[3] > canvas.height:
+            continue
+        if any(box[0] < b[2] and b[0] < box[2] and box[1] < b[3] and b[1] < box[3] for b in placed):
+            continue
+        placed.append(box)
+        canvas.alpha_composite(label, dest=(x, y))
+
+
+def render_local_map(bbox_utm, width_px, height_px, output_img, map_data, map_style=DEFAULT_STYLE,
+                     utm_epsg=32617, supersample=2):
+    """
+    Render a map image of a UTM bounding box from a local map extract with a Mapbox GL style.
+    No network access: features are read from the MBTiles/GeoPackage file and drawn with Pillow.
+
+    The image is drawn in UTM, so it matches the bounding box exactly when it is inserted 1:1
+    with UTM units. The style is evaluated at the Mapbox zoom of the image resolution.
+    Supported subset: background, fill (no patterns), line (solid, casings from line-gap-width)
+    and symbol text labels (default font, no icons); circle, raster and extrusion layers are skipped.
+
+    :param bbox_utm: (min_x, min_y, max_x, max_y) in UTM
+    :param width_px: image width in pixels
+    :param height_px: image height in pixels
+    :param output_img: path to output image
+    :param map_data: local map extract (.mbtiles or .gpkg)
+    :param map_style: Mapbox GL style JSON
+    :param utm_epsg: UTM CRS of the bounding box
+    :param supersample: draw at this many times the resolution and downsample for antialiasing
+    :return: style zoom the map was rendered at
+    """
+    start = time.perf_counter()
+    min_x, min_y, max_x, max_y = bbox_utm
+    meters_per_px = (max_x - min_x) / width_px
+    bbox_wgs = Transformer.from_crs(utm_epsg, 4326, always_xy=True).transform_bounds(min_x, min_y, max_x, max_y)
+    latitude = math.radians((bbox_wgs[1] + bbox_wgs[3]) / 2)
+    zoom = math.log2(_EARTH_CIRCUMFERENCE * math.cos(latitude) / (_WORLD_SIZE_PX * meters_per_px))
+
+    style = load_map_style(str(map_style))
+    layers = _visible_layers(style, zoom)
+    source = _open_source(str(map_data))
+    source_layers = {layer["source-layer"] for layer in layers if "source-layer" in layer}
+    features = source.read_features(bbox_wgs, zoom, source_layers)
+
+    scale = supersample
+    x_scale = width_px * scale / (max_x - min_x)
+    y_scale = height_px * scale / (max_y - min_y)
+
+    def to_pixels(coords):
+        return np.column_stack([(coords[:, 0] - min_x) * x_scale, (max_y - coords[:, 1]) * y_scale])
+
+    projected = _project_features(features, source.crs, utm_epsg, to_pixels)
+    size = (width_px * scale, height_px * scale)
+    canvas = Image.new("RGBA", size, (255, 255, 255, 255))
+    placed_labels = []
+    drawn = 0
+    for layer in layers:
+        try:
+            if layer["type"] == "background":
+                paint = layer.get("paint", {})
+                opacity = _to_number([evaluate(paint.get("background-opacity", 1), zoom)])
+                color = _color(paint.get("background-color", "#000000"), zoom, None, opacity)
+                if color:
+                    canvas.alpha_composite(Image.new("RGBA", size, color))
+                continue
+
+            layer_features = projected.get(layer.get("source-layer"), [])
+            if "filter" in layer:
+                layer_features = [feature for feature in layer_features if evaluate(layer["filter"], zoom, feature)]
+            if not layer_features:
+                continue
+
+            if layer["type"] == "symbol":
+                _draw_symbols(canvas, layer, layer_features, zoom, scale, placed_labels)
+            else:
+                overlay = Image.new("RGBA", size, (0, 0, 0, 0))
+                draw_layer = _draw_fill if layer["type"] == "fill" else _draw_line
+                draw_layer(ImageDraw.Draw(overlay), layer, layer_features, zoom, scale)
+                canvas.alpha_composite(overlay)
+            drawn += 1
+        except ValueError as e:
+            logger.warning(f"Skipping map style layer '{layer['id']}': {e}")
+
+    image = canvas.convert("RGB")
+    if scale > 1:
+        image = image.resize((width_px, height_px), Image.LANCZOS)
+    image.save(output_img)
+    logger.info(f"Rendered local map at zoom {zoom:.2f} ({drawn} style layers, "
+                f"{sum(len(f) for f in projected.values())} features) in {time.perf_counter() - start:.2f}s: {output_img}")
+    return zoom
@@ -0,0 +1,282 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+import atexit
+import multiprocessing
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+EXECUTORS = ("thread", "process")
+
+_process_pool = None
+_process_pool_key = None
+
+def process_context():
+    """
+    Multiprocessing context for process pools. Pools are started while other threads run (thread
+    stages, batch worker heartbeat, memory sampler), forking then can copy locks held by those
+    threads, so processes are started by a forkserver (spawn where it is not available).
+
+    :return: multiprocessing context
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def shared_process_pool(max_workers):
+    """
+    Process pool shared by all pipeline runs of this process, created on first use.
+    Starting worker processes costs more than most stages, a batch worker keeps the same
+    pool for all its jobs.
+
+    :param max_workers: pool size, the pool is replaced if it changes
+    :return: ProcessPoolExecutor
+    """
+    global _process_pool, _process_pool_key
+    key = (os.getpid(), max_workers)
+    if _process_pool is None or _process_pool_key != key:
+        shutdown_process_pool()
+        _process_pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=process_context())
+        _process_pool_key = key
+    return _process_pool
+
+
+def shutdown_process_pool():
+    """
+    Shut down the shared process pool (a pool inherited from a parent process is only dropped).
+    """
+    global _process_pool, _process_pool_key
+    if _process_pool is not None and _process_pool_key[0] == os.getpid():
+        _process_pool.shutdown(wait=True, cancel_futures=True)
+    _process_pool = _process_pool_key = None
+
+
+atexit.register(shutdown_process_pool)
+
+
+class Stage:
+    """
+    Named pipeline step with explicit inputs and outputs.
+
+    The stage function is called with its inputs (and static kwargs) as keyword arguments.
+    With a single output the return value is stored under that name, with several outputs
+    the function must return a tuple in the same order.
+
+    :ivar name: unique stage name
+    :ivar func: callable to run, must be picklable (module level) for the process executor
+    :ivar inputs: names of values the stage depends on
+    :ivar outputs: names of values the stage produces
+    :ivar executor: "thread" for I/O bound steps, "process" for CPU heavy steps
+    :ivar kwargs: static keyword arguments passed to func
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), executor="thread", kwargs=None):
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor '{executor}' for stage '{name}'. Use one of {EXECUTORS}")
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.executor = executor
+        self.kwargs = kwargs or {}
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, inputs={self.inputs}, outputs={self.outputs}, executor={self.executor!r})"
+
+
+class StagePipeline:
+    """
+    Dependency-aware scheduler for a DAG of stages.
+
+    A stage starts as soon as all its inputs are available, so independent stages run concurrently.
+    After a run, stage timings and the critical path (the chain of stages that determined the
+    total wall time) are available in `timings` and `timing_report()`.
+    Thread stages run in a pool per run, process stages in the pool shared by all runs of the
+    process (see shared_process_pool).
+
+    :ivar stages: stages by name, in the order they were added
+    :ivar timings: stage name -> (start, end) in seconds from the pipeline start
+    """
+
+    def __init__(self, stages=(), max_workers=4):
+        """
+        :param stages: initial stages
+        :param max_workers: max concurrent stages per executor type
+        """
+        self.stages = {}
+        self.max_workers = max_workers
+        self.timings = {}
+        self.wall_time = 0.0
+        self._dependency_graph = {}
+        for stage in stages:
+            self.add_stage(stage)
+
+    def add_stage(self, stage):
+        """
+        Add a stage to the pipeline.
+
+        :param stage: Stage to add
+        """
+        if stage.name in self.stages:
+            raise ValueError(f"Duplicate stage name: {stage.name}")
+        self.stages[stage.name] = stage
+
+    def _producers(self):
+        """
+        Map every output name to the stage that produces it.
+        """
+        producers = {}
+        for stage in self.stages.values():
+            for output in stage.outputs:
+                if output in producers:
+                    raise ValueError(f"Output '{output}' produced by both '{producers[output]}' and '{stage.name}'")
+                producers[output] = stage.name
+        return producers
+
+    def _dependencies(self, initial):
+        """
+        Resolve stage dependencies and validate the graph.
+
+        :param initial: names of values available before the run
+        :return: stage name -> set of stage names it depends on
+        """
+        producers = self._producers()
+        dependencies = {}
+        for stage in self.stages.values():
+            deps = set()
+            for name in stage.inputs:
+                if name in producers:
+                    deps.add(producers[name])
+                elif name not in initial:
+                    raise ValueError(f"Stage '{stage.name}' input '{name}' is not produced by any stage")
+            dependencies[stage.name] = deps
+
+        # Check for cycles (Kahn's algorithm)
+        remaining = {name: set(deps) for name, deps in dependencies.items()}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Stage dependency cycle between: {', '.join(sorted(remaining))}")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+        return dependencies
+
+    def run(self, initial=None, keep=None):
+        """
+        Run all stages, each one as soon as its inputs are ready.
+
+        With keep, every other value is dropped from the context as soon as the last stage using it
+        has finished, so large intermediate values (loaded documents) are freed during the run.
+
+        :param initial: values available before the run (name -> value)
+        :param keep: names of values to return, all values are kept if None
+        :return: dict with initial values and all stage outputs (only keep values if given)
+        """
+        context = dict(initial or {})
+        dependencies = self._dependencies(set(context))
+        self._dependency_graph = dependencies
+        pending = dict(self.stages)
+        done = set()
+        running = {}
+        self.timings = {}
+        uses = Counter(name for stage in self.stages.values() for name in stage.inputs)
+
+        thread_pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        pools = {"thread": thread_pool}
+        if any(stage.executor == "process" for stage in pending.values()):
+            pools["process"] = shared_process_pool(self.max_workers)
+
+        start = time.perf_counter()
+        try:
+            while pending or running:
+                # Submit every stage whose dependencies are done
+                for name in [n for n, s in pending.items() if dependencies[n] <= done]:
+                    stage = pending.pop(name)
+                    kwargs = dict(stage.kwargs)
+                    kwargs.update({key: context[key] for key in stage.inputs})
+                    logger.debug(f"Starting stage '{name}' ({stage.executor})")
+                    future = pools[stage.executor].submit(stage.func, **kwargs)
+                    running[future] = (stage, time.perf_counter() - start)
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage, stage_start = running.pop(future)
+                    stage_end = time.perf_counter() - start
+                    self.timings[stage.name] = (stage_start, stage_end)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"Stage '{stage.name}' failed after {stage_end - stage_start:.3f}s")
+                        for other in running:
+                            other.cancel()
+                        # A pool with a dead worker process accepts no more work, the next run starts a new one
+                        if isinstance(e, BrokenProcessPool):
+                            shutdown_process_pool()
+                        raise
+                    context.update(self._map_outputs(stage, result))
+                    done.add(stage.name)
+                    if keep is not None:
+                        uses.subtract(stage.inputs)
+                        for name in [*stage.inputs, *stage.outputs]:
+                            if uses[name] <= 0 and name not in keep:
+                                context.pop(name, None)
+                    logger.debug(f"Finished stage '{stage.name}' in {stage_end - stage_start:.3f}s")
+        finally:
+            # The shared process pool stays up for the next run, cancelled stages were removed from it
+            thread_pool.shutdown(wait=True, cancel_futures=True)
+            self.wall_time = time.perf_counter() - start
+
+        if keep is not None:
+            return {name: value for name, value in context.items() if name in keep}
+        return context
+
+    @staticmethod
+    def _map_outputs(stage, result):
+        """
+        Map a stage return value to its output names.
+        """
+        if not stage.outputs:
+            return {}
+        if len(stage.outputs) == 1:
+            return {stage.outputs[0]: result}
+        if not isinstance(result, tuple) or len(result) != len(stage.outputs):
+            raise ValueError(f"Stage '{stage.name}' must return a tuple of {len(stage.outputs)} values")
+        return dict(zip(stage.outputs, result))
+
+    def critical_path(self):
+        """
+        Find the critical path of the last run: starting from the stage that finished last,
+        follow the dependency that finished last until a stage without dependencies.
+
+        :return: list of stage names from first to last
+        """
+        if not self.timings:
+            return []
+        name = max(self.timings, key=lambda n: self.timings[n][1])
+        path = [name]
+        while self._dependency_graph[name]:
+            name = max(self._dependency_graph[name], key=lambda n: self.timings[n][1])
+            path.append(name)
+        return path[::-1]
+
+    def timing_report(self):
+        """
+        Build a timing report of the last run.
+
+        :return: report text (one line per stage, then the critical path)
+        """
+        critical = self.critical_path()
+        lines = [f"Pipeline finished in {self.wall_time:.3f}s"]
+        for name, (stage_start, stage_end) in sorted(self.timings.items(), key=lambda item: item[1][0]):
+            marker = "*" if name in critical else " "
+            executor = self.stages[name].executor
+            lines.append(f"{marker} {name:<28} {executor:<8} start {stage_start:8.3f}s  took {stage_end - stage_start:8.3f}s")
+        critical_time = sum(self.timings[n][1] - self.timings[n][0] for n in critical)
+        lines.append(f"Critical path ({critical_time:.3f}s): {' -> '.join(critical)}")
+        return "\n".join(lines)
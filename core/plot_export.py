@@ -0,0 +1,245 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import hashlib
+import json
+import time
+import logging
+from ezdxf.lldxf.tagwriter import TagCollector
+from core.pipeline import process_context
+from utils.dxf_stream import read_layout_names
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("pdf", "png")
+CACHE_FILE = "plot_cache.json"
+
+# Handles and pointers change between runs without changing what is drawn
+_IGNORED_GROUP_CODES = {5, 105, 1005, *range(320, 370), *range(390, 400)}
+
+# Tables that change how entities are drawn, pointers to their entries are hashed by name
+_RENDER_TABLES = ("layers", "linetypes", "styles", "dimstyles")
+_TABLE_ENTRY_TYPES = {"LAYER", "LTYPE", "STYLE", "DIMSTYLE"}
+
+_worker_doc = None
+_worker_doc_hash = ""
+
+def _hash_entities(hasher, entities):
+    """
+    Feed DXF tags of entities (without handles and pointers) into hasher.
+    Pointers to table entries (e.g. viewport frozen layers) are replaced by the entry name.
+    """
+    for entity in entities:
+        collector = TagCollector(dxfversion=entity.doc.dxfversion if entity.doc else "AC1032")
+        entity.export_dxf(collector)
+        for tag in collector.tags:
+            value = tag.value
+            if tag.code in _IGNORED_GROUP_CODES:
+                target = entity.doc.entitydb.get(value) if entity.doc and tag.code != 5 else None
+                if target is None or target.dxftype() not in _TABLE_ENTRY_TYPES:
+                    continue
+                value = target.dxf.name
+            hasher.update(f"{tag.code}\x00{value}\x01".encode("utf-8", errors="replace"))
+
+
+def _hash_file(hasher, path):
+    """
+    Feed file content into hasher in chunks.
+    """
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(chunk)
+
+
+def modelspace_hash(doc):
+    """
+    Hash modelspace content and referenced image files.
+    Modelspace is shown in every layout viewport, so it is part of every layout hash.
+
+    :param doc: drawing doc
+    :return: hex digest
+    """
+    hasher = hashlib.sha256()
+    _hash_entities(hasher, doc.modelspace())
+    for image_def in doc.objects.query("IMAGEDEF"):
+        path = Path(image_def.dxf.filename)
+        # Relative image paths (asset store xrefs) are relative to the drawing
+        if not path.is_absolute() and doc.filename:
+            path = Path(doc.filename).parent / path
+        hasher.update(str(path.name).encode())
+        if path.exists():
+            _hash_file(hasher, path)
+    return hasher.hexdigest()
+
+
+def tables_hash(doc):
+    """
+    Hash the table entries used to draw entities: layers (color, freeze, linetype...),
+    linetypes, text styles and dimension styles, sorted by name.
+
+    :param doc: drawing doc
+    :return: hex digest
+    """
+    hasher = hashlib.sha256()
+    for table_name in _RENDER_TABLES:
+        entries = sorted(getattr(doc, table_name), key=lambda entry: entry.dxf.name.casefold())
+        hasher.update(f"{table_name}\x02".encode())
+        _hash_entities(hasher, entries)
+    return hasher.hexdigest()
+
+
+def layout_hash(doc, layout_name, doc_hash=""):
+    """
+    Hash what a paperspace layout renders: layout entities, block definitions they
+    reference and the content shared by all layouts.
+
+    :param doc: drawing doc
+    :param layout_name: paperspace layout name
+    :param doc_hash: shared content hash, e.g. modelspace_hash() and tables_hash() results
+    :return: hex digest
+    """
+    hasher = hashlib.sha256(doc_hash.encode())
+    layout = doc.layouts.get(layout_name)
+    _hash_entities(hasher, [layout.dxf_layout])
+    _hash_entities(hasher, layout)
+
+    # Block definitions referenced by the layout, nested blocks included (sorted for a stable hash)
+    seen = set()
+    pending = sorted({insert.dxf.name for insert in layout.query("INSERT")})
+    while pending:
+        name = pending.pop(0)
+        if name in seen:
+            continue
+        seen.add(name)
+        block = doc.blocks.get(name)
+        if block is None:
+            continue
+        _hash_entities(hasher, block)
+        pending += sorted({insert.dxf.name for insert in block.query("INSERT")} - seen)
+    return hasher.hexdigest()
+
+
+def _init_worker(dxf_path):
+    """
+    Load the drawing and hash its modelspace and tables once per worker process.
+    """
+    global _worker_doc, _worker_doc_hash
+    import ezdxf
+    _worker_doc = ezdxf.readfile(str(dxf_path))
+    _worker_doc_hash = modelspace_hash(_worker_doc) + tables_hash(_worker_doc)
+
+
+def _render_layout(layout_name, outputs, dpi, cached_hash=None):
+    """
+    Render one paperspace layout of the worker drawing, unless its content hash equals
+    cached_hash and all output files exist.
+    Hashes are computed from the loaded DXF, so they are the same on every export of the same content.
+    The output formats and dpi are part of the hash.
+
+    :param layout_name: paperspace layout name
+    :param outputs: format -> output file path
+    :param dpi: PNG resolution
+    :param cached_hash: layout hash of the last export
+    :return: (layout_name, layout hash, rendered, render time)
+    """
+    start = time.perf_counter()
+    content_hash = layout_hash(_worker_doc, layout_name, f"{_worker_doc_hash}:{','.join(sorted(outputs))}:{dpi}")
+    if content_hash == cached_hash and all(Path(path).exists() for path in outputs.values()):
+        return layout_name, content_hash, False, time.perf_counter() - start
+
+    from ezdxf.addons.drawing import Frontend, RenderContext
+    from ezdxf.addons.drawing import layout as page_layout
+    from ezdxf.addons.drawing.pymupdf import PyMuPdfBackend
+
+    layout = _worker_doc.layouts.get(layout_name)
+    backend = PyMuPdfBackend()
+    Frontend(RenderContext(_worker_doc), backend).draw_layout(layout, finalize=True)
+
+    # Use the layout paper size, swapped for 90/270 degree plot rotation
+    width, height = layout.dxf_layout.dxf.paper_width, layout.dxf_layout.dxf.paper_height
+    if layout.dxf_layout.dxf.plot_rotation in (1, 3):
+        width, height = height, width
+    page = page_layout.Page(width, height, page_layout.Units.mm)
+
+    for fmt, path in outputs.items():
+        if fmt == "pdf":
+            data = backend.get_pdf_bytes(page)
+        else:
+            data = backend.get_pixmap_bytes(page, fmt=fmt, dpi=dpi)
+        Path(path).write_bytes(data)
+    return layout_name, content_hash, True, time.perf_counter() - start
+
+
+def _merge_pdfs(pdf_paths, merged_path):
+    """
+    Merge sheet PDFs into one PDF set.
+    """
+    import pymupdf
+    merged = pymupdf.open()
+    for path in pdf_paths:
+        with pymupdf.open(path) as sheet:
+            merged.insert_pdf(sheet)
+    merged.save(str(merged_path))
+    merged.close()
+
+
+def export_layouts(dxf_path, output_folder, formats=EXPORT_FORMATS, layouts=None, dpi=150, max_workers=None):
+    """
+    Render paperspace layouts of a saved drawing to PDF/PNG in a process pool and merge
+    sheet PDFs into one PDF set.
+
+    Every worker loads the DXF once. Layouts whose content hash (layout entities, referenced
+    blocks, modelspace, images, tables, formats and dpi) did not change since the last export
+    are not rendered again.
+
+    :param dxf_path: saved DXF
+    :param output_folder: folder for the sheets and the merged PDF
+    :param formats: export formats, subset of EXPORT_FORMATS
+    :param layouts: layout names to export, all paperspace layouts in tab order if None
+    :param dpi: PNG resolution
+    :param max_workers: render processes, defaults to CPU count
+    :return: dict with rendered and cached layouts, merged PDF path and timings
+    """
+    unknown = set(formats) - set(EXPORT_FORMATS)
+    if unknown:
+        raise ValueError(f"Unsupported export formats: {', '.join(sorted(unknown))}")
+    start = time.perf_counter()
+    dxf_path = Path(dxf_path)
+    sheets_folder = Path(output_folder) / "sheets"
+    sheets_folder.mkdir(parents=True, exist_ok=True)
+    layouts = layouts or read_layout_names(dxf_path)
+
+    cache_path = sheets_folder / CACHE_FILE
+    cache = json.loads(cache_path.read_text()) if cache_path.exists() else {}
+
+    rendered, cached, render_times = [], [], {}
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(dxf_path,),
+                             mp_context=process_context()) as pool:
+        futures = []
+        for name in layouts:
+            outputs = {fmt: sheets_folder / f"{name}.{fmt}" for fmt in formats}
+            futures.append(pool.submit(_render_layout, name, outputs, dpi, cache.get(name)))
+        for future in futures:
+            name, content_hash, was_rendered, render_time = future.result()
+            cache[name] = content_hash
+            if was_rendered:
+                rendered.append(name)
+                render_times[name] = render_time
+                logger.info(f"Rendered {name} in {render_time:.2f}s")
+            else:
+                cached.append(name)
+    cache_path.write_text(json.dumps(cache, indent=2))
+    logger.info(f"Exported {len(rendered)} layouts, {len(cached)} unchanged since last export")
+
+    merged_pdf = None
+    if "pdf" in formats:
+        merged_pdf = Path(output_folder) / f"{dxf_path.stem}.pdf"
+        _merge_pdfs([sheets_folder / f"{name}.pdf" for name in layouts], merged_pdf)
+        logger.info(f"Merged {len(layouts)} sheets into {merged_pdf}")
+
+    return {
+        "rendered": rendered,
+        "cached": cached,
+        "merged_pdf": str(merged_pdf) if merged_pdf else None,
+        "render_times": render_times,
+        "wall_time": time.perf_counter() - start,
+    }
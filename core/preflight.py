@@ -0,0 +1,166 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import re
+import time
+import logging
+
+from config.input_schema import INPUT_SCHEMA
+from config.viewport_config import VIEWPORT_CONFIG
+from core.drawing_generator import get_template_path
+from core.project_area import BOUNDARY_LAYER
+from data.offices import get_office_info
+from utils.dxf_stream import read_dxf_header, read_table_entries, find_entity_on_layer
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_FOLDER = Path(__file__).resolve().parent.parent / "data" / "templates"
+
+def validate_input_data(input_data, schema=INPUT_SCHEMA):
+    """
+    Validate input data against the input schema.
+
+    :param input_data: project input data
+    :param schema: dict key -> {"type", "required", optional "pattern"}
+    :return: list of problems
+    """
+    if not isinstance(input_data, dict):
+        return [f"Input data must be a JSON object, got {type(input_data).__name__}"]
+
+    problems = []
+    for key, rules in schema.items():
+        value = input_data.get(key)
+        if value is None or value == "":
+            if rules.get("required"):
+                problems.append(f"Missing required input '{key}'")
+            continue
+        if not isinstance(value, rules["type"]):
+            problems.append(f"Input '{key}' must be {rules['type'].__name__}, got {type(value).__name__}")
+            continue
+        pattern = rules.get("pattern")
+        if pattern and not re.match(pattern, value):
+            problems.append(f"Input '{key}' has unexpected format: {value!r}")
+    return problems
+
+
+def check_template(template_type):
+    """
+    Check that the template file and its viewport configuration exist.
+
+    :param template_type: TEMPLATE_TYPE from inputs
+    :return: list of problems
+    """
+    problems = []
+    template_path = get_template_path(TEMPLATES_FOLDER, template_type)
+    if not template_path.exists():
+        problems.append(f"Template '{template_type}' not found: {template_path}")
+    for page_type in ("cov", "default"):
+        if page_type not in VIEWPORT_CONFIG.get(template_type, {}):
+            problems.append(f"Missing viewport configuration for '{template_type}' ({page_type})")
+    return problems
+
+
+def check_landbase(landbase, boundary_layer=BOUNDARY_LAYER):
+    """
+    Check the landbase without loading it: DXF header, layer table and the boundary polyline
+    (found by a streaming search of the ENTITIES section).
+
+    :param landbase: path to landbase DXF
+    :param boundary_layer: layer with the project boundary
+    :return: (problems, warnings)
+    """
+    landbase = Path(landbase)
+    if not landbase.exists():
+        return [f"Landbase not found: {landbase}"], []
+    if landbase.suffix.lower() == ".dwg":
+        return [], [f"DWG landbase can not be checked without conversion: {landbase}"]
+    if landbase.suffix.lower() != ".dxf":
+        return [f"Unsupported landbase file type: {landbase.suffix}"], []
+
+    try:
+        header = read_dxf_header(landbase)
+        if "$ACADVER" not in header:
+            return [f"Landbase has no DXF version in header: {landbase}"], []
+        # DXF layer names are case-insensitive
+        layers = {name.casefold() for name in read_table_entries(landbase, "LAYER")}
+        if boundary_layer.casefold() not in layers:
+            return [f"Landbase has no '{boundary_layer}' layer: {landbase}"], []
+        boundary = find_entity_on_layer(landbase, "LWPOLYLINE", boundary_layer)
+    except ValueError as e:
+        return [f"Landbase can not be read: {e}"], []
+
+    if boundary is None:
+        return [f"No LWPOLYLINE boundary in modelspace on layer '{boundary_layer}': {landbase}"], []
+    vertices = int(boundary.get(90, ["0"])[0])
+    if vertices < 3:
+        return [f"Boundary polyline has only {vertices} vertices: {landbase}"], []
+    return [], []
+
+
+def check_job(job):
+    """
+    Pre-flight check of one batch job.
+
+    :param job: job with "job_id", "input_data" and "landbase"
+    :return: dict with job_id, problems, warnings and check time
+    """
+    start = time.perf_counter()
+    input_data = job.get("input_data")
+    problems = validate_input_data(input_data)
+    warnings = []
+
+    if isinstance(input_data, dict):
+        template_type = input_data.get("TEMPLATE_TYPE")
+        if isinstance(template_type, str) and template_type:
+            problems += check_template(template_type)
+
+        municipality = input_data.get("MUNICIPALITY")
+        if isinstance(municipality, str) and municipality:
+            try:
+                get_office_info(municipality)
+            except Exception as e:
+                problems.append(str(e))
+
+    landbase_problems, landbase_warnings = check_landbase(job["landbase"])
+    problems += landbase_problems
+    warnings += landbase_warnings
+
+    return {
+        "job_id": job.get("job_id") or job["landbase"],
+        "problems": problems,
+        "warnings": warnings,
+        "time": time.perf_counter() - start,
+    }
+
+
+def preflight(jobs, max_workers=None):
+    """
+    Pre-flight check of all batch jobs in parallel.
+
+    :param jobs: jobs from load_job_manifest
+    :param max_workers: worker processes, defaults to CPU count
+    :return: list of check_job results in job order
+    """
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(check_job, jobs))
+    failed = sum(1 for result in results if result["problems"])
+    logger.info(f"Pre-flight checked {len(results)} jobs in {time.perf_counter() - start:.2f}s, {failed} with problems")
+    return results
+
+
+def format_preflight(results):
+    """
+    Format pre-flight results for console output.
+
+    :param results: preflight() results
+    :return: report text
+    """
+    lines = []
+    for result in results:
+        status = "FAIL" if result["problems"] else "OK"
+        lines.append(f"[{status}] {result['job_id']} ({result['time'] * 1000:.0f} ms)")
+        lines += [f"    error: {problem}" for problem in result["problems"]]
+        lines += [f"    warning: {warning}" for warning in result["warnings"]]
+    failed = sum(1 for result in results if result["problems"])
+    lines.append(f"{len(results) - failed} of {len(results)} jobs ready")
+    return "\n".join(lines)
@@ -1,85 +1,124 @@
 from ezdxf import bbox
+import numpy as np
 import requests
 from pyproj import Transformer
 import os
 from dotenv import load_dotenv
 import logging
+from core.map_renderer import DEFAULT_STYLE, render_local_map
 from utils.dxf_utils import insert_img_into_dxf
+from utils.geometry_utils import Boundary
 
 logger = logging.getLogger(__name__)
 
-def generate_project_area_with_boundary(
-    doc,
-    xref_folder,
-    boundary_layer="_SP-BLK9-PR-PHASE LIMIT",
-    pad_x=200,
-    pad_y=100
-):
+BOUNDARY_LAYER = "_SP-BLK9-PR-PHASE LIMIT"
+
+class ProjectAreaImage:
+    """
+    Project area image saved for the padded project boundary bounding box.
+
+    :ivar path: path to the saved image
+    :ivar origin: lower left corner of the image in UTM (padded bounding box)
+    :ivar width: image width in UTM units
+    :ivar height: image height in UTM units
+    :ivar width_px: image width in pixels
+    :ivar height_px: image height in pixels
+    """
+
+    def __init__(self, path, origin, width, height, width_px, height_px):
+        self.path = path
+        self.origin = origin
+        self.width = width
+        self.height = height
+        self.width_px = width_px
+        self.height_px = height_px
+
+
+def get_project_boundary(doc, boundary_layer=BOUNDARY_LAYER):
     """
-    Generates a Mapbox static image of a PROJECT AREA and inserts it into modelspace next to the landbase.
-    Draws a project boundary on top of the image (translated and scaled landbase boundary).
+    Load the project boundary from boundary_layer in modelspace.
 
     :param doc: drawing doc
-    :param xref_folder: references folder to save image into
-    :param boundary_layer:  layer with boundary
-    :param pad_x:   padding in pixels for x-axis
-    :param pad_y:   padding in pixels for y-axis
+    :param boundary_layer: layer with boundary
+    :return: Boundary in UTM
     """
-    logger.debug("Generating mapbox image for PROJECT AREA")
-    # Load drawing modelspace
-    msp = doc.modelspace()
+    return Boundary(get_project_boundary_points(boundary_layer, doc.modelspace()))
 
-    # Find project boundary points
-    points_utm = get_project_boundary_points(boundary_layer, msp)
 
-    # Compute UTM bounding box and add padding
-    xs, ys = zip(*points_utm)
-    min_x, max_x = min(xs), max(xs)
-    min_y, max_y = min(ys), max(ys)
+def fetch_project_area_img(boundary, output_img, pad_x=200, pad_y=100, backend="mapbox", map_data=None,
+                           map_style=DEFAULT_STYLE):
+    """
+    Create a map image of the padded project boundary bounding box and save it, either
+    requested from the Mapbox static images API or rendered from local map data.
+    Does not touch the drawing doc, so it can run while the doc is being edited.
 
-    expanded_ll_x = min_x - pad_x
-    expanded_ll_y = min_y - pad_y
-    expanded_ur_x = max_x + pad_x
-    expanded_ur_y = max_y + pad_y
-    logger.debug(f"Expanded bbox in UTM: X[{expanded_ll_x}, {expanded_ur_x}], Y[{expanded_ll_y}, {expanded_ur_y}]")
+    :param boundary: project Boundary in UTM
+    :param output_img: path to output image
+    :param pad_x:   padding in UTM units for x-axis
+    :param pad_y:   padding in UTM units for y-axis
+    :param backend: "mapbox" or "local" (see map_settings)
+    :param map_data: local map extract (.mbtiles or .gpkg) for the local backend
+    :param map_style: Mapbox GL style JSON for the local backend
+    :return: ProjectAreaImage
+    """
+    logger.debug("Generating mapbox image for PROJECT AREA")
+    # Compute UTM bounding box and add padding
+    pad = (pad_x, pad_y)
+    expanded_ll = boundary.bbox_min - pad
+    expanded_ur = boundary.bbox_max + pad
+    logger.debug(f"Expanded bbox in UTM: X[{expanded_ll[0]}, {expanded_ur[0]}], Y[{expanded_ll[1]}, {expanded_ur[1]}]")
 
     # Calculate UTM height and width of expanded bounding box
-    utm_height = expanded_ur_y - expanded_ll_y
-    utm_width = expanded_ur_x - expanded_ll_x
+    utm_width, utm_height = expanded_ur - expanded_ll
 
     # Calculate image size in px
     height_px, width_px = get_img_height_width_px(utm_height, utm_width)
 
-    # Generate output path for image
-    output_img = xref_folder / "project_area_mapbox.png"
+    if backend == "local":
+        # Render from local map data, no network access
+        render_local_map((*expanded_ll, *expanded_ur), width_px, height_px, output_img, map_data, map_style)
+    else:
+        # Generate bounding box string for mapbox request
+        bbox_str = get_bbox_wgs_str(*expanded_ll, *expanded_ur)
+
+        # Request Mapbox static image
+        fetch_and_save_mapbox_img(bbox_str, height_px, width_px, output_img)
 
-    # Generate bounding box string for mapbox request
-    bbox_str = get_bbox_wgs_str(expanded_ll_x, expanded_ll_y, expanded_ur_x, expanded_ur_y)
+    return ProjectAreaImage(output_img, expanded_ll, float(utm_width), float(utm_height), width_px, height_px)
 
-    # Request Mapbox static image
-    fetch_and_save_mapbox_img(bbox_str, height_px, width_px, output_img)
+
+def draw_project_area(doc, boundary, area_img, simplify_tolerance=0.1, asset_store=None, drawing_folder=None):
+    """
+    Insert the project area image into modelspace next to the landbase and draw the
+    project boundary on top of it.
+
+    :param doc: drawing doc
+    :param boundary: project Boundary in UTM
+    :param area_img: ProjectAreaImage of the boundary
+    :param simplify_tolerance: Douglas-Peucker tolerance in drawing units for the drawn boundary, 0 disables it
+    :param asset_store: optional AssetStore the image is moved into (see insert_img_into_dxf)
+    :param drawing_folder: folder the drawing is saved to, required with asset_store
+    :return: Boundary drawn on top of the image (with its bounding box and center)
+    """
+    msp = doc.modelspace()
 
     # Calculate insertion point - using max coordinates (min coordinates take image far away)
     msp_bbox = bbox.extents(msp)
     insert_point = (msp_bbox.extmax.x + 100, msp_bbox.extmax.y + 100)
 
     # Insert image into modelspace
-    insert_img_into_dxf(doc, output_img, insert_point, utm_width, utm_height, width_px, height_px)
+    insert_img_into_dxf(doc, area_img.path, insert_point, area_img.width, area_img.height,
+                        area_img.width_px, area_img.height_px, asset_store=asset_store, drawing_folder=drawing_folder)
+
+    # Translate original boundary on top of the image (image is inserted 1:1 with UTM units)
+    boundary_img = boundary.simplified(simplify_tolerance).transformed(origin=area_img.origin, offset=insert_point)
 
     # Draw boundary pline on top of the image
-    # Calculate scale just in case of ratio inconsistency
-    scale_x = utm_width / (expanded_ur_x - expanded_ll_x)
-    scale_y = utm_height / (expanded_ur_y - expanded_ll_y)
-
-    # Translate/scale original boundary pline
-    boundary_img = [
-        (insert_point[0] + (x - expanded_ll_x) * scale_x,
-         insert_point[1] + (y - expanded_ll_y) * scale_y)
-        for x, y in points_utm
-    ]
     doc.layers.new(name="MAP_BOUNDARY", dxfattribs={"color": 1})
-    msp.add_lwpolyline(boundary_img, close=True, dxfattribs={"layer": "MAP_BOUNDARY"})
-    logger.info("Project boundary drawn on top of the image")
+    msp.add_lwpolyline(boundary_img.points.tolist(), close=True, dxfattribs={"layer": "MAP_BOUNDARY"})
+    logger.info(f"Project boundary drawn on top of the image ({len(boundary_img)} of {len(boundary)} points)")
+
+    return boundary_img
 
 
 def get_project_boundary_points(boundary_layer, msp):
@@ -88,13 +127,14 @@ def get_project_boundary_points(boundary_layer, msp):
 
     :param boundary_layer:  name of the layer where the project boundary is
     :param msp: drawing modelspace
-    :return: points of the boundary polyline
+    :return: (N, 2) array of the boundary polyline points
     """
-    boundary = next(iter(msp.query(f'LWPOLYLINE[layer=="{boundary_layer}"]')), None)
+    # Layer names are case-insensitive
+    boundary = next(iter(msp.query(f'LWPOLYLINE[layer=="{boundary_layer}"]i')), None)
     if not boundary:
         raise ValueError("No boundary polyline found in the DXF")
 
-    points_utm = [p[:2] for p in boundary.get_points()]
+    points_utm = np.asarray(boundary.get_points('xy'), dtype=np.float64)
     logger.debug(f"Loaded {len(points_utm)} boundary points.")
 
     return points_utm
@@ -0,0 +1,166 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path, PurePath
+import os
+import pickle
+import time
+import logging
+import numpy as np
+from core.pipeline import process_context
+from utils.dxf_stream import read_layout_names
+
+logger = logging.getLogger(__name__)
+
+_worker_doc_data = None
+_worker_dxf_folder = None
+_worker_msp_handles = None
+_worker_msp_extents = None
+
+def _init_worker(dxf_path):
+    """
+    Load the drawing once per worker process and keep it pickled, with the extents of its
+    modelspace entities. Unpickling a copy per sheet is several times faster than parsing the DXF again.
+    """
+    global _worker_doc_data, _worker_dxf_folder, _worker_msp_handles, _worker_msp_extents
+    import ezdxf
+    from ezdxf import bbox
+    doc = ezdxf.readfile(str(dxf_path))
+    _worker_dxf_folder = Path(dxf_path).resolve().parent
+
+    # Entities without extents get an infinite box, they are always kept
+    _worker_msp_handles, extents = [], []
+    for entity in doc.modelspace():
+        box = bbox.extents([entity], fast=True)
+        _worker_msp_handles.append(entity.dxf.handle)
+        extents.append((*box.extmin.vec2, *box.extmax.vec2) if box.has_data else (-np.inf, -np.inf, np.inf, np.inf))
+    _worker_msp_extents = np.array(extents, dtype=np.float64).reshape(-1, 4)
+    _worker_doc_data = pickle.dumps(doc)
+
+
+def _purge_modelspace(doc, layout):
+    """
+    Remove modelspace entities shown in no viewport of the layout.
+    Viewport windows are compared as axis aligned boxes (twisted windows are enlarged), so nothing
+    visible is removed.
+
+    :return: number of removed entities
+    """
+    windows = []
+    for viewport in layout.query("VIEWPORT"):
+        if viewport.dxf.id == 1 or viewport.dxf.width <= 0 or viewport.dxf.height <= 0:
+            continue
+        windows.append(viewport.get_modelspace_limits())
+    if not windows or len(_worker_msp_handles) == 0:
+        return 0
+
+    windows = np.array(windows, dtype=np.float64)
+    extents = _worker_msp_extents
+    visible = np.zeros(len(extents), dtype=bool)
+    for min_x, min_y, max_x, max_y in windows:
+        visible |= ((extents[:, 0] <= max_x) & (extents[:, 2] >= min_x)
+                    & (extents[:, 1] <= max_y) & (extents[:, 3] >= min_y))
+
+    # Destroy first and purge the entity space once, unlinking entities one by one is quadratic
+    removed = 0
+    for index in np.flatnonzero(~visible):
+        entity = doc.entitydb.get(_worker_msp_handles[index])
+        if entity is not None and entity.is_alive:
+            entity.destroy()
+            removed += 1
+    doc.modelspace().entity_space.purge()
+    doc.entitydb.purge()
+    return removed
+
+
+def _purge_blocks(doc):
+    """
+    Remove block definitions no INSERT references any more, until nested blocks are released too.
+    Layout, anonymous and arrow blocks are kept (see BlocksSection.delete_all_blocks).
+
+    :return: number of removed blocks
+    """
+    before = len(doc.blocks)
+    count = None
+    while count != len(doc.blocks):
+        count = len(doc.blocks)
+        doc.blocks.delete_all_blocks()
+    return before - len(doc.blocks)
+
+
+def _rebase_image_paths(doc, source_folder, target_folder):
+    """
+    Rewrite relative image paths (asset store xrefs) of a drawing moved from source_folder to target_folder.
+    """
+    for image_def in doc.objects.query("IMAGEDEF"):
+        path = PurePath(image_def.dxf.filename)
+        if path.is_absolute():
+            continue
+        image_def.dxf.filename = Path(os.path.relpath(source_folder / path, target_folder)).as_posix()
+
+
+def _write_sheet(layout_name, output_path):
+    """
+    Write one paperspace layout of the worker drawing as its own DXF: the layout, the modelspace
+    entities its viewports show, the blocks still in use and shared tables. All other paperspace
+    layouts are removed.
+
+    :param layout_name: paperspace layout name
+    :param output_path: sheet DXF path
+    :return: (layout_name, output path, write time)
+    """
+    start = time.perf_counter()
+    doc = pickle.loads(_worker_doc_data)
+    for name in doc.layout_names_in_taborder()[1:]:
+        if name != layout_name:
+            doc.layouts.delete(name)
+    doc.layouts.set_active_layout(layout_name)
+    purged_entities = _purge_modelspace(doc, doc.layouts.get(layout_name))
+    purged_blocks = _purge_blocks(doc)
+    logger.debug(f"Sheet {layout_name}: removed {purged_entities} modelspace entities and {purged_blocks} blocks")
+    output_path = Path(output_path)
+    _rebase_image_paths(doc, _worker_dxf_folder, output_path.resolve().parent)
+    doc.saveas(str(output_path))
+    return layout_name, str(output_path), time.perf_counter() - start
+
+
+def split_sheets(dxf_path, output_folder, layouts=None, max_workers=None):
+    """
+    Write every paperspace layout of a saved drawing as a separate sheet DXF, in a process pool.
+    A sheet can then be delivered or regenerated without the whole drawing set. Sheet DXFs only
+    keep the modelspace entities shown in their viewports and the blocks still in use.
+
+    Every worker loads the DXF once. Relative image paths are rebased on the sheets folder,
+    so sheet DXFs keep using the xrefs of the drawing.
+
+    :param dxf_path: saved DXF
+    :param output_folder: folder for the sheets folder
+    :param layouts: layout names to write, all paperspace layouts in tab order if None
+    :param max_workers: writer processes, defaults to CPU count
+    :return: dict with layout name -> sheet DXF path and timings
+    """
+    start = time.perf_counter()
+    dxf_path = Path(dxf_path)
+    sheets_folder = Path(output_folder) / "sheets"
+    sheets_folder.mkdir(parents=True, exist_ok=True)
+    layouts = layouts or read_layout_names(dxf_path)
+
+    sheets, write_times = {}, {}
+    if not layouts:
+        logger.info(f"No paperspace layout to split in {dxf_path.name}")
+        return {"sheets": sheets, "write_times": write_times, "wall_time": time.perf_counter() - start}
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(layouts))
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(dxf_path,),
+                             mp_context=process_context()) as pool:
+        futures = [pool.submit(_write_sheet, name, sheets_folder / f"{name}.dxf") for name in layouts]
+        for future in futures:
+            name, path, write_time = future.result()
+            sheets[name] = path
+            write_times[name] = write_time
+            logger.info(f"Wrote sheet {name} in {write_time:.2f}s")
+    logger.info(f"Split {dxf_path.name} into {len(sheets)} sheet DXFs: {sheets_folder}")
+
+    return {
+        "sheets": sheets,
+        "write_times": write_times,
+        "wall_time": time.perf_counter() - start,
+    }
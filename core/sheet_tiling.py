@@ -0,0 +1,220 @@
+import math
+import numpy as np
+import logging
+from utils.geometry_utils import as_points_array, principal_axis
+
+logger = logging.getLogger(__name__)
+
+class Tile:
+    """
+    Modelspace window shown on one sheet.
+
+    :ivar center: window center in modelspace (x, y)
+    :ivar width: window width in model units (along the route)
+    :ivar height: window height in model units (across the route)
+    :ivar angle: route direction in degrees, the sheet view is twisted by -angle
+    """
+
+    def __init__(self, center, width, height, angle=0.0):
+        self.center = (float(center[0]), float(center[1]))
+        self.width = width
+        self.height = height
+        self.angle = angle
+
+    def __repr__(self):
+        return f"Tile(center={self.center}, width={self.width:.1f}, height={self.height:.1f}, angle={self.angle:.1f})"
+
+
+def _spans(low, high, size, overlap):
+    """
+    Split [low, high] into the minimum number of windows of size with at least overlap between them.
+    Windows are spread evenly, a range shorter than size gets one centered window.
+
+    :return: (N,) array of window starts
+    """
+    extent = high - low
+    if extent <= size:
+        return np.array([low - (size - extent) / 2])
+    count = math.ceil((extent - size) / (size * (1 - overlap))) + 1
+    return low + np.arange(count) * (extent - size) / (count - 1)
+
+
+def _strip_intervals(s, t, low, high):
+    """
+    Exact t-extents of boundary segments clipped to the strip low <= s <= high, merged where they overlap.
+
+    :param s: (N, 2) segment start and end coordinates along the route
+    :param t: (N, 2) segment start and end coordinates across the route
+    :return: list of [t_min, t_max] sorted by t_min
+    """
+    s1, s2 = s[:, 0], s[:, 1]
+    t1, t2 = t[:, 0], t[:, 1]
+    ds = s2 - s1
+    flat = ds == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        u_low = np.where(flat, 0.0, (low - s1) / ds)
+        u_high = np.where(flat, 1.0, (high - s1) / ds)
+    u_min, u_max = np.minimum(u_low, u_high), np.maximum(u_low, u_high)
+    u_start, u_end = np.clip(u_min, 0.0, 1.0), np.clip(u_max, 0.0, 1.0)
+    # Segments across the route (constant s) are inside the strip whole or not at all
+    inside = np.where(flat, (s1 >= low) & (s1 <= high), (u_max >= 0) & (u_min <= 1))
+    if not inside.any():
+        return []
+    t_start = t1 + (t2 - t1) * u_start
+    t_end = t1 + (t2 - t1) * u_end
+    t_min = np.minimum(t_start, t_end)[inside]
+    t_max = np.maximum(t_start, t_end)[inside]
+
+    intervals = []
+    for interval_min, interval_max in sorted(zip(t_min, t_max)):
+        if intervals and interval_min <= intervals[-1][1]:
+            intervals[-1][1] = max(intervals[-1][1], interval_max)
+        else:
+            intervals.append([interval_min, interval_max])
+    return intervals
+
+
+def _row_groups(intervals, size, overlap):
+    """
+    Group t-intervals into ranges tiled together: neighbouring intervals are merged when one run of
+    windows over both needs no more windows than separate runs (e.g. both sides of a narrow corridor).
+
+    :param intervals: sorted, non overlapping [t_min, t_max] lists
+    :return: list of (t_min, t_max)
+    """
+    groups = []
+    for interval_min, interval_max in intervals:
+        if groups:
+            group_min, group_max = groups[-1]
+            merged = len(_spans(group_min, interval_max, size, overlap))
+            separate = len(_spans(group_min, group_max, size, overlap)) + len(_spans(interval_min, interval_max, size, overlap))
+            if merged <= separate:
+                groups[-1] = (group_min, interval_max)
+                continue
+        groups.append((interval_min, interval_max))
+    return groups
+
+
+def _tile_along(pts, along, width, height, overlap, closed):
+    """
+    Tile boundary segments in route coordinates: columns of width along the `along` axis, and rows
+    of height across it over every separate part of the boundary crossing the column.
+
+    :return: list of Tile
+    """
+    origin = pts.mean(axis=0)
+    across = np.array([-along[1], along[0]])
+    angle = math.degrees(math.atan2(along[1], along[0]))
+    ends = np.roll(pts, -1, axis=0) if closed else pts[1:]
+    starts = pts if closed else pts[:-1]
+    if len(starts) == 0:
+        starts, ends = pts, pts
+    # Route coordinates of segment ends: s along the route, t across it
+    s = np.stack([(starts - origin) @ along, (ends - origin) @ along], axis=1)
+    t = np.stack([(starts - origin) @ across, (ends - origin) @ across], axis=1)
+
+    tiles = []
+    for column_start in _spans(s.min(), s.max(), width, overlap):
+        column_center = column_start + width / 2
+        for t_min, t_max in _row_groups(_strip_intervals(s, t, column_start, column_start + width), height, overlap):
+            for row_start in _spans(t_min, t_max, height, overlap):
+                center = origin + column_center * along + (row_start + height / 2) * across
+                tiles.append(Tile(center, width, height, angle))
+    return tiles
+
+
+def compute_tiles(points, width, height, overlap=0.1, align_to_route=True, closed=True):
+    """
+    Compute the sheet windows covering a project boundary.
+
+    Windows are placed in columns along the route and stacked in rows across it only where the
+    boundary crosses the column. Boundary segments are clipped to every column, so the whole
+    boundary is covered and parts of the column the boundary does not cross get no window.
+    Windows aligned to the route direction (principal axis of the boundary) and axis aligned windows
+    in both directions are compared, the layout with the fewest windows is kept (bent routes, e.g.
+    an L, often need fewer axis aligned windows).
+    Everything is computed on the boundary points with NumPy, modelspace is never queried.
+
+    :param points: boundary points (N, 2)
+    :param width: window width in model units
+    :param height: window height in model units
+    :param overlap: min overlap between neighbouring windows as a fraction of window size
+    :param align_to_route: try windows rotated along the route, otherwise keep them axis aligned
+    :param closed: boundary is a closed polygon
+    :return: list of Tile in route order
+    """
+    if not 0 <= overlap < 1:
+        raise ValueError(f"Tile overlap must be in [0, 1), got {overlap}")
+    pts = as_points_array(points)
+    if len(pts) == 0:
+        raise ValueError("Can not tile an empty boundary.")
+
+    directions = [principal_axis(pts)] if align_to_route else []
+    directions += [np.array([1.0, 0.0]), np.array([0.0, 1.0])]
+    # min keeps the first layout on ties, the route aligned one when it is tried
+    tiles = min((_tile_along(pts, along, width, height, overlap, closed) for along in directions), key=len)
+
+    angle = tiles[0].angle if tiles else 0.0
+    logger.info(f"Boundary covered with {len(tiles)} sheet tiles of {width:.1f} x {height:.1f} (angle {angle:.1f})")
+    return tiles
+
+
+def find_main_viewport(layout):
+    """
+    Find the main drawing viewport of a layout: the largest viewport except the
+    paperspace overall viewport (id 1).
+
+    :param layout: paperspace layout
+    :return: VIEWPORT entity, None if the layout has none
+    """
+    viewports = [vp for vp in layout.query("VIEWPORT") if vp.dxf.id != 1]
+    return max(viewports, key=lambda vp: vp.dxf.width * vp.dxf.height, default=None)
+
+
+def tile_window_size(viewport, scale, paper_units_per_model_unit=1000):
+    """
+    Modelspace window size of a viewport at a drawing scale.
+
+    :param viewport: VIEWPORT entity
+    :param scale: scale denominator e.g. 500 for 1:500
+    :param paper_units_per_model_unit: paper units (mm) per model unit (m)
+    :return: (width, height) in model units
+    """
+    factor = scale / paper_units_per_model_unit
+    return viewport.dxf.width * factor, viewport.dxf.height * factor
+
+
+def set_viewport_view(viewport, tile):
+    """
+    Point a viewport to a tile. The view is twisted so the route runs horizontally on the sheet.
+
+    :param viewport: VIEWPORT entity
+    :param tile: Tile
+    """
+    twist = -tile.angle
+    # The view center is in display coordinates: modelspace rotated by the twist angle
+    radians = math.radians(twist)
+    x, y = tile.center
+    viewport.dxf.view_center_point = (
+        x * math.cos(radians) - y * math.sin(radians),
+        x * math.sin(radians) + y * math.cos(radians),
+    )
+    viewport.dxf.view_target_point = (0, 0, 0)
+    viewport.dxf.view_direction_vector = (0, 0, 1)
+    viewport.dxf.view_height = tile.height
+    viewport.dxf.view_twist_angle = twist
+
+
+def tile_sheet_names(layout_name, count):
+    """
+    Sheet names for tiles of a layout: CIV-01 -> CIV-01, CIV-02, ...
+
+    :param layout_name: template layout name ending with a sheet number
+    :param count: number of tiles
+    :return: list of layout names
+    """
+    prefix, _, number = layout_name.rpartition("-")
+    if not prefix or not number.isdigit():
+        return [layout_name] + [f"{layout_name}-{i:02d}" for i in range(2, count + 1)]
+    first = int(number)
+    return [f"{prefix}-{first + i:0{len(number)}d}" for i in range(count)]
@@ -0,0 +1,154 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import time
+import logging
+from utils.dxf_stream import read_layout_index
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_DXF_NAME = "drawing.dxf"
+
+def _diff_counts(layout_name, kind, reference, candidate):
+    """
+    Differences of two name -> count dicts.
+    """
+    return [f"{layout_name}: {kind} {name} {reference.get(name, 0)} -> {candidate.get(name, 0)}"
+            for name in sorted(reference.keys() | candidate.keys())
+            if reference.get(name, 0) != candidate.get(name, 0)]
+
+
+def _diff_viewport(layout_name, number, reference, candidate, tolerance):
+    """
+    Differences of two viewport parameter dicts from read_layout_index.
+    """
+    differences = []
+    for param, ref_value in reference.items():
+        value = candidate.get(param)
+        ref_values = ref_value if isinstance(ref_value, list) else [ref_value]
+        values = value if isinstance(value, list) else [value]
+        if len(ref_values) != len(values) or any(v is None or abs(r - v) > tolerance
+                                                  for r, v in zip(ref_values, values)):
+            differences.append(f"{layout_name}: viewport {number} {param} {ref_value} -> {value}")
+    return differences
+
+
+def diff_indexes(reference, candidate, tolerance=1e-6, ignore_tags=()):
+    """
+    Compare two layout indexes (read_layout_index) of a reference and a candidate drawing.
+
+    :param reference: index of the known-good drawing
+    :param candidate: index of the drawing to check
+    :param tolerance: max absolute difference of viewport parameters
+    :param ignore_tags: ATTRIB tags that are expected to differ (e.g. a date)
+    :return: list of differences, empty if the drawings match
+    """
+    differences = []
+    missing = [name for name in reference if name not in candidate]
+    extra = [name for name in candidate if name not in reference]
+    if missing:
+        differences.append(f"Missing layouts: {', '.join(missing)}")
+    if extra:
+        differences.append(f"Extra layouts: {', '.join(extra)}")
+    if not missing and not extra and list(reference) != list(candidate):
+        differences.append(f"Layout order {', '.join(reference)} -> {', '.join(candidate)}")
+
+    ignore_tags = set(ignore_tags)
+    for layout_name, ref_layout in reference.items():
+        layout = candidate.get(layout_name)
+        if layout is None:
+            continue
+        differences += _diff_counts(layout_name, "entities", ref_layout["entities"], layout["entities"])
+        differences += _diff_counts(layout_name, "inserts of", ref_layout["inserts"], layout["inserts"])
+
+        for key in ref_layout["attribs"].keys() | layout["attribs"].keys():
+            if key.split("/", 1)[-1].split("#", 1)[0] in ignore_tags:
+                continue
+            ref_text, text = ref_layout["attribs"].get(key), layout["attribs"].get(key)
+            if ref_text != text:
+                differences.append(f"{layout_name}: attrib {key} {ref_text!r} -> {text!r}")
+
+        if len(ref_layout["viewports"]) != len(layout["viewports"]):
+            differences.append(f"{layout_name}: viewports {len(ref_layout['viewports'])} -> {len(layout['viewports'])}")
+        else:
+            for number, (ref_viewport, viewport) in enumerate(zip(ref_layout["viewports"], layout["viewports"]), 1):
+                differences += _diff_viewport(layout_name, number, ref_viewport, viewport, tolerance)
+
+        if ref_layout["images"] != layout["images"]:
+            differences.append(f"{layout_name}: images {ref_layout['images']} -> {layout['images']}")
+    return differences
+
+
+def verify_drawing(reference, candidate, tolerance=1e-6, ignore_tags=()):
+    """
+    Compare a generated drawing against a known-good reference drawing, from streaming reads
+    of both files (the documents are not loaded).
+
+    :param reference: path to the reference DXF
+    :param candidate: path to the DXF to check
+    :param tolerance: max absolute difference of viewport parameters
+    :param ignore_tags: ATTRIB tags that are expected to differ
+    :return: dict with name, differences and check time
+    """
+    start = time.perf_counter()
+    candidate = Path(candidate)
+    if not candidate.exists():
+        differences = [f"Output not found: {candidate}"]
+    else:
+        try:
+            differences = diff_indexes(read_layout_index(reference), read_layout_index(candidate),
+                                       tolerance=tolerance, ignore_tags=ignore_tags)
+        except ValueError as e:
+            differences = [f"Drawing can not be read: {e}"]
+    return {
+        "name": str(candidate),
+        "differences": differences,
+        "time": time.perf_counter() - start,
+    }
+
+
+def _verify_pair(args):
+    return verify_drawing(*args)
+
+
+def verify_batch(reference_folder, candidate_folder, tolerance=1e-6, ignore_tags=(), max_workers=None):
+    """
+    Compare a batch of outputs against golden references in parallel.
+    Every <reference_folder>/<job>/drawing.dxf is compared to <candidate_folder>/<job>/drawing.dxf,
+    e.g. the outputs folder of a batch queue against a folder of known-good outputs.
+
+    :param reference_folder: folder with golden outputs
+    :param candidate_folder: folder with outputs to check
+    :param tolerance: max absolute difference of viewport parameters
+    :param ignore_tags: ATTRIB tags that are expected to differ
+    :param max_workers: worker processes, defaults to CPU count
+    :return: list of verify_drawing results in job order
+    """
+    start = time.perf_counter()
+    reference_folder, candidate_folder = Path(reference_folder), Path(candidate_folder)
+    references = sorted(reference_folder.rglob(OUTPUT_DXF_NAME))
+    if not references:
+        raise ValueError(f"No reference {OUTPUT_DXF_NAME} found in {reference_folder}")
+    pairs = [(reference, candidate_folder / reference.relative_to(reference_folder), tolerance, tuple(ignore_tags))
+             for reference in references]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(_verify_pair, pairs))
+    failed = sum(1 for result in results if result["differences"])
+    logger.info(f"Verified {len(results)} drawings in {time.perf_counter() - start:.2f}s, {failed} with differences")
+    return results
+
+
+def format_verify(results):
+    """
+    Format verification results for console output.
+
+    :param results: verify_drawing() or verify_batch() results
+    :return: report text
+    """
+    lines = []
+    for result in results:
+        status = "DIFF" if result["differences"] else "OK"
+        lines.append(f"[{status}] {result['name']} ({result['time'] * 1000:.0f} ms)")
+        lines += [f"    {difference}" for difference in result["differences"]]
+    failed = sum(1 for result in results if result["differences"])
+    lines.append(f"{len(results) - failed} of {len(results)} drawings match the reference")
+    return "\n".join(lines)
@@ -1,12 +1,146 @@
+import argparse
+import sys
 from config.logging_config import setup_logging
-from utils.file_loader import load_json_file
+from pathlib import Path
+from utils.file_loader import load_json_file, load_job_manifest
 from core.drawing_generator import DrawingGenerator
 
+def generate(args):
+    data = load_json_file(args.input)
+    generator = DrawingGenerator(data, landbase_path=args.landbase, tile_sheets=args.tile_sheets,
+                                 export_formats=args.export, map_backend=args.map_backend, map_data=args.map_data,
+                                 layouts=args.layouts, split_sheets=args.split_sheets)
+    generator.generate()
+
+def export(args):
+    from core.plot_export import export_layouts
+    export_layouts(args.dxf, args.output or Path(args.dxf).parent, formats=args.formats,
+                   layouts=args.layouts, dpi=args.dpi, max_workers=args.workers)
+
+def submit(args):
+    from core.job_queue import FileJobQueue
+    queue = FileJobQueue(args.queue)
+    for job in load_job_manifest(args.manifest):
+        queue.submit(job["input_data"], job["landbase"], job_id=job["job_id"])
+
+def worker(args):
+    from core.batch_worker import run_worker, run_workers
+    worker_kwargs = dict(
+        max_jobs=args.max_jobs,
+        lease_timeout=args.lease_timeout,
+        max_attempts=args.max_attempts,
+        exit_when_empty=args.exit_when_empty,
+        recycle_after=args.recycle_after,
+        max_rss_mb=args.max_rss_mb,
+    )
+    # Recycled workers are replaced by the supervisor of run_workers
+    if args.processes > 1 or args.recycle_after or args.max_rss_mb:
+        run_workers(args.queue, args.processes, **worker_kwargs)
+    else:
+        run_worker(args.queue, **worker_kwargs)
+
+def status(args):
+    from core.batch_worker import format_status
+    from core.job_queue import FileJobQueue
+    print(format_status(FileJobQueue(args.queue, lease_timeout=args.lease_timeout).status(window=args.window)))
+
+def gc_assets(args):
+    from utils.asset_store import AssetStore
+    AssetStore(args.store).gc(grace=args.grace, dry_run=args.dry_run)
+
+def preflight(args):
+    from core.preflight import preflight, format_preflight
+    results = preflight(load_job_manifest(args.manifest), max_workers=args.workers)
+    print(format_preflight(results))
+    if any(result["problems"] for result in results):
+        sys.exit(1)
+
+def verify(args):
+    from core.verify import verify_drawing, verify_batch, format_verify
+    options = dict(tolerance=args.tolerance, ignore_tags=args.ignore_tags)
+    if Path(args.reference).is_dir():
+        results = verify_batch(args.reference, args.candidate, max_workers=args.workers, **options)
+    else:
+        results = [verify_drawing(args.reference, args.candidate, **options)]
+    print(format_verify(results))
+    if any(result["differences"] for result in results):
+        sys.exit(1)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate project drawings.")
+    parser.set_defaults(func=generate, input="data/inputs/input_data.json", landbase="data/inputs/landbase.dxf",
+                        tile_sheets=False, export=[], map_backend=None, map_data=None, layouts=None,
+                        split_sheets=False)
+    commands = parser.add_subparsers(title="commands")
+
+    cmd = commands.add_parser("generate", help="generate one drawing (default)")
+    cmd.add_argument("--input", default="data/inputs/input_data.json", help="input data JSON")
+    cmd.add_argument("--landbase", default="data/inputs/landbase.dxf", help="project landbase DXF/DWG")
+    cmd.add_argument("--tile-sheets", action="store_true", help="split scaled layouts into sheets covering the boundary")
+    cmd.add_argument("--export", nargs="+", default=[], choices=["pdf", "png"], help="render layouts after saving")
+    cmd.add_argument("--map-backend", default=None, choices=["mapbox", "local"],
+                     help="project area map source, defaults to MAP_BACKEND from .env or mapbox")
+    cmd.add_argument("--map-data", default=None, help="local map extract (.mbtiles/.gpkg), defaults to MAP_DATA")
+    cmd.add_argument("--layouts", nargs="+", default=None, help="template layouts to generate, defaults to all")
+    cmd.add_argument("--split-sheets", action="store_true", help="also write every sheet as its own DXF")
+    cmd.set_defaults(func=generate)
+
+    cmd = commands.add_parser("export", help="render layouts of a drawing to PDF/PNG")
+    cmd.add_argument("dxf", help="generated drawing DXF")
+    cmd.add_argument("--output", default=None, help="output folder, defaults to the DXF folder")
+    cmd.add_argument("--formats", nargs="+", default=["pdf"], choices=["pdf", "png"], help="export formats")
+    cmd.add_argument("--layouts", nargs="+", default=None, help="layouts to export, defaults to all")
+    cmd.add_argument("--dpi", type=int, default=150, help="PNG resolution")
+    cmd.add_argument("--workers", type=int, default=None, help="render processes, defaults to CPU count")
+    cmd.set_defaults(func=export)
+
+    cmd = commands.add_parser("submit", help="submit manifest jobs to a batch queue")
+    cmd.add_argument("queue", help="shared queue folder")
+    cmd.add_argument("manifest", help="batch manifest JSON")
+    cmd.set_defaults(func=submit)
+
+    cmd = commands.add_parser("preflight", help="check manifest jobs without loading CAD files")
+    cmd.add_argument("manifest", help="batch manifest JSON")
+    cmd.add_argument("--workers", type=int, default=None, help="check processes, defaults to CPU count")
+    cmd.set_defaults(func=preflight)
+
+    cmd = commands.add_parser("worker", help="process jobs from a batch queue")
+    cmd.add_argument("queue", help="shared queue folder")
+    cmd.add_argument("--processes", type=int, default=1, help="worker processes on this host")
+    cmd.add_argument("--max-jobs", type=int, default=None, help="stop each worker after N jobs")
+    cmd.add_argument("--lease-timeout", type=float, default=120, help="seconds before a silent lease is retried")
+    cmd.add_argument("--max-attempts", type=int, default=3, help="attempts before a job fails")
+    cmd.add_argument("--exit-when-empty", action="store_true", help="stop when the queue is empty")
+    cmd.add_argument("--recycle-after", type=int, default=None, help="replace a worker process after N jobs")
+    cmd.add_argument("--max-rss-mb", type=float, default=None, help="replace a worker process above this RSS after a job")
+    cmd.set_defaults(func=worker)
+
+    cmd = commands.add_parser("status", help="show batch queue status")
+    cmd.add_argument("queue", help="shared queue folder")
+    cmd.add_argument("--lease-timeout", type=float, default=120, help="seconds before a silent lease is stale")
+    cmd.add_argument("--window", type=float, default=900, help="seconds of finished jobs used for throughput")
+    cmd.set_defaults(func=status)
+
+    cmd = commands.add_parser("gc-assets", help="remove xref assets no output references")
+    cmd.add_argument("store", help="asset store folder e.g. output/assets or <queue>/assets")
+    cmd.add_argument("--grace", type=float, default=3600, help="keep assets younger than this many seconds")
+    cmd.add_argument("--dry-run", action="store_true", help="only report what would be removed")
+    cmd.set_defaults(func=gc_assets)
+
+    cmd = commands.add_parser("verify", help="compare generated drawings against known-good references")
+    cmd.add_argument("reference", help="reference DXF, or folder of golden outputs (<job>/drawing.dxf)")
+    cmd.add_argument("candidate", help="DXF to check, or folder of outputs e.g. <queue>/outputs")
+    cmd.add_argument("--tolerance", type=float, default=1e-6, help="max viewport parameter difference")
+    cmd.add_argument("--ignore-tags", nargs="+", default=[], help="ATTRIB tags expected to differ e.g. DESIGN_DATE")
+    cmd.add_argument("--workers", type=int, default=None, help="check processes, defaults to CPU count")
+    cmd.set_defaults(func=verify)
+
+    return parser.parse_args()
+
 def main():
     setup_logging()
-    data = load_json_file("data/inputs/input_data.json")
-    generator = DrawingGenerator(data)
-    generator.generate()
+    args = parse_args()
+    args.func(args)
 
 if __name__ == "__main__":
     main()
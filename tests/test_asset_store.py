@@ -0,0 +1,59 @@
+import shutil
+from utils.asset_store import AssetStore, XREF_FOLDER_NAME
+
+
+def write(path, content):
+    path.write_bytes(content)
+    return path
+
+
+def test_same_content_is_stored_once(tmp_path):
+    store = AssetStore(tmp_path / "store")
+    first = store.add_xref(write(tmp_path / "a.png", b"map"), tmp_path / "out1")
+    second = store.add_xref(write(tmp_path / "b.png", b"map"), tmp_path / "out2")
+    assert first == second
+    assert first.startswith(f"{XREF_FOLDER_NAME}/")
+    assert len(list((store.root / "objects").glob("*/*"))) == 1
+
+
+def test_regenerated_output_releases_replaced_asset(tmp_path):
+    store = AssetStore(tmp_path / "store")
+    output = tmp_path / "out"
+    old = store.add_xref(write(tmp_path / "old.png", b"old map"), output)
+    new = store.add_xref(write(tmp_path / "new.png", b"new map"), output)
+    (output / XREF_FOLDER_NAME / "legacy.png").write_bytes(b"not an asset")
+
+    assert store.prune_xrefs(output, [new]) == 1
+    assert not (output / old).exists()
+    assert (output / new).exists()
+    assert (output / XREF_FOLDER_NAME / "legacy.png").exists()
+
+    assert store.gc(grace=0)["removed"] == 1
+    assert [path.name for path in (store.root / "objects").glob("*/*")] == [new.split("/")[-1]]
+
+
+def test_gc_keeps_linked_objects(tmp_path):
+    store = AssetStore(tmp_path / "store")
+    store.add_xref(write(tmp_path / "a.png", b"map"), tmp_path / "out")
+    assert store.gc(grace=0)["removed"] == 0
+    shutil.rmtree(tmp_path / "out")
+    assert store.gc(grace=0)["removed"] == 1
+
+
+def test_derived_copy_is_kept_while_its_object_exists(tmp_path):
+    store = AssetStore(tmp_path / "store")
+    stored = store.put_derived("key", write(tmp_path / "landbase.dxf", b"converted"))
+    derived = store.root / "derived" / "key.dxf"
+    # File system without hardlinks: the derived entry is a copy of its object
+    derived.unlink()
+    shutil.copyfile(stored, derived)
+    store.link(stored, tmp_path / "out")
+
+    store.gc(grace=0)
+    assert derived.exists()
+    assert store.get_derived("key", ".dxf") == derived
+
+    shutil.rmtree(tmp_path / "out")
+    store.gc(grace=0)
+    assert not stored.exists()
+    assert not derived.exists()
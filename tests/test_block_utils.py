@@ -0,0 +1,92 @@
+import ezdxf
+import pytest
+from ezdxf.enums import TextEntityAlignment
+from utils.block_utils import replace_placeholder_text_with_block, replace_placeholders_with_blocks
+
+
+def add_placeholder(layout, text, position, **dxfattribs):
+    layout.add_text(text, dxfattribs=dxfattribs).set_placement(position, align=TextEntityAlignment.MIDDLE_CENTER)
+
+
+@pytest.fixture
+def doc():
+    """
+    North arrow and stamp placeholders on three sheets and in modelspace.
+    """
+    doc = ezdxf.new("R2010")
+    doc.blocks.new("NORTH").add_circle((0, 0), 1)
+    stamp = doc.blocks.new("STAMP")
+    stamp.add_attdef("ENGINEER", (0, 0))
+    stamp.add_attdef("DATE", (0, -2))
+
+    add_placeholder(doc.modelspace(), "[NORTH]", (5, 5))
+    for name in ("CIV-01", "CIV-02", "ELE-01"):
+        layout = doc.layouts.new(name)
+        add_placeholder(layout, "[NORTH]", (10, 20), layer="TITLE", rotation=90)
+        add_placeholder(layout, "[STAMP]", (50, 20))
+        layout.add_text("[NORTH] arrow", dxfattribs={"insert": (0, 0)})
+    add_placeholder(doc.layouts.get("CIV-02"), "[NORTH]", (30, 20))
+    return doc
+
+
+def texts(layout):
+    return sorted(entity.dxf.text for entity in layout.query("TEXT"))
+
+
+def inserts(layout):
+    return sorted(entity.dxf.name for entity in layout.query("INSERT"))
+
+
+def test_only_selected_layouts_are_replaced(doc):
+    result = replace_placeholders_with_blocks(doc, {"[NORTH]": "NORTH", "[STAMP]": "STAMP"},
+                                              layout_names=["CIV-01", "CIV-02"])
+    assert result["replaced"] == {"[NORTH]": 3, "[STAMP]": 2}
+    assert result["time"] >= 0
+    for name in ("CIV-01", "CIV-02"):
+        assert texts(doc.layouts.get(name)) == ["[NORTH] arrow"]
+    assert inserts(doc.layouts.get("CIV-02")) == ["NORTH", "NORTH", "STAMP"]
+    # Layout not selected and modelspace are left alone
+    assert texts(doc.layouts.get("ELE-01")) == ["[NORTH]", "[NORTH] arrow", "[STAMP]"]
+    assert inserts(doc.layouts.get("ELE-01")) == []
+    assert texts(doc.modelspace()) == ["[NORTH]"]
+    assert inserts(doc.modelspace()) == []
+
+
+def test_all_paperspace_layouts_by_default(doc):
+    result = replace_placeholders_with_blocks(doc, {"[NORTH]": "NORTH", "[MISSING]": "NORTH"})
+    assert result["replaced"] == {"[NORTH]": 4, "[MISSING]": 0}
+    assert texts(doc.modelspace()) == ["[NORTH]"]
+
+
+def test_block_reference_takes_the_placeholder_placement(doc):
+    replace_placeholders_with_blocks(doc, {"[NORTH]": "NORTH"}, layout_names=["CIV-01"])
+    [blockref] = doc.layouts.get("CIV-01").query("INSERT")
+    # Middle center text: the align point is the insertion point
+    assert blockref.dxf.insert.isclose((10, 20))
+    assert blockref.dxf.rotation == 90
+    assert blockref.dxf.layer == "TITLE"
+
+
+def test_block_attributes(doc):
+    replace_placeholders_with_blocks(doc, {"[STAMP]": ("STAMP", {"ENGINEER": "J. Doe", "DATE": "2024-05-01"})},
+                                     layout_names=["ELE-01"])
+    [blockref] = doc.layouts.get("ELE-01").query("INSERT")
+    assert {attrib.dxf.tag: attrib.dxf.text for attrib in blockref.attribs} == {"ENGINEER": "J. Doe",
+                                                                                 "DATE": "2024-05-01"}
+
+
+def test_single_placeholder_wrapper(doc):
+    replace_placeholder_text_with_block(doc, "[STAMP]", "STAMP")
+    assert all(texts(doc.layouts.get(name)).count("[STAMP]") == 0 for name in ("CIV-01", "CIV-02", "ELE-01"))
+
+
+def test_missing_block(doc):
+    with pytest.raises(ValueError, match="Block 'COMPASS' not found"):
+        replace_placeholders_with_blocks(doc, {"[NORTH]": "COMPASS"})
+    assert texts(doc.layouts.get("CIV-01")) == ["[NORTH]", "[NORTH] arrow", "[STAMP]"]
+
+
+def test_modelspace_can_not_be_selected(doc):
+    with pytest.raises(ValueError, match="'Model' is not a paperspace layout"):
+        replace_placeholders_with_blocks(doc, {"[NORTH]": "NORTH"}, layout_names=["Model"])
+    assert texts(doc.modelspace()) == ["[NORTH]"]
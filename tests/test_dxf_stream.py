@@ -0,0 +1,207 @@
+from collections import Counter
+import ezdxf
+import pytest
+from ezdxf.lldxf.tagger import ascii_tags_loader
+from utils.dxf_stream import (find_entity_on_layer, iter_dxf_entities, iter_dxf_tags, read_dxf_header,
+                              read_layout_index, read_layout_names, read_table_entries)
+
+
+def make_drawing(path):
+    """
+    Small drawing with a modelspace boundary, a paperspace polyline on the same layer (other case)
+    and layer names with regex characters.
+    """
+    doc = ezdxf.new("R2010", setup=True)
+    doc.header["$INSUNITS"] = 6
+    for name in ("Boundary", "Roads", "A.B", "AxB"):
+        doc.layers.add(name)
+    msp = doc.modelspace()
+    msp.add_line((0, 0), (10, 0), dxfattribs={"layer": "Roads"})
+    msp.add_lwpolyline([(0, 0), (100, 0), (100, 50), (0, 50)], close=True, dxfattribs={"layer": "Boundary"})
+    msp.add_circle((5, 5), 1, dxfattribs={"layer": "AxB"})
+    doc.layout("Layout1").add_lwpolyline([(0, 0), (1, 1)], dxfattribs={"layer": "BOUNDARY"})
+    doc.saveas(path)
+    return ezdxf.readfile(path)
+
+
+@pytest.fixture
+def drawing(tmp_path):
+    path = tmp_path / "drawing.dxf"
+    return path, make_drawing(path)
+
+
+def test_tags_match_ezdxf_tagger(drawing):
+    path, _ = drawing
+    with open(path, encoding="utf-8") as f:
+        expected = [(tag.code, tag.value) for tag in ascii_tags_loader(f, skip_comments=False)]
+    assert list(iter_dxf_tags(path)) == expected
+
+
+def test_tags_reject_binary_dxf(tmp_path):
+    path = tmp_path / "binary.dxf"
+    ezdxf.new("R2010").saveas(path, fmt="bin")
+    with pytest.raises(ValueError, match="Binary DXF"):
+        next(iter_dxf_tags(path))
+
+
+def test_tags_reject_invalid_group_code(tmp_path):
+    path = tmp_path / "broken.dxf"
+    path.write_text("  0\nSECTION\nabc\nHEADER\n")
+    with pytest.raises(ValueError, match="Invalid DXF group code"):
+        list(iter_dxf_tags(path))
+
+
+def test_header_matches_ezdxf(drawing):
+    path, doc = drawing
+    header = read_dxf_header(path)
+    for name in ("$ACADVER", "$HANDSEED", "$INSUNITS", "$DWGCODEPAGE"):
+        assert header[name] == str(doc.header[name])
+
+
+def test_table_entries_match_ezdxf(drawing):
+    path, doc = drawing
+    assert read_table_entries(path, "LAYER") == [layer.dxf.name for layer in doc.layers]
+    assert read_table_entries(path, "STYLE") == [style.dxf.name for style in doc.styles]
+    assert read_table_entries(path, "BLOCK_RECORD") == [record.dxf.name for record in doc.block_records]
+
+
+def test_missing_table_has_no_entries(drawing):
+    path, _ = drawing
+    assert read_table_entries(path, "NO_SUCH_TABLE") == []
+
+
+@pytest.mark.parametrize("layer", ["Boundary", "BOUNDARY", "boundary"])
+def test_find_entity_on_layer_is_case_insensitive(drawing, layer):
+    path, doc = drawing
+    expected = doc.modelspace().query('LWPOLYLINE[layer=="Boundary"]').first
+    tags = find_entity_on_layer(path, "LWPOLYLINE", layer)
+    assert tags is not None
+    assert tags[5] == [expected.dxf.handle]
+    assert tags[8] == ["Boundary"]
+    assert int(tags[90][0]) == len(expected)
+
+
+def test_find_entity_on_layer_skips_paperspace(drawing):
+    path, doc = drawing
+    doc.modelspace().delete_entity(doc.modelspace().query("LWPOLYLINE").first)
+    doc.saveas(path)
+    assert find_entity_on_layer(path, "LWPOLYLINE", "boundary") is None
+
+
+def test_find_entity_on_layer_matches_type_and_literal_name(drawing):
+    path, doc = drawing
+    assert find_entity_on_layer(path, "CIRCLE", "Roads") is None
+    assert find_entity_on_layer(path, "CIRCLE", "A.B") is None
+    circle = find_entity_on_layer(path, "CIRCLE", "axb")
+    assert circle[5] == [doc.modelspace().query("CIRCLE").first.dxf.handle]
+
+
+def test_find_entity_on_layer_empty_file(tmp_path):
+    path = tmp_path / "empty.dxf"
+    path.write_bytes(b"")
+    assert find_entity_on_layer(path, "LWPOLYLINE", "Boundary") is None
+
+
+def make_sheet_set(path, shift_handles=False):
+    """
+    Drawing with two paperspace layouts (one stored in the BLOCKS section), a title block with
+    attributes, viewports and an image. shift_handles creates throwaway entities first, so every
+    handle differs from a drawing generated without it.
+    """
+    doc = ezdxf.new("R2010", setup=True)
+    if shift_handles:
+        scratch = doc.blocks.new("SCRATCH")
+        for _ in range(25):
+            scratch.add_point((0, 0))
+        doc.blocks.delete_block("SCRATCH", safe=False)
+    title = doc.blocks.new("TITLE")
+    title.add_line((0, 0), (100, 0))
+    title.add_attdef("SHEET", (0, 0))
+    title.add_attdef("DATE", (0, 5))
+
+    msp = doc.modelspace()
+    msp.add_lwpolyline([(0, 0), (100, 0), (100, 50)], dxfattribs={"layer": "Boundary"})
+    msp.add_circle((5, 5), 1)
+    image_def = doc.add_image_def("xref/map.png", (640, 480))
+
+    for number, name in enumerate(("CIV-01", "CIV-02"), 1):
+        layout = doc.layouts.new(name)
+        layout.add_viewport((150, 100), (200, 150), (50 * number, 25), 60)
+        layout.add_blockref("TITLE", (0, 0)).add_auto_attribs({"SHEET": name, "DATE": "2026-10-19"})
+        layout.add_blockref("TITLE", (0, 20))
+        layout.add_image(image_def, (0, 0), (64, 48))
+        # Anonymous block numbers depend on creation order
+        doc.blocks.new_anonymous_block()
+    doc.layouts.delete("Layout1")
+    doc.saveas(path)
+    return ezdxf.readfile(path)
+
+
+def test_layout_names_match_ezdxf(tmp_path):
+    path = tmp_path / "sheets.dxf"
+    doc = make_sheet_set(path)
+    assert read_layout_names(path) == doc.layout_names_in_taborder()[1:] == ["CIV-01", "CIV-02"]
+
+
+def test_entities_match_ezdxf(tmp_path):
+    path = tmp_path / "sheets.dxf"
+    doc = make_sheet_set(path)
+    streamed = {}
+    for section, tags in iter_dxf_entities(path, sections=("ENTITIES", "BLOCKS")):
+        # ezdxf gives SEQENDs new handles on load
+        if tags[0][1] not in ("BLOCK", "ENDBLK", "SEQEND"):
+            streamed[dict(tags)[5]] = tags[0][1]
+    expected = {entity.dxf.handle: entity.dxftype() for name in doc.layout_names()
+                for entity in doc.layout(name)}
+    expected.update({attrib.dxf.handle: "ATTRIB" for insert in doc.query("INSERT") for attrib in insert.attribs})
+    for block in doc.blocks:
+        if not block.block_record.is_any_layout:
+            expected.update({entity.dxf.handle: entity.dxftype() for entity in block})
+    assert streamed == expected
+
+
+def test_layout_index_matches_ezdxf(tmp_path):
+    path = tmp_path / "sheets.dxf"
+    doc = make_sheet_set(path)
+    index = read_layout_index(path)
+    assert list(index) == doc.layout_names_in_taborder()
+
+    for name in index:
+        layout = doc.layout(name)
+        entities = Counter(entity.dxftype() for entity in layout)
+        inserts = layout.query("INSERT")
+        attribs = [attrib for insert in inserts for attrib in insert.attribs]
+        if attribs:
+            entities["ATTRIB"] = len(attribs)
+        assert index[name]["entities"] == dict(entities)
+        assert index[name]["inserts"] == dict(Counter(insert.dxf.name for insert in inserts))
+        assert index[name]["attribs"] == {f"TITLE/{attrib.dxf.tag}": attrib.dxf.text for attrib in attribs}
+        viewports = layout.query("VIEWPORT")
+        assert [viewport["view_center"] for viewport in index[name]["viewports"]] == \
+               [list(viewport.dxf.view_center_point.vec2) for viewport in viewports]
+        assert index[name]["images"] == ["xref/map.png"] * len(layout.query("IMAGE"))
+
+    assert index["CIV-02"]["attribs"]["TITLE/SHEET"] == "CIV-02"
+    assert index["Model"]["entities"] == {"CIRCLE": 1, "LWPOLYLINE": 1}
+
+
+def test_layout_index_ignores_handles_and_anonymous_block_numbers(tmp_path):
+    doc = make_sheet_set(tmp_path / "first.dxf")
+    shifted = make_sheet_set(tmp_path / "second.dxf", shift_handles=True)
+    assert doc.layout("CIV-01").query("VIEWPORT").first.dxf.handle != \
+           shifted.layout("CIV-01").query("VIEWPORT").first.dxf.handle
+    assert read_layout_index(tmp_path / "first.dxf") == read_layout_index(tmp_path / "second.dxf")
+
+
+def test_layout_index_detects_changes(tmp_path):
+    path = tmp_path / "sheets.dxf"
+    doc = make_sheet_set(path)
+    reference = read_layout_index(path)
+    layout = doc.layout("CIV-02")
+    layout.query("VIEWPORT").first.dxf.view_height = 30
+    layout.query("INSERT").first.get_attrib("SHEET").dxf.text = "CIV-03"
+    doc.saveas(path)
+    index = read_layout_index(path)
+    assert index["CIV-01"] == reference["CIV-01"]
+    assert index["CIV-02"]["viewports"][-1]["view_height"] == 30
+    assert index["CIV-02"]["attribs"]["TITLE/SHEET"] == "CIV-03"
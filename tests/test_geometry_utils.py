@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from utils.geometry_utils import principal_axis, simplify_douglas_peucker
+
+
+class TestSimplifyDouglasPeucker:
+    def test_removes_collinear_vertices(self):
+        line = [(0, 0), (2, 0.01), (5, 0), (10, 0)]
+        np.testing.assert_array_equal(simplify_douglas_peucker(line, 0.1), [(0, 0), (10, 0)])
+
+    def test_keeps_vertices_beyond_tolerance(self):
+        line = [(0, 0), (5, 1), (10, 0)]
+        np.testing.assert_array_equal(simplify_douglas_peucker(line, 0.5), line)
+
+    def test_closed_ring_keeps_corners(self):
+        ring = [(0, 0), (5, 0), (10, 0), (10, 10), (5, 10.01), (0, 10)]
+        result = simplify_douglas_peucker(ring, 0.1, closed=True)
+        np.testing.assert_array_equal(result, [(0, 0), (10, 0), (10, 10), (0, 10)])
+
+    def test_closed_ring_does_not_repeat_first_vertex(self):
+        ring = [(0, 0), (10, 0), (10, 10), (0, 10)]
+        result = simplify_douglas_peucker(ring, 0.1, closed=True)
+        assert len(result) == 4
+        assert not np.array_equal(result[0], result[-1])
+
+    def test_degenerate_closed_ring_is_unchanged(self):
+        ring = [(0, 0), (5, 0), (10, 0), (5, 0.01)]
+        np.testing.assert_array_equal(simplify_douglas_peucker(ring, 1.0, closed=True), ring)
+
+    def test_zero_length_segments(self):
+        line = [(0, 0), (0, 0), (5, 0.01), (10, 0), (10, 0)]
+        result = simplify_douglas_peucker(line, 0.1)
+        assert np.isfinite(result).all()
+        np.testing.assert_array_equal(result, [(0, 0), (10, 0)])
+
+    @pytest.mark.parametrize("points", [[], [(1, 2)], [(0, 0), (3, 4)]])
+    def test_fewer_than_three_points(self, points):
+        result = simplify_douglas_peucker(points, 1.0)
+        assert len(result) == len(points)
+
+    def test_zero_tolerance_returns_copy(self):
+        line = np.array([(0, 0), (5, 0), (10, 0)], dtype=float)
+        result = simplify_douglas_peucker(line, 0)
+        np.testing.assert_array_equal(result, line)
+        assert result is not line
+
+    def test_long_polyline_within_tolerance(self):
+        x = np.linspace(0, 1000, 20001)
+        line = np.column_stack([x, np.sin(x / 10)])
+        result = simplify_douglas_peucker(line, 0.05)
+        assert 3 < len(result) < len(line)
+        # Every removed vertex lies within tolerance of the simplified polyline
+        deviations = np.abs(np.interp(x, result[:, 0], result[:, 1]) - line[:, 1])
+        assert deviations.max() <= 0.05 + 1e-9
+
+
+class TestPrincipalAxis:
+    @pytest.mark.parametrize("points", [[], [(3, 4)]])
+    def test_fewer_than_two_points(self, points):
+        np.testing.assert_array_equal(principal_axis(points), [1.0, 0.0])
+
+    def test_horizontal_points_reversed(self):
+        points = [(10, 0), (5, 0.1), (0, 0)]
+        np.testing.assert_allclose(principal_axis(points), [1, 0], atol=1e-3)
+
+    def test_vertical_points_point_up(self):
+        points = [(0, 10), (0, 5), (0, 0)]
+        np.testing.assert_allclose(principal_axis(points), [0, 1], atol=1e-12)
+
+    def test_diagonal_points_to_positive_x(self):
+        points = [(10, 10), (0, 0), (-5, -5)]
+        axis = principal_axis(points)
+        np.testing.assert_allclose(axis, [np.sqrt(0.5), np.sqrt(0.5)], atol=1e-12)
+
+    def test_closed_ring_of_elongated_rectangle(self):
+        x = np.arange(0, 101)
+        ring = np.vstack([np.column_stack([x, np.zeros_like(x)]), np.column_stack([x[::-1], np.full_like(x, 10)])])
+        np.testing.assert_allclose(principal_axis(ring), [1, 0], atol=1e-12)
+
+    def test_coincident_points_return_unit_vector(self):
+        axis = principal_axis([(2, 2), (2, 2), (2, 2)])
+        assert np.isfinite(axis).all()
+        assert np.hypot(*axis) == pytest.approx(1.0)
@@ -0,0 +1,134 @@
+import multiprocessing
+import os
+import signal
+import time
+import pytest
+from core import batch_worker
+from core.job_queue import FileJobQueue
+
+fork = multiprocessing.get_context("fork")
+
+
+def fake_run_job(queue, job):
+    """
+    Stand-in for drawing generation: log the execution and wait.
+    """
+    data = job["input_data"]
+    with open(data["log"], "a") as f:
+        f.write(job["job_id"] + "\n")
+    if data.get("drop_lease"):
+        # Simulate a lease reclaimed by another worker while the job runs
+        for path in (queue.root / "leased").glob(f"{job['job_id']}.*.json"):
+            path.unlink()
+    deadline = time.time() + data.get("sleep", 0.0)
+    while time.time() < deadline:
+        time.sleep(0.01)
+    return {"wall_time": data.get("sleep", 0.0)}
+
+
+def worker(queue_dir, **kwargs):
+    kwargs = dict(dict(poll_interval=0.05, heartbeat_interval=0.1, lease_timeout=1.0, exit_when_empty=True), **kwargs)
+    batch_worker.run_worker(queue_dir, **kwargs)
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    # Forked worker processes inherit the patched job function
+    monkeypatch.setattr(batch_worker, "run_job", fake_run_job)
+    return FileJobQueue(tmp_path / "queue", lease_timeout=1.0)
+
+
+def submit(queue, tmp_path, count, **data):
+    log = tmp_path / "executions.log"
+    return [queue.submit(dict(data, log=str(log)), tmp_path / "landbase.dxf", job_id=f"job-{i:02d}")
+            for i in range(count)], log
+
+
+def test_every_job_runs_exactly_once(queue, tmp_path):
+    job_ids, log = submit(queue, tmp_path, 12, sleep=0.05)
+    workers = [fork.Process(target=worker, args=(queue.root,)) for _ in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    assert sorted(log.read_text().split()) == job_ids
+    assert sorted(path.stem for path in (queue.root / "done").glob("*.json")) == job_ids
+    status = queue.status()
+    assert status["counts"] == {"pending": 0, "leased": 0, "done": 12, "failed": 0}
+
+
+def test_killed_worker_lease_is_reclaimed(queue, tmp_path):
+    (job_id,), log = submit(queue, tmp_path, 1, sleep=60)
+    stuck = fork.Process(target=worker, args=(queue.root,))
+    stuck.start()
+    deadline = time.time() + 30
+    while not log.exists() and time.time() < deadline:
+        time.sleep(0.05)
+    os.kill(stuck.pid, signal.SIGKILL)
+    stuck.join()
+    assert len(list((queue.root / "leased").glob("*.json"))) == 1
+
+    # The job is taken over by another worker once the dead lease is older than lease_timeout
+    job = queue._read_json(next((queue.root / "leased").glob("*.json")))
+    job["input_data"]["sleep"] = 0.0
+    queue._write_json(next((queue.root / "leased").glob("*.json")), job)
+    rescuer = fork.Process(target=worker, args=(queue.root,))
+    rescuer.start()
+    rescuer.join(timeout=60)
+
+    assert rescuer.exitcode == 0
+    done = queue._read_json(queue.root / "done" / f"{job_id}.json")
+    assert done["attempts"] == 1
+    assert "Lease abandoned" in done["errors"][0]
+    assert log.read_text().split() == [job_id, job_id]
+
+
+def test_lost_lease_stops_the_job(queue, tmp_path):
+    (job_id,), log = submit(queue, tmp_path, 1, sleep=30, drop_lease=True)
+    start = time.time()
+    processed, reason = batch_worker.run_worker(queue.root, poll_interval=0.05, heartbeat_interval=0.1,
+                                                lease_timeout=1.0, exit_when_empty=True)
+    assert time.time() - start < 10
+    assert (processed, reason) == (1, "empty")
+    # Neither completed nor failed by the worker that lost the lease
+    assert not list((queue.root / "done").glob("*.json"))
+    assert not list((queue.root / "failed").glob("*.json"))
+
+
+def test_lease_restarts_the_heartbeat_clock(queue, tmp_path):
+    (job_id,), _ = submit(queue, tmp_path, 1)
+    pending = queue.root / "pending" / f"{job_id}.json"
+    os.utime(pending, (time.time() - 3600, time.time() - 3600))
+
+    job, lease_path = queue.lease("worker-1")
+    assert job["job_id"] == job_id
+    assert time.time() - lease_path.stat().st_mtime < 5
+    assert queue.reclaim_abandoned("worker-2") == 0
+
+
+@pytest.mark.parametrize("skew", [-3600, 3600])
+def test_lease_age_uses_the_share_clock(queue, tmp_path, monkeypatch, skew):
+    job_ids, _ = submit(queue, tmp_path, 2)
+    _, fresh = queue.lease("worker-1")
+    _, stale = queue.lease("worker-2")
+    real_time = time.time()
+    os.utime(stale, (real_time - 60, real_time - 60))
+    queue.update_worker("worker-1")
+
+    # The local clock of this host is an hour off, the share clock is not
+    monkeypatch.setattr(time, "time", lambda: real_time + skew)
+    assert abs(queue.now() - real_time) < 5
+    status = queue.status()
+    assert status["stale_leases"] == 1
+    assert [info["worker_id"] for info in status["workers"]] == ["worker-1"]
+    assert queue.reclaim_abandoned("worker-3") == 1
+    assert fresh.exists() and not stale.exists()
+    assert len(list((queue.root / "pending").glob("*.json"))) == 1
+
+
+def test_now_falls_back_to_the_local_clock(queue, monkeypatch):
+    monkeypatch.setattr(time, "time", lambda: 1234.0)
+    (queue.root / "tmp").rmdir()
+    assert queue.now() == 1234.0
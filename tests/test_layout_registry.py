@@ -0,0 +1,39 @@
+import pytest
+from core.layouts import LayoutRegistry
+
+
+def layout_class(layout_name):
+    return type(f"Layout{layout_name.replace('-', '')}", (), {"layout_name": layout_name})
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    classes = [layout_class(name) for name in ("COV-01", "CIV-01", "ELE-01", "ICI-01")]
+    monkeypatch.setattr(LayoutRegistry, "_registry", classes)
+    return classes
+
+
+def test_select_all_template_layouts(registry):
+    selected = LayoutRegistry.select(["CIV-01", "COV-01", "ICI-01", "OTHER"])
+    # Registration order, layouts missing from the template are skipped
+    assert [cls.layout_name for cls in selected] == ["COV-01", "CIV-01", "ICI-01"]
+
+
+def test_select_requested_layouts(registry):
+    selected = LayoutRegistry.select(["COV-01", "CIV-01", "ELE-01"], ["ELE-01", "COV-01"])
+    assert [cls.layout_name for cls in selected] == ["COV-01", "ELE-01"]
+
+
+def test_select_unregistered_layout(registry):
+    with pytest.raises(ValueError, match="No registered layout class for: OTHER"):
+        LayoutRegistry.select(["COV-01", "OTHER"], ["OTHER"])
+
+
+def test_select_layout_missing_from_template(registry):
+    with pytest.raises(ValueError, match="not found in the template: ICI-01"):
+        LayoutRegistry.select(["COV-01"], ["ICI-01"])
+
+
+def test_select_without_registered_template_layouts(registry):
+    with pytest.raises(ValueError, match="No registered layout found"):
+        LayoutRegistry.select(["OTHER"])
@@ -0,0 +1,167 @@
+import gzip
+import json
+import sqlite3
+import pytest
+from PIL import Image
+from pyproj import Transformer
+from core.map_renderer import _visible_layers, evaluate, parse_color, render_local_map
+from utils.map_sources import MapFeature, lonlat_to_tile
+from tests.test_map_sources import feature, geometry, layer
+
+
+def road(**properties):
+    return MapFeature("LineString", properties, [])
+
+
+class TestMatch:
+    expression = ["match", ["get", "class"], "primary", 3, ["secondary", "tertiary"], 2, 1]
+
+    @pytest.mark.parametrize("road_class, width", [("primary", 3), ("tertiary", 2), ("path", 1), (None, 1)])
+    def test_labels_and_fallback(self, road_class, width):
+        assert evaluate(self.expression, 14, road(**{"class": road_class})) == width
+
+    def test_output_is_evaluated(self):
+        expression = ["match", ["get", "class"], "primary", ["get", "width"], 0]
+        assert evaluate(expression, 14, road(**{"class": "primary", "width": 12})) == 12
+
+
+class TestCase:
+    expression = ["case", ["==", ["get", "bridge"], True], "bridge", [">", ["get", "lanes"], 2], "wide", "normal"]
+
+    @pytest.mark.parametrize("properties, expected", [
+        ({"bridge": True, "lanes": 4}, "bridge"),
+        ({"lanes": 4}, "wide"),
+        ({"lanes": 1}, "normal"),
+        ({}, "normal"),
+    ])
+    def test_first_true_branch(self, properties, expected):
+        assert evaluate(self.expression, 14, road(**properties)) == expected
+
+    def test_ordering_with_strings_and_numbers_is_false(self):
+        assert evaluate(["<", ["get", "name"], 3], 14, road(name="Main")) is False
+
+
+class TestInterpolate:
+    def test_linear_and_clamped(self):
+        expression = ["interpolate", ["linear"], ["zoom"], 10, 1, 14, 5]
+        assert evaluate(expression, 8) == 1
+        assert evaluate(expression, 12) == pytest.approx(3)
+        assert evaluate(expression, 16) == 5
+
+    def test_exponential(self):
+        expression = ["interpolate", ["exponential", 2], ["zoom"], 10, 0, 12, 3]
+        # (2^1 - 1) / (2^2 - 1) of the way
+        assert evaluate(expression, 11) == pytest.approx(1)
+
+    def test_cubic_bezier_ends(self):
+        expression = ["interpolate", ["cubic-bezier", 0.42, 0, 0.58, 1], ["zoom"], 0, 0, 10, 10]
+        assert evaluate(expression, 5) == pytest.approx(5, abs=1e-6)
+        assert evaluate(expression, 2) < 2
+
+    def test_colors(self):
+        expression = ["interpolate", ["linear"], ["zoom"], 0, "rgba(0, 0, 0, 0)", 10, "rgba(200, 100, 50, 1)"]
+        assert evaluate(expression, 5) == pytest.approx((100, 50, 25, 0.5))
+
+    def test_feature_property_input(self):
+        expression = ["interpolate", ["linear"], ["get", "rank"], 0, 10, 10, 20]
+        assert evaluate(expression, 0, road(rank=5)) == 15
+
+    def test_unsupported_type(self):
+        with pytest.raises(ValueError, match="Unsupported interpolation"):
+            evaluate(["interpolate", ["smooth"], ["zoom"], 0, 0, 10, 10], 5)
+
+
+def test_step():
+    expression = ["step", ["zoom"], "small", 12, "medium", 15, "large"]
+    assert [evaluate(expression, zoom) for zoom in (11.9, 12, 14.5, 15, 18)] == \
+           ["small", "medium", "medium", "large", "large"]
+
+
+@pytest.mark.parametrize("zoom, road_class, expected", [
+    (11, "primary", False),
+    (13, "service", False),
+    (13, "primary", True),
+    (16, "trunk", True),
+])
+def test_zoom_filter(zoom, road_class, expected):
+    expression = ["all", [">=", ["zoom"], 12], ["match", ["get", "class"], ["primary", "trunk"], True, False]]
+    assert evaluate(expression, zoom, road(**{"class": road_class})) is expected
+
+
+def test_geometry_type_and_has_filters():
+    assert evaluate(["==", ["geometry-type"], "LineString"], 14, road()) is True
+    assert evaluate(["!", ["has", "name"]], 14, road(name="Main")) is False
+    assert evaluate(["any", ["has", "ref"], ["has", "name"]], 14, road(name="Main")) is True
+
+
+def test_string_and_number_helpers():
+    feature = road(name="Main", ref=7.0)
+    assert evaluate(["concat", ["get", "name"], " ", ["get", "ref"]], 14, feature) == "Main 7"
+    assert evaluate(["coalesce", ["get", "name_en"], ["get", "name"]], 14, feature) == "Main"
+    assert evaluate(["to-number", ["get", "name"], ["get", "ref"]], 14, feature) == 7.0
+    assert evaluate(["-", ["*", 2, ["zoom"]], 1], 3) == 5
+
+
+def test_unsupported_expression():
+    with pytest.raises(ValueError, match="Unsupported style expression 'distance'"):
+        evaluate(["distance", ["literal", [0, 0]]], 14)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("#ff0000", (255, 0, 0, 1.0)),
+    ("rgba(10, 20, 30, 0.25)", (10, 20, 30, 0.25)),
+    ("hsl(120, 100%, 50%)", (0, 255, 0, 1.0)),
+    ("hsla(0, 0%, 100%, 0.5)", (255, 255, 255, 0.5)),
+    ("white", (255, 255, 255, 1.0)),
+])
+def test_parse_color(value, expected):
+    assert parse_color(value) == pytest.approx(expected)
+
+
+def test_visible_layers_zoom_range_and_visibility():
+    style = {"layers": [
+        {"id": "background", "type": "background"},
+        {"id": "roads-low", "type": "line", "maxzoom": 12},
+        {"id": "roads-high", "type": "line", "minzoom": 12},
+        {"id": "hidden", "type": "fill", "layout": {"visibility": "none"}},
+        {"id": "pattern", "type": "fill", "paint": {"fill-pattern": "dots"}},
+        {"id": "icons", "type": "symbol", "layout": {"icon-image": "shop"}},
+        {"id": "labels", "type": "symbol", "layout": {"text-field": ["get", "name"]}},
+        {"id": "hillshade", "type": "hillshade"},
+    ]}
+    assert [layer["id"] for layer in _visible_layers(style, 11.5)] == ["background", "roads-low", "labels"]
+    assert [layer["id"] for layer in _visible_layers(style, 12)] == ["background", "roads-high", "labels"]
+
+
+def tile_center(zoom, x, y):
+    half_world = 20037508.342789244
+    size = 2 * half_world / (1 << zoom)
+    return -half_world + (x + 0.5) * size, half_world - (y + 0.5) * size
+
+
+def test_render_local_map(tmp_path):
+    # One tile with water over the whole tile, drawn only from zoom 10
+    zoom, x, y = 14, *lonlat_to_tile(-80.0, 43.0, 14)
+    mbtiles = tmp_path / "area.mbtiles"
+    with sqlite3.connect(mbtiles) as conn:
+        conn.execute("CREATE TABLE metadata (name TEXT, value TEXT)")
+        conn.execute("CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)")
+        conn.executemany("INSERT INTO metadata VALUES (?, ?)", [("minzoom", "14"), ("maxzoom", "14")])
+        water = feature(3, geometry(([(-64, -64), (-64, 4160), (4160, 4160), (4160, -64)], True)))
+        conn.execute("INSERT INTO tiles VALUES (?, ?, ?, ?)",
+                     (zoom, x, (1 << zoom) - 1 - y, gzip.compress(layer("water", [water]))))
+    style = tmp_path / "style.json"
+    style.write_text(json.dumps({"layers": [
+        {"id": "background", "type": "background", "paint": {"background-color": "#ffffff"}},
+        {"id": "water", "type": "fill", "source-layer": "water", "minzoom": 10,
+         "filter": ["==", ["geometry-type"], "Polygon"], "paint": {"fill-color": "#0000ff"}},
+    ]}))
+
+    # Tile center, the tile is about 1.8 km wide at this latitude
+    center_x, center_y = Transformer.from_crs(4326, 32617, always_xy=True).transform(
+        *Transformer.from_crs(3857, 4326, always_xy=True).transform(*tile_center(zoom, x, y)))
+    output = tmp_path / "map.png"
+    rendered_zoom = render_local_map((center_x - 100, center_y - 100, center_x + 100, center_y + 100), 40, 40,
+                                     output, mbtiles, map_style=style, utm_epsg=32617)
+    assert rendered_zoom > 10
+    assert Image.open(output).getpixel((20, 20)) == (0, 0, 255)
@@ -0,0 +1,221 @@
+import gzip
+import math
+import sqlite3
+import struct
+import zlib
+import numpy as np
+import pytest
+from utils.map_sources import (MBTilesSource, _decompress, _zigzag, decode_mvt, lonlat_to_tile,
+                               parse_gpkg_geometry)
+
+HALF_WORLD = math.pi * 6378137.0
+
+
+# -----  Protobuf / MVT encoding  -----
+
+def varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def field(number, value):
+    """
+    Encode a protobuf field: int -> varint, bytes/str -> length delimited.
+    """
+    if isinstance(value, int):
+        return varint(number << 3) + varint(value)
+    if isinstance(value, str):
+        value = value.encode()
+    return varint(number << 3 | 2) + varint(len(value)) + value
+
+
+def packed(number, values):
+    return field(number, b"".join(varint(value) for value in values))
+
+
+def zigzag_encode(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def command(command_id, count):
+    return command_id | count << 3
+
+
+def geometry(*parts):
+    """
+    Encode parts as MVT commands: (points, closed) with absolute tile coordinates.
+    """
+    commands, x, y = [], 0, 0
+    for points, closed in parts:
+        for i, (px, py) in enumerate(points):
+            if i == 0:
+                commands.append(command(1, 1))
+            elif i == 1:
+                commands.append(command(2, len(points) - 1))
+            commands += [zigzag_encode(px - x), zigzag_encode(py - y)]
+            x, y = px, py
+        if closed:
+            commands.append(command(7, 1))
+    return commands
+
+
+def feature(geom_type, commands, tags=()):
+    return packed(2, tags) + field(3, geom_type) + packed(4, commands)
+
+
+def layer(name, features, keys=(), values=(), extent=4096):
+    data = field(15, 2) + field(1, name)
+    data += b"".join(field(2, f) for f in features)
+    data += b"".join(field(3, key) for key in keys)
+    data += b"".join(field(4, value) for value in values)
+    return field(3, data + field(5, extent))
+
+
+def string_value(value):
+    return field(1, value)
+
+
+def double_value(value):
+    return varint(3 << 3 | 1) + struct.pack("<d", value)
+
+
+def float_value(value):
+    return varint(2 << 3 | 5) + struct.pack("<f", value)
+
+
+def tile_to_mercator(x, y, extent=4096, zoom=0, tile_x=0, tile_y=0):
+    size = 2 * HALF_WORLD / (1 << zoom)
+    return -HALF_WORLD + (tile_x + x / extent) * size, HALF_WORLD - (tile_y + y / extent) * size
+
+
+# -----  MVT decoding  -----
+
+@pytest.mark.parametrize("value", [0, 1, -1, 2, -2, 4095, -4096, 2 ** 31 - 1, -2 ** 31])
+def test_zigzag_round_trip(value):
+    assert _zigzag(zigzag_encode(value)) == value
+
+
+def test_decode_line_with_properties():
+    tags = [0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 5, 5]
+    values = [string_value("primary"), field(4, 7), field(6, zigzag_encode(-3)), double_value(2.5),
+              field(7, 1), float_value(0.5)]
+    line = feature(2, geometry(([(0, 0), (2048, 2048), (4096, 1024)], False)), tags)
+    data = layer("road", [line], keys=["class", "lanes", "offset", "width", "oneway", "ratio"], values=values)
+
+    [road] = decode_mvt(data, 0, 0, 0)["road"]
+    assert road.geom_type == "LineString"
+    assert road.properties == {"class": "primary", "lanes": 7, "offset": -3, "width": 2.5,
+                               "oneway": True, "ratio": 0.5}
+    np.testing.assert_allclose(road.parts[0], [tile_to_mercator(0, 0), (0, 0), tile_to_mercator(4096, 1024)])
+
+
+def test_decode_polygon_with_hole_and_multipolygon():
+    outer = [(0, 0), (100, 0), (100, 100), (0, 100)]
+    # Holes wind the other way (negative area in tile coordinates)
+    hole = [(20, 20), (20, 80), (80, 80), (80, 20)]
+    second = [(200, 200), (300, 200), (300, 300)]
+    data = layer("water", [feature(3, geometry((outer, True), (hole, True), (second, True)))])
+
+    [water] = decode_mvt(data, 0, 0, 0)["water"]
+    assert water.geom_type == "Polygon"
+    assert [len(polygon) for polygon in water.parts] == [2, 1]
+    np.testing.assert_allclose(water.parts[0][1], [tile_to_mercator(x, y) for x, y in hole])
+    assert len(water.arrays()) == 3
+
+
+def test_decode_multipoint_and_tile_offset():
+    commands = [command(1, 2), zigzag_encode(10), zigzag_encode(20), zigzag_encode(5), zigzag_encode(-5)]
+    data = layer("poi", [feature(1, commands)], extent=512)
+
+    [poi] = decode_mvt(data, 3, 5, 2)["poi"]
+    assert poi.geom_type == "Point"
+    np.testing.assert_allclose(poi.parts[0], [tile_to_mercator(10, 20, 512, 3, 5, 2),
+                                              tile_to_mercator(15, 15, 512, 3, 5, 2)])
+
+
+def test_decode_only_requested_layers():
+    line = feature(2, geometry(([(0, 0), (10, 10)], False)))
+    data = layer("road", [line]) + layer("building", [line])
+    assert list(decode_mvt(data, 0, 0, 0, layers={"road"})) == ["road"]
+    assert sorted(decode_mvt(data, 0, 0, 0)) == ["building", "road"]
+
+
+def test_decode_skips_degenerate_geometries():
+    data = layer("road", [feature(2, geometry(([(5, 5)], False))), feature(3, geometry(([(0, 0), (1, 1)], True)))])
+    assert decode_mvt(data, 0, 0, 0)["road"] == []
+
+
+@pytest.mark.parametrize("compress", [gzip.compress, zlib.compress, lambda data: data])
+def test_decompress(compress):
+    data = layer("road", [])
+    assert _decompress(compress(data)) == data
+
+
+def test_mbtiles_rows_are_tms(tmp_path):
+    path = tmp_path / "area.mbtiles"
+    zoom, x, y = 14, *lonlat_to_tile(-80.0, 43.0, 14)
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE metadata (name TEXT, value TEXT)")
+        conn.execute("CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)")
+        conn.executemany("INSERT INTO metadata VALUES (?, ?)", [("minzoom", "0"), ("maxzoom", "14"), ("format", "pbf")])
+        data = layer("road", [feature(2, geometry(([(0, 0), (4096, 4096)], False)))])
+        conn.execute("INSERT INTO tiles VALUES (?, ?, ?, ?)", (zoom, x, (1 << zoom) - 1 - y, gzip.compress(data)))
+
+    features = MBTilesSource(path).read_features((-80.0001, 42.9999, -79.9999, 43.0001), 16.5, {"road"})
+    [road] = features["road"]
+    np.testing.assert_allclose(road.parts[0][0], tile_to_mercator(0, 0, zoom=zoom, tile_x=x, tile_y=y))
+
+
+# -----  GeoPackage geometries  -----
+
+def gpkg_blob(wkb, envelope=(), empty=False, srs_id=3857):
+    envelope_codes = {0: 0, 4: 1, 6: 2, 8: 4}
+    flags = 0x01 | envelope_codes[len(envelope)] << 1 | (0x10 if empty else 0)
+    return b"GP" + bytes([0, flags]) + struct.pack("<i", srs_id) + struct.pack(f"<{len(envelope)}d", *envelope) + wkb
+
+
+def wkb_points(points, endian="<"):
+    return struct.pack(f"{endian}I", len(points)) + b"".join(struct.pack(f"{endian}{len(p)}d", *p) for p in points)
+
+
+def wkb(geom_type, body, endian="<"):
+    return bytes([1 if endian == "<" else 0]) + struct.pack(f"{endian}I", geom_type) + body
+
+
+def test_gpkg_polygon_with_envelope():
+    rings = [[(0, 0), (10, 0), (10, 10), (0, 0)], [(2, 2), (3, 2), (3, 3), (2, 2)]]
+    body = struct.pack("<I", 2) + b"".join(wkb_points(ring) for ring in rings)
+    geom_type, parts = parse_gpkg_geometry(gpkg_blob(wkb(3, body), envelope=(0, 10, 0, 10)))
+    assert geom_type == "Polygon"
+    assert len(parts) == 1 and len(parts[0]) == 2
+    np.testing.assert_array_equal(parts[0][1], rings[1])
+
+
+def test_gpkg_big_endian_multilinestring_with_xyz_envelope():
+    lines = [[(0, 0), (1, 1)], [(5, 5), (6, 7), (8, 9)]]
+    body = struct.pack(">I", 2) + b"".join(wkb(2, wkb_points(line, ">"), ">") for line in lines)
+    geom_type, parts = parse_gpkg_geometry(gpkg_blob(wkb(5, body, ">"), envelope=(0, 8, 0, 9, 0, 0)))
+    assert geom_type == "LineString"
+    assert [part.tolist() for part in parts] == [[list(p) for p in line] for line in lines]
+
+
+@pytest.mark.parametrize("geom_type", [1001, 0x80000001])
+def test_gpkg_point_z_is_dropped(geom_type):
+    geom_type_name, parts = parse_gpkg_geometry(gpkg_blob(wkb(geom_type, struct.pack("<3d", 1, 2, 3))))
+    assert geom_type_name == "Point"
+    np.testing.assert_array_equal(parts[0], [[1, 2]])
+
+
+def test_gpkg_empty_and_invalid_blobs():
+    assert parse_gpkg_geometry(gpkg_blob(b"", empty=True)) is None
+    with pytest.raises(ValueError, match="Invalid GeoPackage"):
+        parse_gpkg_geometry(b"XX" + bytes(10))
+    with pytest.raises(ValueError, match="Unsupported WKB"):
+        parse_gpkg_geometry(gpkg_blob(wkb(17, b"")))
@@ -0,0 +1,89 @@
+import gc
+import sys
+import time
+import weakref
+from types import SimpleNamespace
+import pytest
+from utils import memory
+from utils.memory import MemorySampler, peak_rss_bytes, process_rss_mb, release_memory, rss_bytes
+
+_MB = 1024 * 1024
+
+needs_proc = pytest.mark.skipif(rss_bytes() is None, reason="RSS is read from /proc")
+
+
+@pytest.fixture
+def no_proc(monkeypatch):
+    def missing(path, *args, **kwargs):
+        raise FileNotFoundError(path)
+    monkeypatch.setattr(memory, "open", missing, raising=False)
+
+
+@needs_proc
+def test_rss_follows_allocations():
+    before = rss_bytes()
+    block = bytearray(64 * _MB)
+    block[::4096] = b"x" * len(block[::4096])
+    assert rss_bytes() - before > 48 * _MB
+    assert process_rss_mb() == pytest.approx(rss_bytes() / _MB, rel=0.05)
+
+
+def test_rss_of_missing_process():
+    assert rss_bytes(2 ** 31 - 1) is None
+
+
+def test_rss_without_proc_is_unknown(no_proc):
+    # Not replaced by the peak RSS, a peak would never go down after a job
+    assert rss_bytes() is None
+    assert process_rss_mb() is None
+
+
+@pytest.mark.parametrize("platform, expected", [("darwin", 2048), ("linux", 2048 * 1024), ("freebsd14", 2048 * 1024)])
+def test_peak_rss_units(monkeypatch, platform, expected):
+    resource = pytest.importorskip("resource")
+    monkeypatch.setattr(resource, "getrusage", lambda who: SimpleNamespace(ru_maxrss=2048))
+    monkeypatch.setattr(sys, "platform", platform)
+    assert peak_rss_bytes() == expected
+
+
+@needs_proc
+def test_sampler_keeps_the_peak():
+    with MemorySampler(interval=0.01) as sampler:
+        steady = process_rss_mb()
+        block = bytearray(64 * _MB)
+        block[::4096] = b"x" * len(block[::4096])
+        time.sleep(0.1)
+        del block
+    assert sampler.peak_mb - steady > 48
+    assert not sampler.is_alive()
+
+
+def test_sampler_without_proc_reports_the_process_peak(no_proc, monkeypatch):
+    monkeypatch.setattr(memory, "peak_rss_bytes", lambda: 300 * _MB)
+    with MemorySampler(interval=0.01) as sampler:
+        time.sleep(0.05)
+    assert sampler.peak_mb == 300
+
+
+def test_sampler_with_unknown_rss(no_proc, monkeypatch):
+    monkeypatch.setattr(memory, "peak_rss_bytes", lambda: None)
+    with MemorySampler(interval=0.01) as sampler:
+        pass
+    assert sampler.peak_mb is None
+
+
+def test_release_memory_collects_reference_cycles():
+    class Node:
+        pass
+
+    gc.disable()
+    try:
+        node = Node()
+        node.self = node
+        ref = weakref.ref(node)
+        del node
+        assert ref() is not None
+        release_memory()
+        assert ref() is None
+    finally:
+        gc.enable()
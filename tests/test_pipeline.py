@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+import weakref
+import pytest
+from core.pipeline import Stage, StagePipeline, shared_process_pool
+
+
+class Document:
+    """
+    Stands for a large intermediate value (a loaded drawing).
+    """
+
+
+def process_pid(value):
+    return value, os.getpid()
+
+
+def process_fail(value):
+    raise RuntimeError(f"bad value {value}")
+
+
+def test_stages_run_after_their_inputs():
+    events = []
+    lock = threading.Lock()
+
+    def step(name, result):
+        def run(**inputs):
+            with lock:
+                events.append(("start", name))
+            time.sleep(0.02)
+            with lock:
+                events.append(("end", name))
+            return result
+        return run
+
+    pipeline = StagePipeline([
+        Stage("total", lambda a, b: a + b, inputs=["a", "b"], outputs=["total"]),
+        Stage("a", step("a", 1), outputs=["a"]),
+        Stage("b", step("b", 2), inputs=["seed"], outputs=["b"]),
+    ])
+    context = pipeline.run(initial={"seed": 0})
+    assert context == {"seed": 0, "a": 1, "b": 2, "total": 3}
+    # Independent stages overlap
+    assert events.index(("start", "b")) < events.index(("end", "a"))
+    assert pipeline.timings["total"][0] >= max(pipeline.timings["a"][1], pipeline.timings["b"][1])
+    assert pipeline.critical_path()[-1] == "total"
+
+
+def test_several_outputs_are_mapped_in_order():
+    pipeline = StagePipeline([
+        Stage("split", lambda: (1, 2), outputs=["first", "second"]),
+        Stage("check", lambda first, second: (first, second), inputs=["first", "second"], outputs=["pair"]),
+    ])
+    assert pipeline.run()["pair"] == (1, 2)
+
+
+def test_keep_releases_values_after_their_last_use():
+    refs = {}
+
+    def load():
+        document = Document()
+        refs["doc"] = weakref.ref(document)
+        return document
+
+    pipeline = StagePipeline([
+        Stage("load", load, outputs=["doc"]),
+        Stage("use", lambda doc: "saved", inputs=["doc"], outputs=["path"]),
+        Stage("after", lambda path: refs["doc"]() is None, inputs=["path"], outputs=["released"]),
+    ], max_workers=1)
+    assert pipeline.run(keep=["released"]) == {"released": True}
+
+
+def test_without_keep_all_values_are_returned():
+    pipeline = StagePipeline([Stage("load", Document, outputs=["doc"])])
+    assert isinstance(pipeline.run()["doc"], Document)
+
+
+def test_failed_stage_stops_the_run():
+    ran = []
+    pipeline = StagePipeline([
+        Stage("fail", lambda: 1 / 0, outputs=["value"]),
+        Stage("next", lambda value: ran.append(value), inputs=["value"], outputs=["done"]),
+    ])
+    with pytest.raises(ZeroDivisionError):
+        pipeline.run()
+    assert ran == []
+    assert "fail" in pipeline.timings
+
+
+def test_process_stages_share_one_pool():
+    pipeline = StagePipeline([
+        Stage("pid", process_pid, inputs=["value"], outputs=["result"], executor="process"),
+    ], max_workers=1)
+    value, pid = pipeline.run(initial={"value": 3})["result"]
+    assert value == 3 and pid != os.getpid()
+    pool = shared_process_pool(1)
+    assert pipeline.run(initial={"value": 4})["result"] == (4, pid)
+    assert shared_process_pool(1) is pool
+
+
+def test_failed_process_stage_raises_its_error():
+    pipeline = StagePipeline([
+        Stage("fail", process_fail, inputs=["value"], outputs=["result"], executor="process"),
+    ], max_workers=1)
+    with pytest.raises(RuntimeError, match="bad value 5"):
+        pipeline.run(initial={"value": 5})
+
+
+@pytest.mark.parametrize("stages, message", [
+    ([Stage("a", int, inputs=["missing"], outputs=["a"])], "not produced"),
+    ([Stage("a", int, inputs=["b"], outputs=["a"]), Stage("b", int, inputs=["a"], outputs=["b"])], "cycle"),
+    ([Stage("a", int, outputs=["x"]), Stage("b", int, outputs=["x"])], "produced by both"),
+])
+def test_invalid_graphs_are_rejected(stages, message):
+    with pytest.raises(ValueError, match=message):
+        StagePipeline(stages).run()
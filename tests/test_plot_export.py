@@ -0,0 +1,148 @@
+import ezdxf
+import pytest
+from PIL import Image
+from core.plot_export import CACHE_FILE, export_layouts, layout_hash, modelspace_hash, tables_hash
+
+
+def make_drawing(path, shift_handles=False):
+    """
+    Drawing with two paperspace layouts inserting a title block with a nested block, and an image.
+    shift_handles creates throwaway entities first, so every handle differs.
+    """
+    doc = ezdxf.new("R2010", setup=True)
+    if shift_handles:
+        scratch = doc.blocks.new("SCRATCH")
+        for _ in range(25):
+            scratch.add_point((0, 0))
+        doc.blocks.delete_block("SCRATCH", safe=False)
+    doc.blocks.new("LOGO").add_circle((0, 0), 5)
+    title = doc.blocks.new("TITLE")
+    title.add_line((0, 0), (100, 0))
+    title.add_blockref("LOGO", (90, 5))
+
+    doc.layers.add("Roads", color=1)
+    doc.modelspace().add_lwpolyline([(0, 0), (100, 0), (100, 50)], dxfattribs={"layer": "Roads"})
+    Image.new("RGB", (64, 48), "white").save(path.parent / "map.png")
+    image_def = doc.add_image_def("map.png", (640, 480))
+    doc.modelspace().add_image(image_def, (0, 0), (64, 48))
+
+    for name in ("CIV-01", "CIV-02"):
+        layout = doc.layouts.new(name)
+        layout.add_viewport((150, 100), (200, 150), (50, 25), 60)
+        layout.add_blockref("TITLE", (0, 0))
+    doc.layouts.delete("Layout1")
+    doc.saveas(path)
+    return ezdxf.readfile(path)
+
+
+def hashes(doc):
+    doc_hash = modelspace_hash(doc) + tables_hash(doc)
+    return {name: layout_hash(doc, name, doc_hash) for name in ("CIV-01", "CIV-02")}
+
+
+@pytest.fixture
+def drawing(tmp_path):
+    path = tmp_path / "drawing.dxf"
+    return path, make_drawing(path)
+
+
+def test_hash_is_stable_across_loads_and_handles(tmp_path, drawing):
+    path, doc = drawing
+    (tmp_path / "shifted").mkdir()
+    shifted = make_drawing(tmp_path / "shifted" / "drawing.dxf", shift_handles=True)
+    assert doc.modelspace()[0].dxf.handle != shifted.modelspace()[0].dxf.handle
+    assert hashes(doc) == hashes(ezdxf.readfile(path)) == hashes(shifted)
+
+
+def test_hash_changes_with_layout_content(drawing):
+    path, doc = drawing
+    reference = hashes(doc)
+    doc.layout("CIV-02").query("VIEWPORT").first.dxf.view_height = 30
+    changed = hashes(doc)
+    assert changed["CIV-01"] == reference["CIV-01"]
+    assert changed["CIV-02"] != reference["CIV-02"]
+
+
+def test_hash_changes_with_plot_settings(drawing):
+    path, doc = drawing
+    reference = hashes(doc)
+    doc.layout("CIV-01").dxf_layout.dxf.plot_rotation = 1
+    assert hashes(doc)["CIV-01"] != reference["CIV-01"]
+
+
+def test_hash_changes_with_tables(drawing):
+    path, doc = drawing
+    reference = hashes(doc)
+    doc.layers.get("Roads").color = 3
+    layer_changed = hashes(doc)
+    doc.styles.get("Standard").dxf.font = "arial.ttf"
+    style_changed = hashes(doc)
+    assert len({reference["CIV-01"], layer_changed["CIV-01"], style_changed["CIV-01"]}) == 3
+
+
+def test_hash_changes_with_viewport_frozen_layers(drawing):
+    path, doc = drawing
+    reference = hashes(doc)
+    doc.layout("CIV-02").query("VIEWPORT").first.frozen_layers = ["Roads"]
+    changed = hashes(doc)
+    assert changed["CIV-01"] == reference["CIV-01"]
+    assert changed["CIV-02"] != reference["CIV-02"]
+
+
+def test_hash_changes_with_nested_block(drawing):
+    path, doc = drawing
+    reference = hashes(doc)
+    doc.blocks.get("LOGO").add_line((0, 0), (1, 1))
+    changed = hashes(doc)
+    assert all(changed[name] != reference[name] for name in changed)
+
+
+def test_hash_changes_with_modelspace_and_images(tmp_path, drawing):
+    path, doc = drawing
+    reference = modelspace_hash(doc)
+    Image.new("RGB", (64, 48), "black").save(tmp_path / "map.png")
+    image_changed = modelspace_hash(doc)
+    doc.modelspace().add_circle((10, 10), 1)
+    assert len({reference, image_changed, modelspace_hash(doc)}) == 3
+
+
+def test_export_renders_only_changed_layouts(tmp_path, drawing):
+    path, doc = drawing
+    output = tmp_path / "output"
+    first = export_layouts(path, output, formats=("pdf",), max_workers=1)
+    assert first["rendered"] == ["CIV-01", "CIV-02"]
+    assert (output / "sheets" / CACHE_FILE).exists()
+    assert (output / "drawing.pdf").exists()
+
+    second = export_layouts(path, output, formats=("pdf",), max_workers=1)
+    assert second["rendered"] == []
+    assert second["cached"] == ["CIV-01", "CIV-02"]
+
+    doc.layout("CIV-02").add_line((0, 0), (10, 10))
+    doc.saveas(path)
+    (output / "sheets" / "CIV-01.pdf").unlink()
+    third = export_layouts(path, output, formats=("pdf",), max_workers=1)
+    assert third["rendered"] == ["CIV-01", "CIV-02"]
+
+    # A new format renders again, the cached hash alone is not enough
+    fourth = export_layouts(path, output, formats=("pdf", "png"), max_workers=1)
+    assert fourth["rendered"] == ["CIV-01", "CIV-02"]
+    assert (output / "sheets" / "CIV-01.png").exists()
+
+
+def test_export_renders_again_after_layer_or_dpi_change(tmp_path, drawing):
+    path, doc = drawing
+    output = tmp_path / "output"
+    export_layouts(path, output, formats=("png",), dpi=50, max_workers=1)
+    assert export_layouts(path, output, formats=("png",), dpi=50, max_workers=1)["rendered"] == []
+    assert export_layouts(path, output, formats=("png",), dpi=60, max_workers=1)["rendered"] == ["CIV-01", "CIV-02"]
+
+    doc.layers.get("Roads").color = 3
+    doc.saveas(path)
+    assert export_layouts(path, output, formats=("png",), dpi=60, max_workers=1)["rendered"] == ["CIV-01", "CIV-02"]
+
+
+def test_export_rejects_unknown_format(drawing, tmp_path):
+    path, _ = drawing
+    with pytest.raises(ValueError, match="svg"):
+        export_layouts(path, tmp_path / "output", formats=("svg",))
@@ -0,0 +1,96 @@
+import ezdxf
+import pytest
+from core.sheet_split import split_sheets
+
+
+def make_drawing(path):
+    """
+    Drawing with two sheets looking at different parts of modelspace:
+    - CIV-01 shows the tree (a block) and the image around (50, 50)
+    - CIV-02 shows (1000, 1000) and inserts a title block with a nested logo
+    A line crosses both windows, a circle at (500, 500) is in no window and an XLINE has no extents.
+    """
+    doc = ezdxf.new("R2010", setup=True)
+    doc.blocks.new("TREE").add_circle((0, 0), 2)
+    doc.blocks.new("LOGO").add_circle((0, 0), 5)
+    doc.blocks.new("TITLE").add_blockref("LOGO", (90, 5))
+
+    msp = doc.modelspace()
+    msp.add_blockref("TREE", (50, 50))
+    msp.add_circle((1000, 1000), 1)
+    msp.add_circle((500, 500), 1)
+    msp.add_line((50, 50), (1000, 1000))
+    msp.add_xline((0, 0), (1, 0))
+    image_def = doc.add_image_def("xref/map.png", (640, 480))
+    msp.add_image(image_def, (40, 40), (20, 15))
+
+    first = doc.layouts.new("CIV-01")
+    first.add_viewport((150, 100), (200, 100), (50, 50), 100)
+    second = doc.layouts.new("CIV-02")
+    second.add_viewport((150, 100), (200, 100), (1000, 1000), 100)
+    second.add_blockref("TITLE", (0, 0))
+    doc.layouts.delete("Layout1")
+    doc.saveas(path)
+
+
+@pytest.fixture(scope="module")
+def sheets(tmp_path_factory):
+    output = tmp_path_factory.mktemp("output")
+    make_drawing(output / "drawing.dxf")
+    result = split_sheets(output / "drawing.dxf", output, max_workers=1)
+    return output, result, {name: ezdxf.readfile(path) for name, path in result["sheets"].items()}
+
+
+def modelspace_types(doc):
+    return sorted(entity.dxftype() for entity in doc.modelspace())
+
+
+def test_every_sheet_keeps_only_its_layout(sheets):
+    output, result, docs = sheets
+    assert list(result["sheets"]) == ["CIV-01", "CIV-02"]
+    for name, doc in docs.items():
+        assert doc.layout_names_in_taborder() == ["Model", name]
+        assert (output / "sheets" / f"{name}.dxf").exists()
+
+
+def test_sheets_keep_only_visible_modelspace(sheets):
+    _, _, docs = sheets
+    assert modelspace_types(docs["CIV-01"]) == ["IMAGE", "INSERT", "LINE", "XLINE"]
+    assert modelspace_types(docs["CIV-02"]) == ["CIRCLE", "LINE", "XLINE"]
+    assert docs["CIV-02"].modelspace().query("CIRCLE").first.dxf.center.isclose((1000, 1000))
+
+
+def test_sheets_keep_only_used_blocks(sheets):
+    _, _, docs = sheets
+    assert "TREE" in docs["CIV-01"].blocks
+    assert "TITLE" not in docs["CIV-01"].blocks and "LOGO" not in docs["CIV-01"].blocks
+    assert "TREE" not in docs["CIV-02"].blocks
+    # The nested block is kept with the block inserting it
+    assert "TITLE" in docs["CIV-02"].blocks and "LOGO" in docs["CIV-02"].blocks
+
+
+def test_sheets_are_valid(sheets):
+    _, _, docs = sheets
+    for doc in docs.values():
+        assert not doc.audit().has_errors
+
+
+def test_relative_image_paths_are_rebased(sheets):
+    _, _, docs = sheets
+    assert [image_def.dxf.filename for image_def in docs["CIV-01"].objects.query("IMAGEDEF")] == ["../xref/map.png"]
+
+
+def test_only_requested_layouts_are_written(tmp_path):
+    make_drawing(tmp_path / "drawing.dxf")
+    result = split_sheets(tmp_path / "drawing.dxf", tmp_path, layouts=["CIV-02"], max_workers=1)
+    assert list(result["sheets"]) == ["CIV-02"]
+    assert not (tmp_path / "sheets" / "CIV-01.dxf").exists()
+
+
+def test_drawing_without_paperspace_layouts(tmp_path):
+    # R12 drawings have no LAYOUT objects
+    doc = ezdxf.new("R12")
+    doc.modelspace().add_line((0, 0), (1, 1))
+    doc.saveas(tmp_path / "drawing.dxf")
+    result = split_sheets(tmp_path / "drawing.dxf", tmp_path)
+    assert result["sheets"] == {}
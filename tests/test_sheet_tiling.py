@@ -0,0 +1,106 @@
+import math
+import numpy as np
+import pytest
+from core.sheet_tiling import compute_tiles, tile_sheet_names
+
+WIDTH, HEIGHT = 178.0, 109.0
+
+
+def corridor(centerline, width=20.0):
+    """
+    Closed boundary of a corridor of width around a polyline (mitered corners).
+    """
+    line = np.asarray(centerline, dtype=float)
+    directions = np.diff(line, axis=0)
+    directions /= np.hypot(*directions.T)[:, None]
+    normals = np.stack([-directions[:, 1], directions[:, 0]], axis=1)
+    vertex_normals = np.vstack([normals[:1], normals[:-1] + normals[1:], normals[-1:]])
+    # Miter length keeps the corridor width at corners
+    vertex_normals /= np.einsum("ij,ij->i", vertex_normals,
+                                np.vstack([normals[:1], normals, ])[: len(line)])[:, None]
+    left = line + vertex_normals * width / 2
+    right = line - vertex_normals * width / 2
+    return np.vstack([left, right[::-1]])
+
+
+def boundary_samples(points, step=0.5):
+    """
+    Points every step along the closed boundary.
+    """
+    pts = np.asarray(points, dtype=float)
+    ends = np.roll(pts, -1, axis=0)
+    samples = []
+    for start, end in zip(pts, ends):
+        count = int(np.hypot(*(end - start)) / step) + 2
+        samples.append(start + (end - start) * np.linspace(0, 1, count)[:, None])
+    return np.vstack(samples)
+
+
+def uncovered(points, tiles, eps=1e-6):
+    """
+    Boundary points (sampled every 0.5 m) outside of every tile.
+    """
+    pts = boundary_samples(points)
+    covered = np.zeros(len(pts), dtype=bool)
+    for tile in tiles:
+        radians = math.radians(tile.angle)
+        along = np.array([math.cos(radians), math.sin(radians)])
+        across = np.array([-along[1], along[0]])
+        local = pts - np.array(tile.center)
+        covered |= (np.abs(local @ along) <= tile.width / 2 + eps) & (np.abs(local @ across) <= tile.height / 2 + eps)
+    return pts[~covered]
+
+
+ROUTES = {
+    "straight": [(0, 0), (1200, 300)],
+    "l_shape": [(0, 0), (1500, 0), (1500, 900)],
+    "zigzag": [(0, 0), (300, 200), (600, 0), (900, 200), (1200, 0)],
+}
+
+
+@pytest.mark.parametrize("name", ROUTES)
+@pytest.mark.parametrize("overlap", [0.0, 0.1])
+def test_tiles_cover_boundary(name, overlap):
+    boundary = corridor(ROUTES[name])
+    tiles = compute_tiles(boundary, WIDTH, HEIGHT, overlap=overlap)
+    assert len(uncovered(boundary, tiles)) == 0
+
+
+def test_tiles_cover_axis_aligned():
+    boundary = corridor(ROUTES["zigzag"])
+    tiles = compute_tiles(boundary, WIDTH, HEIGHT, align_to_route=False)
+    assert len(uncovered(boundary, tiles)) == 0
+    assert all(tile.angle in (0.0, 90.0) for tile in tiles)
+
+
+def test_straight_route_is_tiled_along_the_route():
+    tiles = compute_tiles(corridor(ROUTES["straight"]), WIDTH, HEIGHT)
+    route_angle = math.degrees(math.atan2(300, 1200))
+    assert all(tile.angle == pytest.approx(route_angle) for tile in tiles)
+    # One row of windows along a 1237 m route
+    assert len(tiles) == 8
+
+
+def test_l_route_gets_one_row_per_leg():
+    tiles = compute_tiles(corridor(ROUTES["l_shape"]), WIDTH, HEIGHT)
+    # 1510 m and 910 m legs, every leg needs at most one row of windows plus the corner
+    assert len(tiles) <= 20
+
+
+def test_small_boundary_gets_one_centered_tile():
+    boundary = [(0, 0), (10, 0), (10, 10), (0, 10)]
+    tiles = compute_tiles(boundary, WIDTH, HEIGHT)
+    assert len(tiles) == 1
+    assert tiles[0].center == pytest.approx((5.0, 5.0))
+
+
+def test_invalid_input():
+    with pytest.raises(ValueError):
+        compute_tiles([(0, 0), (1, 1)], WIDTH, HEIGHT, overlap=1.0)
+    with pytest.raises(ValueError):
+        compute_tiles([], WIDTH, HEIGHT)
+
+
+def test_tile_sheet_names():
+    assert tile_sheet_names("CIV-01", 3) == ["CIV-01", "CIV-02", "CIV-03"]
+    assert tile_sheet_names("COVER", 2) == ["COVER", "COVER-02"]
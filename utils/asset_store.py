@@ -0,0 +1,239 @@
+import hashlib
+import os
+import re
+import shutil
+import time
+import uuid
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+XREF_FOLDER_NAME = "xref"
+
+# Name of a stored object or of its link: <sha256><suffix>
+_OBJECT_NAME = re.compile(r"^[0-9a-f]{64}(\.\w+)?$")
+
+class AssetStore:
+    """
+    Content-addressed store for xref assets (images, converted drawings) shared by project outputs.
+
+    Every file is stored once as objects/<hash[:2]>/<hash><suffix> and hardlinked into the xref
+    folder of each output that references it, under the same name. Outputs reference assets by
+    the stable relative path xref/<hash><suffix>, so identical assets are never written twice and
+    concurrent runs never write to the same file. Links are plain copies when hardlinks are not
+    possible (other device), outputs stay self-contained either way.
+
+    Derived files (e.g. a DWG converted to DXF) are looked up by a key of their inputs in
+    derived/, as hardlinks to their object.
+
+    The hardlink count of an object is its reference count: gc() removes objects that are
+    linked from no output folder any more. Outputs regenerated in place drop the links their new
+    drawing does not reference (prune_xrefs()), so replaced assets can be collected.
+    """
+
+    def __init__(self, root):
+        """
+        :param root: store folder, should be on the same device as the output folders
+        """
+        self.root = Path(root)
+        for folder in ("objects", "derived", "tmp"):
+            (self.root / folder).mkdir(parents=True, exist_ok=True)
+
+    def temp_path(self, suffix=""):
+        """
+        Unique path in the store tmp folder to write a new asset to before put().
+        """
+        return self.root / "tmp" / f"{uuid.uuid4().hex}{suffix}"
+
+    @staticmethod
+    def file_hash(path):
+        """
+        SHA-256 of file content, read in chunks.
+        """
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def object_path(self, digest, suffix=""):
+        return self.root / "objects" / digest[:2] / f"{digest}{suffix.lower()}"
+
+    def put(self, path, move=False):
+        """
+        Store a file under its content hash. Storing the same content again is a no-op.
+
+        :param path: file to store
+        :param move: remove the source file after storing it
+        :return: path of the stored object
+        """
+        path = Path(path)
+        target = self.object_path(self.file_hash(path), path.suffix)
+        if target.exists():
+            # Refresh the object age so a running gc() does not remove it before it is linked
+            os.utime(target)
+            if move:
+                path.unlink()
+            return target
+
+        target.parent.mkdir(exist_ok=True)
+        tmp = self.temp_path(path.suffix)
+        if move:
+            shutil.move(str(path), tmp)
+        else:
+            # Copy, a hardlink would let edits of the source change the stored content
+            shutil.copyfile(path, tmp)
+        # Same content under the same name, a concurrent put of the same file is harmless
+        os.replace(tmp, target)
+        logger.debug(f"Stored asset {target.name} from {path.name}")
+        return target
+
+    def link(self, object_path, folder):
+        """
+        Link a stored object into a folder under its content-addressed name.
+
+        :param object_path: path returned by put()
+        :param folder: destination folder
+        :return: path of the link
+        """
+        folder = Path(folder)
+        folder.mkdir(parents=True, exist_ok=True)
+        target = folder / Path(object_path).name
+        if target.exists():
+            return target
+        return self.link_as(object_path, target)
+
+    @staticmethod
+    def link_as(object_path, target):
+        """
+        Atomically replace target with a link to a stored object.
+
+        :param object_path: path returned by put()
+        :param target: file path to create or replace
+        :return: target path
+        """
+        target = Path(target)
+        tmp = target.with_name(f".{uuid.uuid4().hex}.tmp")
+        _link_or_copy(object_path, tmp)
+        os.replace(tmp, target)
+        return target
+
+    def add_xref(self, path, drawing_folder, move=False):
+        """
+        Store an asset and link it into the xref folder of a drawing.
+
+        :param path: asset file
+        :param drawing_folder: folder of the DXF referencing the asset
+        :param move: remove the source file after storing it
+        :return: path of the asset relative to the drawing folder (posix separators)
+        """
+        linked = self.link(self.put(path, move=move), Path(drawing_folder) / XREF_FOLDER_NAME)
+        return f"{XREF_FOLDER_NAME}/{linked.name}"
+
+    @staticmethod
+    def prune_xrefs(drawing_folder, referenced):
+        """
+        Remove asset links from the xref folder of a drawing that the drawing does not reference
+        any more (e.g. the map of a previous generation into the same folder). Other files of the
+        xref folder are kept.
+
+        :param drawing_folder: folder of the DXF
+        :param referenced: asset paths referenced by the drawing, relative to drawing_folder (posix separators)
+        :return: number of removed links
+        """
+        referenced = {Path(path).name for path in referenced if Path(path).parent.as_posix() == XREF_FOLDER_NAME}
+        xref_folder = Path(drawing_folder) / XREF_FOLDER_NAME
+        if not xref_folder.is_dir():
+            return 0
+        removed = 0
+        for path in xref_folder.iterdir():
+            if _OBJECT_NAME.match(path.name) and path.name not in referenced:
+                path.unlink(missing_ok=True)
+                removed += 1
+        if removed:
+            logger.debug(f"Removed {removed} unreferenced asset links from {xref_folder}")
+        return removed
+
+    @staticmethod
+    def derived_key(*parts):
+        """
+        Key of a derived file from its inputs (source hashes, options...).
+        """
+        return hashlib.sha256("\x00".join(str(part) for part in parts).encode()).hexdigest()
+
+    def get_derived(self, key, suffix=""):
+        """
+        :return: stored object of a derived file, None if it was not stored yet
+        """
+        path = self.root / "derived" / f"{key}{suffix.lower()}"
+        return path if path.exists() else None
+
+    def put_derived(self, key, path, move=False):
+        """
+        Store a derived file and register it under key.
+
+        :return: path of the stored object
+        """
+        stored = self.put(path, move=move)
+        derived = self.root / "derived" / f"{key}{stored.suffix}"
+        if not derived.exists():
+            tmp = self.temp_path(stored.suffix)
+            _link_or_copy(stored, tmp)
+            os.replace(tmp, derived)
+        return stored
+
+    def gc(self, grace=3600, dry_run=False):
+        """
+        Remove objects no output links to any more, with their derived entries, and stale temp files.
+        Objects and temp files younger than grace are kept, they may belong to a running generation.
+
+        :param grace: min age in seconds of removed files
+        :param dry_run: only report what would be removed
+        :return: dict with removed object count and freed bytes
+        """
+        now = time.time()
+        derived_links = {}
+        derived_copies = {}
+        for path in (self.root / "derived").iterdir():
+            stat = path.stat()
+            if stat.st_nlink == 1:
+                # Copy of its object (file system without hardlinks), or left over from a removed object
+                stored = self.object_path(self.file_hash(path), path.suffix)
+                if stored.exists():
+                    derived_copies.setdefault(stored, []).append(path)
+                elif now - stat.st_mtime >= grace and not dry_run:
+                    path.unlink(missing_ok=True)
+                continue
+            derived_links.setdefault((stat.st_dev, stat.st_ino), []).append(path)
+
+        removed, freed = 0, 0
+        for path in (self.root / "objects").glob("*/*"):
+            stat = path.stat()
+            links = derived_links.get((stat.st_dev, stat.st_ino), [])
+            if stat.st_nlink - len(links) > 1 or now - stat.st_mtime < grace:
+                continue
+            removed += 1
+            freed += stat.st_size
+            if not dry_run:
+                for link in links + derived_copies.get(path, []):
+                    link.unlink(missing_ok=True)
+                path.unlink(missing_ok=True)
+
+        for path in (self.root / "tmp").iterdir():
+            if now - path.stat().st_mtime >= grace and not dry_run:
+                path.unlink(missing_ok=True)
+
+        logger.info(f"Asset store GC {'would remove' if dry_run else 'removed'} {removed} objects "
+                    f"({freed / 1024 / 1024:.1f} MB): {self.root}")
+        return {"removed": removed, "freed_bytes": freed}
+
+
+def _link_or_copy(source, target):
+    """
+    Hardlink source to target, copy when hardlinks are not possible.
+    """
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
@@ -1,4 +1,6 @@
+import time
 import logging
+from ezdxf.layouts import Paperspace
 from ezdxf.xref import Loader, ConflictPolicy
 
 logger = logging.getLogger(__name__)
@@ -34,27 +36,63 @@ def copy_block_definition(block_name: str, source_doc, target_doc):
     logger.info(f"Block '{block_name}' imported from the block library.")
 
 
-def replace_placeholder_text_with_block(doc, search_text: str, block_name: str):
+def replace_placeholders_with_blocks(doc, replacements: dict, layout_names=None):
     """
-    Replaces all TEXT placeholder entities containing search_text with a block reference.
+    Replaces TEXT placeholder entities with block references, for many placeholders at once.
+    Only paperspace layouts are searched, the landbase in modelspace is never scanned.
+    Every layout is queried once: placeholder texts are matched by a dict lookup and all hits are
+    replaced after the pass.
     Important: set justification (align point) of text entity to MIDDLE CENTER (used as insertion point)
 
     :param doc: ezdxf document to modify
-    :param search_text: text to search for (exact match)
-    :param block_name: block name to insert
+    :param replacements: placeholder text (exact match) -> block name, or (block name, attribs) where
+                         attribs is a dict ATTDEF tag -> value for the block attributes
+    :param layout_names: paperspace layouts to search, all paperspace layouts if None
+    :return: dict with placeholder text -> replaced count and the replacement time in seconds
     """
-    # query returns a generator, copy to list to avoid modifying while iterating
-    for layout in doc.layouts:
-        for entity in list(layout.query("TEXT")):
-            if entity.dxf.text == search_text:
-                logger.debug(f"Replacing '{search_text}' with '{block_name}'")
-                insertion_point = entity.dxf.align_point
-                rotation = entity.dxf.rotation
+    start = time.perf_counter()
+    blocks = {}
+    for search_text, block in replacements.items():
+        block_name, attribs = (block, None) if isinstance(block, str) else block
+        if block_name not in doc.blocks:
+            raise ValueError(f"Block '{block_name}' not found in document")
+        blocks[search_text] = (block_name, attribs or {})
+
+    if layout_names is None:
+        layout_names = doc.layout_names_in_taborder()[1:]
 
-                # Add block reference
-                layout.add_blockref(name=block_name, insert=insertion_point, dxfattribs={'rotation': rotation})
+    # One pass over each layout to index placeholder hits
+    hits = []
+    for layout_name in layout_names:
+        layout = doc.layouts.get(layout_name)
+        if not isinstance(layout, Paperspace):
+            raise ValueError(f"Layout '{layout_name}' is not a paperspace layout")
+        hits += [(layout, entity) for entity in layout.query("TEXT") if entity.dxf.text in blocks]
 
-                # Remove the original text
-                layout.delete_entity(entity)
+    counts = dict.fromkeys(replacements, 0)
+    for layout, entity in hits:
+        block_name, attribs = blocks[entity.dxf.text]
+        insertion_point = entity.dxf.align_point if entity.dxf.hasattr("align_point") else entity.dxf.insert
+        blockref = layout.add_blockref(name=block_name, insert=insertion_point,
+                                       dxfattribs={"rotation": entity.dxf.rotation, "layer": entity.dxf.layer})
+        if attribs:
+            blockref.add_auto_attribs(attribs)
+        counts[entity.dxf.text] += 1
+        layout.delete_entity(entity)
 
-    logger.info(f"Replaced placeholders '{search_text}' with blocks '{block_name}'")
\ No newline at end of file
+    elapsed = time.perf_counter() - start
+    logger.info(f"Replaced {len(hits)} placeholders in {len(layout_names)} layouts in {elapsed:.3f}s: "
+                + ", ".join(f"'{text}' x{count}" for text, count in counts.items()))
+    return {"replaced": counts, "time": elapsed}
+
+
+def replace_placeholder_text_with_block(doc, search_text: str, block_name: str):
+    """
+    Replaces all TEXT placeholder entities containing search_text with a block reference,
+    in all paperspace layouts. See replace_placeholders_with_blocks().
+
+    :param doc: ezdxf document to modify
+    :param search_text: text to search for (exact match)
+    :param block_name: block name to insert
+    """
+    replace_placeholders_with_blocks(doc, {search_text: block_name})
@@ -5,7 +5,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 def convert_dxf_dwg(source: str, dest: str= '',
-                    version: str = 'R2018', audit: bool = True, replace: bool = True):
+                    version: str = 'R2018', audit: bool = True, replace: bool = True, asset_store=None):
     """
     Convert a DXF file to DWG or DWG to DXF, using ODA File Converter.
 
@@ -14,6 +14,8 @@ def convert_dxf_dwg(source: str, dest: str= '',
     :param version: Output version (e.g., "R2018").
     :param audit: Whether to audit the file during conversion.
     :param replace: Replace the destination file if it already exists.
+    :param asset_store: Optional AssetStore. Conversions are stored by source content and options,
+                        a source converted before is linked from the store instead of converted again.
     """
     source_path = Path(source)
     if dest:
@@ -28,6 +30,9 @@ def convert_dxf_dwg(source: str, dest: str= '',
             logger.error(f"Unsupported source file extension: {source_path.suffix}")
             raise odafc.UnsupportedFileFormat(f"Unsupported source file extension: {source_path.suffix}")
 
+    if asset_store is not None:
+        return _convert_with_store(source_path, dest_path, version, audit, replace, asset_store)
+
     logger.debug(f"Attempting to convert: {source_path} -> {dest_path}")
     odafc.convert(
         source=source_path,
@@ -37,3 +42,41 @@ def convert_dxf_dwg(source: str, dest: str= '',
         replace=replace
     )
     logger.info(f"Successfully converted: {source_path} -> {dest_path}")
+
+
+def _convert_with_store(source_path, dest_path, version, audit, replace, asset_store):
+    """
+    Convert through the asset store and link the stored conversion to dest_path.
+    """
+    if dest_path.exists() and not replace:
+        raise FileExistsError(f"Destination file exists: {dest_path}")
+    stored = stored_conversion(source_path, dest_path.suffix, asset_store, version=version, audit=audit)
+    asset_store.link_as(stored, dest_path)
+    logger.info(f"Linked stored conversion: {source_path} -> {dest_path}")
+
+
+def stored_conversion(source, suffix, asset_store, version='R2018', audit=True):
+    """
+    Get the conversion of a DXF/DWG file from the asset store, converting it only if the same source
+    content was never converted with the same options.
+
+    :param source: Path to the source DXF or DWG file.
+    :param suffix: Target file type (".dxf" or ".dwg").
+    :param asset_store: AssetStore
+    :param version: Output version (e.g., "R2018").
+    :param audit: Whether to audit the file during conversion.
+    :return: Path of the stored conversion (read only, link it to use it outside the store).
+    """
+    source_path = Path(source)
+    key = asset_store.derived_key("odafc", asset_store.file_hash(source_path), suffix.lower(), version, audit)
+    stored = asset_store.get_derived(key, suffix)
+    if stored is not None:
+        logger.info(f"Reused stored conversion of {source_path}")
+        return stored
+
+    tmp = asset_store.temp_path(suffix.lower())
+    logger.debug(f"Attempting to convert: {source_path} -> {tmp}")
+    odafc.convert(source=source_path, dest=tmp, version=version, audit=audit, replace=True)
+    stored = asset_store.put_derived(key, tmp, move=True)
+    logger.info(f"Successfully converted: {source_path} -> {stored.name}")
+    return stored
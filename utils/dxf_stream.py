@@ -0,0 +1,359 @@
+import mmap
+import re
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+BINARY_DXF_SENTINEL = b"AutoCAD Binary DXF"
+
+def iter_dxf_tags(file_path):
+    """
+    Stream (group code, value) tags of an ASCII DXF file without loading the document.
+
+    :param file_path: path to DXF file
+    :return: generator of (int code, str value)
+    """
+    with open(file_path, "rb") as f:
+        if f.read(len(BINARY_DXF_SENTINEL)) == BINARY_DXF_SENTINEL:
+            raise ValueError(f"Binary DXF is not supported for streaming reads: {file_path}")
+        f.seek(0)
+        lines = iter(f)
+        for code_line in lines:
+            value_line = next(lines, b"")
+            try:
+                code = int(code_line)
+            except ValueError:
+                raise ValueError(f"Invalid DXF group code {code_line!r} in file: {file_path}")
+            yield code, value_line.rstrip(b"\r\n").decode("utf-8", errors="replace")
+
+
+def iter_section_tags(tags, section_name):
+    """
+    Yield the tags of one section from a tag stream and stop at its end.
+
+    :param tags: tag stream from iter_dxf_tags
+    :param section_name: section name e.g. HEADER, TABLES, ENTITIES
+    :return: generator of (code, value) inside the section
+    """
+    in_section = False
+    previous = None
+    for tag in tags:
+        if in_section:
+            if tag == (0, "ENDSEC"):
+                return
+            yield tag
+        elif previous == (0, "SECTION") and tag == (2, section_name):
+            in_section = True
+        previous = tag
+
+
+def read_dxf_header(file_path):
+    """
+    Read HEADER section variables of a DXF file. Reading stops after the HEADER section.
+
+    :param file_path: path to DXF file
+    :return: dict variable name -> value (first value of multi-value variables)
+    """
+    header = {}
+    name = None
+    for code, value in iter_section_tags(iter_dxf_tags(file_path), "HEADER"):
+        if code == 9:
+            name = value
+        elif name is not None:
+            header[name] = value.strip()
+            name = None
+    return header
+
+
+def read_table_entries(file_path, table_name="LAYER"):
+    """
+    Read entry names of a table (LAYER, BLOCK_RECORD, STYLE...) from the TABLES section.
+    Reading stops after the TABLES section.
+
+    :param file_path: path to DXF file
+    :param table_name: table name
+    :return: list of entry names in file order
+    """
+    names = []
+    in_table = False
+    expect_name = False
+    previous = None
+    for code, value in iter_section_tags(iter_dxf_tags(file_path), "TABLES"):
+        if previous == (0, "TABLE") and code == 2:
+            in_table = value == table_name
+        elif in_table:
+            if code == 0:
+                if value == "ENDTAB":
+                    break
+                expect_name = value == table_name
+            elif code == 2 and expect_name:
+                names.append(value)
+                expect_name = False
+        previous = (code, value)
+    return names
+
+
+def _section_span(mm, section_name):
+    """
+    Find the byte span of a section in a memory mapped DXF file.
+    """
+    match = re.search(rb"\n *0\r?\nSECTION\r?\n *2\r?\n" + section_name.encode() + rb"\r?\n", mm)
+    if not match:
+        return None
+    end = re.compile(rb"\n *0\r?\nENDSEC\r?\n").search(mm, match.end())
+    return match.end(), end.start() if end else len(mm)
+
+
+def _entity_start(mm, code_start, section_start):
+    """
+    Walk back tag by tag from the code line starting at code_start to the entity start (group code 0).
+    """
+    while code_start > section_start:
+        value_start = mm.rfind(b"\n", section_start, code_start - 1) + 1
+        code_start = mm.rfind(b"\n", section_start, value_start - 1) + 1
+        if code_start < section_start:
+            break
+        if mm[code_start:value_start].strip() == b"0":
+            return code_start
+    return section_start
+
+
+def _read_entity_tags(mm, entity_start, section_end):
+    """
+    Read tags of the entity starting at entity_start, up to the next group code 0.
+    """
+    tags = {}
+    pos = entity_start
+    while pos < section_end:
+        value_start = mm.find(b"\n", pos, section_end) + 1
+        value_end = mm.find(b"\n", value_start, section_end)
+        if value_start == 0 or value_end == -1:
+            break
+        code = int(mm[pos:value_start])
+        if code == 0 and tags:
+            break
+        tags.setdefault(code, []).append(mm[value_start:value_end].rstrip(b"\r").decode("utf-8", errors="replace"))
+        pos = value_end + 1
+    return tags
+
+
+def find_entity_on_layer(file_path, entity_type, layer, section="ENTITIES"):
+    """
+    Find the first entity of entity_type on layer without parsing the document.
+    The file is memory mapped and searched for the layer tag, only matching entities are parsed.
+    Paperspace entities (group code 67 = 1) are skipped.
+
+    :param file_path: path to DXF file
+    :param entity_type: DXF entity type e.g. LWPOLYLINE
+    :param layer: layer name (case-insensitive)
+    :param section: section to search in
+    :return: dict of entity tags (group code -> list of values), None if not found
+    """
+    file_path = Path(file_path)
+    if file_path.stat().st_size == 0:
+        return None
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:len(BINARY_DXF_SENTINEL)] == BINARY_DXF_SENTINEL:
+            raise ValueError(f"Binary DXF is not supported for streaming reads: {file_path}")
+        span = _section_span(mm, section)
+        if span is None:
+            return None
+        start, end = span
+        # Layer names are case-insensitive
+        layer_tag = re.compile(rb"\n *8\r?\n(?i:" + re.escape(layer.encode()) + rb")\r?\n")
+        for match in layer_tag.finditer(mm, start, end):
+            entity_start = _entity_start(mm, match.start() + 1, start)
+            tags = _read_entity_tags(mm, entity_start, end)
+            if tags.get(0, [None])[0] == entity_type and tags.get(67, ["0"])[0].strip() != "1":
+                return tags
+    return None
+
+
+def read_layout_names(file_path):
+    """
+    Read paperspace layout names in tab order from the LAYOUT objects, without loading the document.
+
+    :param file_path: path to DXF file
+    :return: list of layout names (without Model)
+    """
+    layouts = []
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        span = _section_span(mm, "OBJECTS")
+        if span is None:
+            return layouts
+        start, end = span
+        for match in re.compile(rb"\n *0\r?\nLAYOUT\r?\n").finditer(mm, start - 1, end):
+            tags = _read_entity_tags(mm, match.start() + 1, end)
+            # Code 1 is the page setup name first (AcDbPlotSettings), then the layout name (AcDbLayout)
+            name = tags.get(1, [""])[-1]
+            taborder = int(tags.get(71, ["0"])[-1])
+            if name != "Model":
+                layouts.append((taborder, name))
+    return [name for _, name in sorted(layouts)]
+
+
+def iter_dxf_entities(file_path, sections=("ENTITIES", "BLOCKS", "OBJECTS")):
+    """
+    Stream entities and objects of some sections as (section, tags) without loading the document.
+    Tags of other sections are skipped without being collected.
+
+    :param file_path: path to DXF file
+    :param sections: section names to read
+    :return: generator of (section name, list of (code, value) starting with the (0, type) tag)
+    """
+    section = None
+    entity = None
+    previous = None
+    for code, value in iter_dxf_tags(file_path):
+        if code == 0:
+            if entity is not None:
+                yield section, entity
+            entity = None
+            if value == "EOF":
+                break
+            if value in ("SECTION", "ENDSEC"):
+                section = None
+            elif section in sections:
+                entity = [(code, value)]
+        elif previous == (0, "SECTION") and code == 2:
+            section = value
+        elif entity is not None:
+            entity.append((code, value))
+        previous = (code, value)
+    if entity is not None:
+        yield section, entity
+
+
+def _owner_handle(tags):
+    """
+    Owner handle (group code 330 outside of 102 application groups) of entity tags.
+    """
+    in_group = False
+    for code, value in tags:
+        if code == 102:
+            in_group = value.startswith("{")
+        elif code == 330 and not in_group:
+            return value
+        elif code == 100:
+            break
+    return None
+
+
+def _subclass_tags(tags, subclass):
+    """
+    Tags of a subclass (after its group code 100 marker) as group code -> list of values.
+    """
+    values = {}
+    in_subclass = False
+    for code, value in tags:
+        if code == 100:
+            in_subclass = value == subclass
+        elif in_subclass:
+            values.setdefault(code, []).append(value)
+    return values
+
+
+# Anonymous block numbers (*U12) depend on creation order, they are indexed without number
+_ANONYMOUS_BLOCK = re.compile(r"^(\*[A-Za-z]+)\d+$")
+
+_VIEWPORT_PARAMS = {
+    "center": (10, 20),
+    "width": (40,),
+    "height": (41,),
+    "view_center": (12, 22),
+    "view_height": (45,),
+    "twist": (51,),
+}
+
+
+def read_layout_index(file_path, precision=6):
+    """
+    Build a compact per-layout index of a DXF in one streaming pass, without loading the document:
+    entity type counts, inserted block counts, ATTRIB values, viewport parameters and image files.
+
+    Entities are assigned to layouts by their owner block record, so paperspace entities stored in
+    the BLOCKS section (inactive layouts) are indexed like those of the ENTITIES section.
+    Handles and anonymous block numbers are not part of the index, indexes of two generations of
+    the same drawing are equal.
+
+    :param file_path: path to DXF file
+    :param precision: decimals of rounded viewport parameters
+    :return: dict layout name -> {"entities", "inserts", "attribs", "viewports", "images"}, Model first
+             then paperspace layouts in tab order. ATTRIB keys are "<block>/<tag>", repeated keys get a
+             "#<n>" suffix in file order.
+    """
+    owned = {}
+    inserts = {}
+    image_defs = {}
+    layout_records = []
+    last_insert = None
+    for section, tags in iter_dxf_entities(file_path):
+        entity_type = tags[0][1]
+        if section == "OBJECTS":
+            if entity_type == "LAYOUT":
+                layout = _subclass_tags(tags, "AcDbLayout")
+                layout_records.append((int(layout.get(71, ["0"])[0]), layout.get(1, [""])[0],
+                                       layout.get(330, [None])[-1]))
+            elif entity_type == "IMAGEDEF":
+                image_defs[dict(tags).get(5)] = _subclass_tags(tags, "AcDbRasterImageDef").get(1, [""])[0]
+            continue
+        if entity_type in ("BLOCK", "ENDBLK"):
+            continue
+
+        # ATTRIBs follow their INSERT up to a SEQEND, their owner handle is not reliable
+        # (ezdxf writes the layout block record instead of the INSERT)
+        if entity_type == "ATTRIB":
+            if last_insert is not None:
+                record, block_name = inserts[last_insert]
+                attrib = _subclass_tags(tags, "AcDbAttribute").get(2, [""])[0]
+                text = _subclass_tags(tags, "AcDbText").get(1, [""])[0]
+                owned.setdefault(record, []).append(("ATTRIB", (f"{block_name}/{attrib}", text)))
+            continue
+        if entity_type == "SEQEND":
+            last_insert = None
+            continue
+
+        owner = _owner_handle(tags)
+        values = dict(reversed(tags))  # first value of each group code
+        last_insert = None
+        if entity_type == "INSERT":
+            detail = _ANONYMOUS_BLOCK.sub(r"\1", values.get(2, ""))
+            inserts[values.get(5)] = (owner, detail)
+            last_insert = values.get(5)
+        elif entity_type == "VIEWPORT":
+            # + 0.0 turns -0.0 into 0.0
+            detail = {name: [round(float(values.get(code, 0.0)), precision) + 0.0 for code in codes]
+                      for name, codes in _VIEWPORT_PARAMS.items()}
+            detail = {name: value[0] if len(value) == 1 else value for name, value in detail.items()}
+        elif entity_type == "IMAGE":
+            detail = values.get(340)
+        else:
+            detail = None
+        owned.setdefault(owner, []).append((entity_type, detail))
+
+    index = {}
+    for _, name, record in sorted(layout_records, key=lambda layout: (layout[1] != "Model", layout[0])):
+        entities, block_inserts, attribs, viewports, images = {}, {}, {}, [], []
+        for entity_type, detail in owned.get(record, []):
+            entities[entity_type] = entities.get(entity_type, 0) + 1
+            if entity_type == "ATTRIB":
+                key, text = detail
+                n = 1
+                while (key if n == 1 else f"{key}#{n}") in attribs:
+                    n += 1
+                attribs[key if n == 1 else f"{key}#{n}"] = text
+            elif entity_type == "INSERT":
+                block_inserts[detail] = block_inserts.get(detail, 0) + 1
+            elif entity_type == "VIEWPORT":
+                viewports.append(detail)
+            elif entity_type == "IMAGE":
+                images.append(image_defs.get(detail, ""))
+        index[name] = {
+            "entities": dict(sorted(entities.items())),
+            "inserts": dict(sorted(block_inserts.items())),
+            "attribs": attribs,
+            "viewports": viewports,
+            "images": sorted(images),
+        }
+    return index
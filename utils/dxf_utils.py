@@ -2,10 +2,14 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-def insert_img_into_dxf(doc, image_path, insert_point, width_units, height_units, width_px, height_px):
+def insert_img_into_dxf(doc, image_path, insert_point, width_units, height_units, width_px, height_px,
+                        asset_store=None, drawing_folder=None):
     """
     Insert image into modelspace.
 
+    With an asset store, the image is moved into the store and referenced by its content-addressed
+    path relative to the drawing (xref/<hash>.png), linked into the xref folder of the drawing.
+
     :param doc: drawing doc
     :param image_path: path to image
     :param insert_point: image insertion point
@@ -13,9 +17,14 @@ def insert_img_into_dxf(doc, image_path, insert_point, width_units, height_units
     :param height_units: image height in CAD units
     :param width_px: image width in pixels
     :param height_px: image height in pixels
+    :param asset_store: optional AssetStore for the image file
+    :param drawing_folder: folder the drawing is saved to, required with asset_store
     """
+    filename = str(image_path)
+    if asset_store is not None:
+        filename = asset_store.add_xref(image_path, drawing_folder, move=True)
     image_def = doc.add_image_def(
-        filename=str(image_path),
+        filename=filename,
         size_in_pixel=(width_px, height_px)
     )
     doc.modelspace().add_image(
@@ -25,3 +34,31 @@ def insert_img_into_dxf(doc, image_path, insert_point, width_units, height_units
         rotation=0
     )
     logger.info(f"Image inserted at: {insert_point}, size: {width_units} x {height_units}")
+
+
+def clone_layout(doc, source_name, new_name):
+    """
+    Copy a paperspace layout with its page setup and entities.
+    The new layout is placed in the tab order right after the source layout.
+
+    :param doc: drawing doc
+    :param source_name: name of the layout to copy
+    :param new_name: name of the new layout
+    :return: new Paperspace layout
+    """
+    source = doc.layouts.get(source_name)
+    skip = {"handle", "owner", "name", "taborder", "block_record_handle", "viewport_handle"}
+    dxfattribs = {k: v for k, v in source.dxf_layout.dxf.all_existing_dxf_attribs().items() if k not in skip}
+    layout = doc.layouts.new(new_name, dxfattribs=dxfattribs)
+
+    for entity in source:
+        layout.add_entity(entity.copy())
+
+    # Place new layout after the source layout
+    names = [name for name in doc.layout_names_in_taborder() if name != new_name]
+    names.insert(names.index(source_name) + 1, new_name)
+    for taborder, name in enumerate(names):
+        doc.layouts.get(name).dxf_layout.dxf.taborder = taborder
+
+    logger.info(f"Cloned layout {source_name} -> {new_name} ({len(layout)} entities)")
+    return layout
@@ -2,17 +2,19 @@ import ezdxf
 from ezdxf.addons import odafc
 import json
 from pathlib import Path
+from utils.dxf_dwg_converter import stored_conversion
 import logging
 
 logger = logging.getLogger(__name__)
 
-def load_cad_file(file_path: str, audit: bool = False, odafc_version: str = None):
+def load_cad_file(file_path: str, audit: bool = False, odafc_version: str = None, asset_store=None):
     """
     Load a CAD file (DXF or DWG) and return an ezdxf.DXFDocument object.
 
     :param file_path: Path to the file (.dxf or .dwg)
     :param audit: Whether to audit/recover drawings (DWG only)
     :param odafc_version: Optional target version for DWG → DXF conversion
+    :param asset_store: Optional AssetStore to keep DWG → DXF conversions, a DWG is converted once per content
     :return: ezdxf.DXFDocument
     """
     file_path = Path(file_path)
@@ -28,6 +30,10 @@ def load_cad_file(file_path: str, audit: bool = False, odafc_version: str = None
         if suffix == ".dxf":
             logger.info(f"Loading DXF file: {file_path}")
             doc = ezdxf.readfile(str(file_path))
+        elif suffix == ".dwg" and asset_store is not None:
+            logger.info(f"Loading DWG file via stored ODAFC conversion: {file_path}")
+            dxf_path = stored_conversion(file_path, ".dxf", asset_store, version=odafc_version or "R2018", audit=audit)
+            doc = ezdxf.readfile(str(dxf_path))
         elif suffix == ".dwg":
             logger.info(f"Loading DWG file via ODAFC: {file_path}")
             doc = odafc.readfile(str(file_path), audit=audit, version=odafc_version)
@@ -58,4 +64,33 @@ def load_json_file(file_path: str):
         raise e
     except json.JSONDecodeError as e:
         logger.error(f"Failed to decode JSON in file: {file_path}")
-        raise e
\ No newline at end of file
+        raise e
+
+
+def load_job_manifest(file_path: str):
+    """
+    Load a batch manifest - a JSON list of jobs:
+        {"job_id": optional id, "input": path to input JSON or "input_data": {...}, "landbase": path}
+    Relative paths are resolved against the manifest folder.
+
+    :param file_path: Path to the manifest JSON file.
+    :return: list of jobs with "job_id", "input_data" and absolute "landbase" path
+    """
+    manifest_dir = Path(file_path).resolve().parent
+    jobs = []
+    for i, entry in enumerate(load_json_file(file_path)):
+        if "input_data" in entry:
+            input_data = entry["input_data"]
+        elif "input" in entry:
+            input_data = load_json_file(str(manifest_dir / entry["input"]))
+        else:
+            raise ValueError(f"Manifest job {i} has no 'input' or 'input_data': {file_path}")
+        if "landbase" not in entry:
+            raise ValueError(f"Manifest job {i} has no 'landbase': {file_path}")
+        jobs.append({
+            "job_id": entry.get("job_id"),
+            "input_data": input_data,
+            "landbase": str(manifest_dir / entry["landbase"]),
+        })
+    logger.info(f"Loaded {len(jobs)} jobs from manifest: {file_path}")
+    return jobs
@@ -0,0 +1,169 @@
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Boundary:
+    """
+    Project boundary held as a NumPy array of 2D points.
+
+    Bounding box and center are computed once on creation and passed along with the boundary,
+    so they never have to be re-queried from modelspace.
+
+    :ivar points: (N, 2) float array of boundary vertices
+    :ivar bbox_min: lower left corner of the bounding box (x, y)
+    :ivar bbox_max: upper right corner of the bounding box (x, y)
+    :ivar center: bounding box center (x, y)
+    :ivar size: bounding box width and height
+    """
+
+    def __init__(self, points, closed=True):
+        """
+        :param points: iterable of (x, y) points or (N, >=2) array
+        :param closed: whether the boundary is a closed polygon
+        """
+        self.points = as_points_array(points)
+        if len(self.points) == 0:
+            raise ValueError("Boundary has no points.")
+        self.closed = closed
+        self.bbox_min, self.bbox_max = bounding_box(self.points)
+        self.center = (self.bbox_min + self.bbox_max) / 2
+        self.size = self.bbox_max - self.bbox_min
+
+    def __len__(self):
+        return len(self.points)
+
+    def transformed(self, origin, offset, scale=(1.0, 1.0)):
+        """
+        Translate and scale the boundary: offset + (points - origin) * scale.
+
+        :param origin: point mapped onto offset
+        :param offset: new position of origin
+        :param scale: scale factor, scalar or (scale_x, scale_y)
+        :return: new Boundary
+        """
+        return Boundary(translate_scale(self.points, origin, offset, scale), closed=self.closed)
+
+    def simplified(self, tolerance):
+        """
+        Simplify the boundary with Douglas-Peucker.
+
+        :param tolerance: max allowed deviation in drawing units, 0 disables simplification
+        :return: new Boundary
+        """
+        return Boundary(simplify_douglas_peucker(self.points, tolerance, closed=self.closed), closed=self.closed)
+
+
+def as_points_array(points):
+    """
+    Convert points to a (N, 2) float array. Extra coordinates (z, bulge...) are dropped.
+
+    :param points: iterable of points or array
+    :return: (N, 2) float64 array
+    """
+    arr = np.asarray(points, dtype=np.float64)
+    if arr.size == 0:
+        return np.empty((0, 2), dtype=np.float64)
+    if arr.ndim != 2 or arr.shape[1] < 2:
+        raise ValueError(f"Expected a sequence of 2D points, got array of shape {arr.shape}")
+    return arr[:, :2]
+
+
+def bounding_box(points):
+    """
+    Compute the bounding box of points.
+
+    :param points: (N, 2) array
+    :return: (min_xy, max_xy) arrays
+    """
+    pts = as_points_array(points)
+    if len(pts) == 0:
+        raise ValueError("Bounding box of empty point set.")
+    return pts.min(axis=0), pts.max(axis=0)
+
+
+def translate_scale(points, origin, offset, scale=(1.0, 1.0)):
+    """
+    Translate and scale points: offset + (points - origin) * scale.
+
+    :param points: (N, 2) array
+    :param origin: point mapped onto offset
+    :param offset: new position of origin
+    :param scale: scale factor, scalar or (scale_x, scale_y)
+    :return: transformed (N, 2) array
+    """
+    pts = as_points_array(points)
+    return np.asarray(offset, dtype=np.float64) + (pts - np.asarray(origin, dtype=np.float64)) * np.asarray(scale, dtype=np.float64)
+
+
+def principal_axis(points):
+    """
+    Direction of the largest spread of points (first principal component).
+
+    :param points: (N, 2) array
+    :return: unit vector (2,) pointing to +x (or +y for vertical axes)
+    """
+    pts = as_points_array(points)
+    if len(pts) < 2:
+        return np.array([1.0, 0.0])
+    eigenvalues, eigenvectors = np.linalg.eigh(np.cov((pts - pts.mean(axis=0)).T))
+    axis = eigenvectors[:, np.argmax(eigenvalues)]
+    if axis[0] < 0 or (axis[0] == 0 and axis[1] < 0):
+        axis = -axis
+    return axis
+
+
+def _point_segment_distances(points, start, end):
+    """
+    Distances from points to the segment start-end.
+    """
+    d = end - start
+    length2 = d @ d
+    if length2 == 0:
+        return np.hypot(*(points - start).T)
+    t = np.clip(((points - start) @ d) / length2, 0.0, 1.0)
+    projected = start + t[:, None] * d
+    return np.hypot(*(points - projected).T)
+
+
+def simplify_douglas_peucker(points, tolerance, closed=False):
+    """
+    Simplify a polyline with the Douglas-Peucker algorithm.
+    Iterative (no recursion limit for big boundaries), distances are computed vectorized per span.
+
+    :param points: (N, 2) array
+    :param tolerance: max allowed deviation, 0 or less returns the points unchanged
+    :param closed: treat points as a closed ring (closing segment is simplified too)
+    :return: simplified (M, 2) array
+    """
+    pts = as_points_array(points)
+    if tolerance <= 0 or len(pts) < 3:
+        return pts.copy()
+
+    # A closed ring is simplified as a polyline that returns to its first vertex
+    work = np.vstack([pts, pts[:1]]) if closed else pts
+    n = len(work)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        dists = _point_segment_distances(work[start + 1:end], work[start], work[end])
+        idx = int(np.argmax(dists))
+        if dists[idx] > tolerance:
+            split = start + 1 + idx
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    result = work[keep]
+    if closed:
+        result = result[:-1]
+        if len(result) < 3:
+            return pts.copy()
+
+    logger.debug(f"Simplified polyline from {len(pts)} to {len(result)} points (tolerance {tolerance}).")
+    return result
@@ -0,0 +1,467 @@
+import gzip
+import math
+import sqlite3
+import struct
+import zlib
+import numpy as np
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+WEB_MERCATOR_EPSG = 3857
+_MERCATOR_HALF_WORLD = math.pi * 6378137.0
+
+class MapFeature:
+    """
+    Vector feature read from a local map source.
+
+    :ivar geom_type: "Point", "LineString" or "Polygon" (multi geometries are held as several parts)
+    :ivar properties: feature attributes
+    :ivar parts: Point and LineString - list of (N, 2) arrays,
+                 Polygon - list of polygons, each a list of rings (exterior ring first)
+    """
+
+    def __init__(self, geom_type, properties, parts):
+        self.geom_type = geom_type
+        self.properties = properties
+        self.parts = parts
+
+    def arrays(self):
+        """
+        All coordinate arrays of the feature (every ring of every polygon).
+        """
+        if self.geom_type == "Polygon":
+            return [ring for polygon in self.parts for ring in polygon]
+        return list(self.parts)
+
+    def with_arrays(self, arrays):
+        """
+        Copy of the feature with coordinate arrays replaced (same order as arrays()).
+        """
+        arrays = iter(arrays)
+        if self.geom_type == "Polygon":
+            parts = [[next(arrays) for _ in polygon] for polygon in self.parts]
+        else:
+            parts = [next(arrays) for _ in self.parts]
+        return MapFeature(self.geom_type, self.properties, parts)
+
+
+def open_map_source(path):
+    """
+    Open a local map extract by file type.
+
+    :param path: .mbtiles (Mapbox vector tiles) or .gpkg (GeoPackage) file
+    :return: MBTilesSource or GeoPackageSource
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Map data not found: {path}")
+    suffix = path.suffix.lower()
+    if suffix == ".mbtiles":
+        return MBTilesSource(path)
+    if suffix == ".gpkg":
+        return GeoPackageSource(path)
+    raise ValueError(f"Unsupported map data type: {suffix}. Only .mbtiles and .gpkg are supported.")
+
+
+class MBTilesSource:
+    """
+    MBTiles file with Mapbox vector tiles (MVT). Features are returned in Web Mercator.
+    Source layers are the tile layers (road, water, building...).
+    """
+
+    crs = WEB_MERCATOR_EPSG
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with sqlite3.connect(f"file:{self.path}?mode=ro", uri=True) as conn:
+            metadata = dict(conn.execute("SELECT name, value FROM metadata").fetchall())
+            if "minzoom" in metadata and "maxzoom" in metadata:
+                self.minzoom, self.maxzoom = int(metadata["minzoom"]), int(metadata["maxzoom"])
+            else:
+                self.minzoom, self.maxzoom = conn.execute("SELECT MIN(zoom_level), MAX(zoom_level) FROM tiles").fetchone()
+        if self.maxzoom is None:
+            raise ValueError(f"MBTiles file has no tiles: {self.path}")
+        if metadata.get("format", "pbf") != "pbf":
+            raise ValueError(f"Only vector (pbf) MBTiles are supported, got '{metadata['format']}': {self.path}")
+
+    def read_features(self, bbox_wgs, zoom, layers):
+        """
+        Read features of the tiles covering a bounding box.
+
+        :param bbox_wgs: (min_lon, min_lat, max_lon, max_lat)
+        :param zoom: map zoom, tiles are read at the closest available zoom level
+        :param layers: source layer names to read
+        :return: dict source layer -> list of MapFeature in Web Mercator
+        """
+        z = min(max(int(math.floor(zoom)), self.minzoom), self.maxzoom)
+        min_x, max_y = lonlat_to_tile(bbox_wgs[0], bbox_wgs[1], z)
+        max_x, min_y = lonlat_to_tile(bbox_wgs[2], bbox_wgs[3], z)
+        features = {layer: [] for layer in layers}
+        tile_count = 0
+        with sqlite3.connect(f"file:{self.path}?mode=ro", uri=True) as conn:
+            # MBTiles rows use the TMS scheme (y from the bottom)
+            rows = conn.execute(
+                "SELECT tile_column, tile_row, tile_data FROM tiles "
+                "WHERE zoom_level = ? AND tile_column BETWEEN ? AND ? AND tile_row BETWEEN ? AND ?",
+                (z, min_x, max_x, (1 << z) - 1 - max_y, (1 << z) - 1 - min_y),
+            )
+            for column, row, data in rows:
+                tile_count += 1
+                y = (1 << z) - 1 - row
+                for layer, tile_features in decode_mvt(_decompress(data), z, column, y, layers).items():
+                    features[layer] += tile_features
+        logger.debug(f"Read {tile_count} tiles at zoom {z} from {self.path.name}")
+        return features
+
+
+class GeoPackageSource:
+    """
+    GeoPackage with one feature table per source layer (table "road" for source layer "road"...).
+    Tables are filtered with their R-tree spatial index when there is one.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.tables = {}
+        with sqlite3.connect(f"file:{self.path}?mode=ro", uri=True) as conn:
+            rows = conn.execute(
+                "SELECT g.table_name, g.column_name, s.organization, s.organization_coordsys_id "
+                "FROM gpkg_geometry_columns g JOIN gpkg_spatial_ref_sys s ON g.srs_id = s.srs_id"
+            ).fetchall()
+        crs_codes = set()
+        for table, column, organization, code in rows:
+            if organization.upper() != "EPSG":
+                raise ValueError(f"Table '{table}' uses unsupported CRS {organization}:{code}: {self.path}")
+            self.tables[table] = column
+            crs_codes.add(code)
+        if len(crs_codes) > 1:
+            raise ValueError(f"All GeoPackage feature tables must use one CRS, got {sorted(crs_codes)}: {self.path}")
+        self.crs = crs_codes.pop() if crs_codes else WEB_MERCATOR_EPSG
+
+    def read_features(self, bbox_wgs, zoom, layers):
+        """
+        Read features intersecting a bounding box.
+
+        :param bbox_wgs: (min_lon, min_lat, max_lon, max_lat)
+        :param zoom: map zoom (not used, GeoPackage features are not tiled)
+        :param layers: source layer names to read
+        :return: dict source layer -> list of MapFeature in the GeoPackage CRS
+        """
+        from pyproj import Transformer
+        bbox = Transformer.from_crs(4326, self.crs, always_xy=True).transform_bounds(*bbox_wgs)
+        features = {}
+        with sqlite3.connect(f"file:{self.path}?mode=ro", uri=True) as conn:
+            for layer in layers:
+                if layer in self.tables:
+                    features[layer] = self._read_table(conn, layer, self.tables[layer], bbox)
+        return features
+
+    @staticmethod
+    def _read_table(conn, table, geom_column, bbox):
+        columns = conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+        names = [column[1] for column in columns]
+        pk = next((column[1] for column in columns if column[5]), "rowid")
+        rtree = f"rtree_{table}_{geom_column}"
+        has_index = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (rtree,)
+        ).fetchone()
+
+        select = ", ".join(f't."{name}"' for name in names)
+        if has_index:
+            cursor = conn.execute(
+                f'SELECT {select} FROM "{table}" t JOIN "{rtree}" r ON t."{pk}" = r.id '
+                "WHERE r.minx <= ? AND r.maxx >= ? AND r.miny <= ? AND r.maxy >= ?",
+                (bbox[2], bbox[0], bbox[3], bbox[1]),
+            )
+        else:
+            cursor = conn.execute(f'SELECT {select} FROM "{table}" t')
+
+        geom_index = names.index(geom_column)
+        features = []
+        for row in cursor:
+            if row[geom_index] is None:
+                continue
+            geometry = parse_gpkg_geometry(row[geom_index])
+            if geometry is None:
+                continue
+            properties = {name: value for name, value in zip(names, row) if name not in (geom_column, pk)}
+            features.append(MapFeature(geometry[0], properties, geometry[1]))
+        return features
+
+
+def lonlat_to_tile(lon, lat, zoom):
+    """
+    XYZ tile containing a WGS84 point.
+
+    :return: (x, y) tile indices
+    """
+    n = 1 << zoom
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def _decompress(data):
+    if data[:2] == b"\x1f\x8b":
+        return gzip.decompress(data)
+    if data[:1] == b"\x78":
+        return zlib.decompress(data)
+    return data
+
+
+def _read_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _iter_fields(data):
+    """
+    Iterate protobuf fields: (field number, wire type, value).
+    Length delimited values are returned as memoryview slices.
+    """
+    pos, end = 0, len(data)
+    while pos < end:
+        key, pos = _read_varint(data, pos)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, pos = _read_varint(data, pos)
+        elif wire_type == 1:
+            value, pos = data[pos:pos + 8], pos + 8
+        elif wire_type == 2:
+            length, pos = _read_varint(data, pos)
+            value, pos = data[pos:pos + length], pos + length
+        elif wire_type == 5:
+            value, pos = data[pos:pos + 4], pos + 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type} in vector tile")
+        yield field, wire_type, value
+
+
+def _read_packed(data):
+    values, pos = [], 0
+    while pos < len(data):
+        value, pos = _read_varint(data, pos)
+        values.append(value)
+    return values
+
+
+def _zigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def _decode_value(data):
+    for field, wire_type, value in _iter_fields(data):
+        if field == 1:
+            return bytes(value).decode("utf-8", errors="replace")
+        if field == 2:
+            return struct.unpack("<f", value)[0]
+        if field == 3:
+            return struct.unpack("<d", value)[0]
+        if field in (4, 5):
+            return value if field == 5 or value < 1 << 63 else value - (1 << 64)
+        if field == 6:
+            return _zigzag(value)
+        if field == 7:
+            return bool(value)
+    return None
+
+
+def _decode_geometry(commands):
+    """
+    Decode MVT geometry commands into lists of tile coordinate rings/lines.
+
+    :return: list of (points list, closed)
+    """
+    lines = []
+    x = y = 0
+    current = None
+    i = 0
+    while i < len(commands):
+        command, count = commands[i] & 0x7, commands[i] >> 3
+        i += 1
+        if command == 7:
+            if current is not None:
+                lines[-1] = (current, True)
+            continue
+        for _ in range(count):
+            x += _zigzag(commands[i])
+            y += _zigzag(commands[i + 1])
+            i += 2
+            if command == 1:
+                current = [(x, y)]
+                lines.append((current, False))
+            else:
+                current.append((x, y))
+    return lines
+
+
+def _ring_area(points):
+    pts = np.asarray(points, dtype=np.float64)
+    x, y = pts[:, 0], pts[:, 1]
+    return (x * np.roll(y, -1) - np.roll(x, -1) * y).sum() / 2
+
+
+def decode_mvt(data, zoom, tile_x, tile_y, layers=None):
+    """
+    Decode a Mapbox vector tile into features in Web Mercator.
+
+    :param data: uncompressed tile protobuf
+    :param zoom: tile zoom
+    :param tile_x: tile column (XYZ)
+    :param tile_y: tile row (XYZ, from the top)
+    :param layers: source layer names to decode, all if None
+    :return: dict layer name -> list of MapFeature
+    """
+    data = memoryview(data)
+    tile_size = 2 * _MERCATOR_HALF_WORLD / (1 << zoom)
+    origin_x = -_MERCATOR_HALF_WORLD + tile_x * tile_size
+    origin_y = _MERCATOR_HALF_WORLD - tile_y * tile_size
+    geom_types = {1: "Point", 2: "LineString", 3: "Polygon"}
+
+    result = {}
+    for field, _, layer_data in _iter_fields(data):
+        if field != 3:
+            continue
+        name, extent, keys, values, raw_features = None, 4096, [], [], []
+        for layer_field, _, value in _iter_fields(layer_data):
+            if layer_field == 1:
+                name = bytes(value).decode("utf-8")
+            elif layer_field == 2:
+                raw_features.append(value)
+            elif layer_field == 3:
+                keys.append(bytes(value).decode("utf-8"))
+            elif layer_field == 4:
+                values.append(_decode_value(value))
+            elif layer_field == 5:
+                extent = value
+        if layers is not None and name not in layers:
+            continue
+
+        scale = tile_size / extent
+
+        def to_mercator(points):
+            pts = np.asarray(points, dtype=np.float64)
+            return np.column_stack([origin_x + pts[:, 0] * scale, origin_y - pts[:, 1] * scale])
+
+        features = result.setdefault(name, [])
+        for raw_feature in raw_features:
+            tags, geom_type, commands = [], 0, []
+            for feature_field, _, value in _iter_fields(raw_feature):
+                if feature_field == 2:
+                    tags = _read_packed(value)
+                elif feature_field == 3:
+                    geom_type = value
+                elif feature_field == 4:
+                    commands = _read_packed(value)
+            if geom_type not in geom_types or not commands:
+                continue
+
+            properties = {keys[tags[i]]: values[tags[i + 1]] for i in range(0, len(tags) - 1, 2)}
+            lines = _decode_geometry(commands)
+            if geom_type == 3:
+                # Exterior rings have positive area in tile coordinates (y down), holes negative
+                parts = []
+                for points, _ in lines:
+                    if len(points) < 3:
+                        continue
+                    if _ring_area(points) > 0 or not parts:
+                        parts.append([points])
+                    else:
+                        parts[-1].append(points)
+            elif geom_type == 1:
+                parts = [[point for points, _ in lines for point in points]]
+            else:
+                parts = [points for points, _ in lines if len(points) > 1]
+
+            if geom_type == 3:
+                parts = [[to_mercator(ring) for ring in polygon] for polygon in parts]
+            else:
+                parts = [to_mercator(points) for points in parts]
+            if parts:
+                features.append(MapFeature(geom_types[geom_type], properties, parts))
+    return result
+
+
+def parse_gpkg_geometry(blob):
+    """
+    Parse a GeoPackage geometry blob (header + WKB).
+
+    :return: (geom_type, parts) as in MapFeature, None for empty geometries
+    """
+    if blob[:2] != b"GP":
+        raise ValueError("Invalid GeoPackage geometry blob")
+    flags = blob[3]
+    if flags & 0x10:
+        return None
+    envelope_sizes = {0: 0, 1: 32, 2: 48, 3: 48, 4: 64}
+    offset = 8 + envelope_sizes[(flags >> 1) & 0x7]
+    geometries, _ = _parse_wkb(memoryview(blob), offset)
+    if not geometries:
+        return None
+
+    geom_type = geometries[0][0]
+    parts = []
+    for part_type, part in geometries:
+        if part_type != geom_type:
+            continue
+        parts += part
+    return geom_type, parts
+
+
+def _parse_wkb(data, pos):
+    """
+    Parse one WKB geometry (ISO or EWKB dimension flags). Z/M coordinates are dropped.
+
+    :return: (list of (geom_type, parts), next position)
+    """
+    endian = "<" if data[pos] == 1 else ">"
+    wkb_type = struct.unpack_from(f"{endian}I", data, pos + 1)[0]
+    pos += 5
+    dims = 2
+    if wkb_type & 0x80000000:
+        dims += 1
+    if wkb_type & 0x40000000:
+        dims += 1
+    if wkb_type & 0x20000000:
+        pos += 4  # EWKB SRID
+    wkb_type &= 0x0FFFFFFF
+    dims += {1: 1, 2: 1, 3: 2}.get(wkb_type // 1000, 0)
+    base = wkb_type % 1000
+
+    def read_points(pos):
+        count = struct.unpack_from(f"{endian}I", data, pos)[0]
+        pts = np.frombuffer(data, dtype=f"{endian}f8", count=count * dims, offset=pos + 4)
+        return pts.reshape(count, dims)[:, :2].astype(np.float64), pos + 4 + count * dims * 8
+
+    if base == 1:
+        pts = np.frombuffer(data, dtype=f"{endian}f8", count=dims, offset=pos)
+        return [("Point", [pts[:2].reshape(1, 2).astype(np.float64)])], pos + dims * 8
+    if base == 2:
+        line, pos = read_points(pos)
+        return [("LineString", [line])], pos
+    if base == 3:
+        count = struct.unpack_from(f"{endian}I", data, pos)[0]
+        pos += 4
+        rings = []
+        for _ in range(count):
+            ring, pos = read_points(pos)
+            rings.append(ring)
+        return [("Polygon", [rings] if rings else [])], pos
+    if base in (4, 5, 6, 7):
+        count = struct.unpack_from(f"{endian}I", data, pos)[0]
+        pos += 4
+        geometries = []
+        for _ in range(count):
+            parts, pos = _parse_wkb(data, pos)
+            geometries += parts
+        return geometries, pos
+    raise ValueError(f"Unsupported WKB geometry type {wkb_type}")
@@ -0,0 +1,125 @@
+import ctypes
+import ctypes.util
+import gc
+import multiprocessing
+import os
+import sys
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def rss_bytes(pid=None):
+    """
+    Resident set size of a process (Linux /proc).
+
+    :param pid: process id, current process if None
+    :return: RSS in bytes, None if it can not be read
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_bytes():
+    """
+    Peak RSS of the current process since it started (getrusage).
+    ru_maxrss is in bytes on macOS and in kilobytes on Linux and the BSDs.
+
+    :return: peak RSS in bytes, None if it can not be read
+    """
+    try:
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except (ImportError, OSError):
+        return None
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def process_rss_mb():
+    """
+    RSS of the current process in MB, None if unknown.
+    """
+    rss = rss_bytes()
+    return rss / _MB if rss is not None else None
+
+
+def tree_rss_mb():
+    """
+    RSS of the current process and its multiprocessing children (stage process pools) in MB, None if unknown.
+    """
+    total = rss_bytes()
+    if total is None:
+        return None
+    for child in multiprocessing.active_children():
+        total += rss_bytes(child.pid) or 0
+    return total / _MB
+
+
+def release_memory():
+    """
+    Collect garbage and return freed heap memory to the OS.
+    ezdxf documents are full of reference cycles (entities <-> doc), so they are only freed by the
+    cycle collector, and glibc keeps freed arenas mapped until they are trimmed.
+    """
+    collected = gc.collect()
+    libc_name = ctypes.util.find_library("c")
+    if libc_name:
+        try:
+            ctypes.CDLL(libc_name).malloc_trim(0)
+        except (OSError, AttributeError):
+            pass
+    if logger.isEnabledFor(logging.DEBUG):
+        rss = process_rss_mb()
+        logger.debug(f"Released memory: {collected} objects collected, RSS "
+                     + (f"{rss:.0f} MB" if rss is not None else "unknown"))
+
+
+class MemorySampler(threading.Thread):
+    """
+    Background thread sampling the RSS of this process and its children, keeping the peak.
+    Used as a context manager around a job:
+
+        with MemorySampler() as sampler:
+            ...
+        sampler.peak_mb
+
+    Without /proc the RSS can not be sampled, peak_mb is then the peak RSS of this process since it
+    started (children not included).
+
+    :ivar peak_mb: highest sampled RSS in MB, None if unknown
+    """
+
+    def __init__(self, interval=0.2):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_mb = None
+        self._stop_event = threading.Event()
+
+    def sample(self):
+        rss = tree_rss_mb()
+        if rss is not None:
+            self.peak_mb = max(self.peak_mb or 0.0, rss)
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop_event.set()
+        self.join()
+        self.sample()
+        if self.peak_mb is None:
+            peak = peak_rss_bytes()
+            self.peak_mb = peak / _MB if peak is not None else None
+        return False